@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+드랍 결정 / 지갑 핫패스 마이크로벤치마크
+
+측정 대상:
+1. process_message_drop (텔레그램/RPC는 가짜 객체)
+2. WalletManager.is_valid_address / set_wallet
+3. USDCDropBot.parse_set_command
+4. TransactionManager.get_optimal_gas_estimate (가짜 web3 프로바이더)
+5. TransferBuilder 로컬 트랜잭션 구성 + 서명
+
+등록 지갑 수별(기본 1천/10만/100만)로 초당 처리량과 호출당 메모리 할당량을 출력하고,
+기준값을 저장해두었다가 비교해서 느려지면 실패 코드로 종료한다.
+
+사용법:
+    python3 benchmarks/bench_hot_paths.py
+    python3 benchmarks/bench_hot_paths.py --save benchmarks/baseline.json
+    python3 benchmarks/bench_hot_paths.py --compare benchmarks/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 봇 설정은 환경변수에서 읽으므로 import 전에 벤치마크용 값 지정
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:benchmark')
+os.environ['RATE_STATE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tgbot-bench-'), 'rate_state.json')
+os.environ['PAYOUT_STATS_PATH'] = os.path.join(os.path.dirname(os.environ['RATE_STATE_PATH']), 'payout_stats.json')
+os.environ['LEDGER_PATH'] = ''  # 원장 기록 제외 (드랍 결정 경로만 측정)
+
+from web3 import Web3
+from web3.providers import BaseProvider
+from eth_account import Account
+
+import tx_bot
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+SAMPLE_ADDRESS = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+
+
+class MemoryWalletStorage:
+    """미리 채운 메모리 저장소 (디스크 I/O 제외)"""
+
+    def __init__(self, size: int):
+        self.wallets = {str(user_id): f"0x{user_id:040x}" for user_id in range(size)}
+
+    def load_wallets(self):
+        return self.wallets
+
+    def has_user(self, user_id):
+        return user_id in self.wallets
+
+    def get_wallet(self, user_id):
+        return self.wallets.get(user_id)
+
+    def upsert_wallet(self, user_id, address):
+        self.wallets[user_id] = address
+        return True
+
+    def delete_wallet(self, user_id):
+        self.wallets.pop(user_id, None)
+        return True
+
+    def add_user(self, user_id):
+        return True
+
+
+class NullOutbox:
+    """텔레그램 발신 대신 건수만 셈"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+    def reply_to(self, *args, **kwargs):
+        self.sent += 1
+
+    def pending_count(self):
+        return 0
+
+
+class NullPayoutQueue:
+    """드랍 전송 대신 건수만 셈"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, job):
+        self.submitted += 1
+        return True
+
+    def qsize(self):
+        return 0
+
+
+class FakeTransactionManager:
+    """드랍 결정에 필요한 부분만 있는 트랜잭션 매니저 (RPC 없음)"""
+
+    def __init__(self):
+        self.fee_oracle = SimpleNamespace(max_cost_wei=lambda gas_limit: 0)
+        self.gas_cache = SimpleNamespace(max_gas=100000)
+        self.balance_monitor = tx_bot.BalanceMonitor()
+
+    def should_drop(self, drop_rate):
+        return random.random() < drop_rate
+
+
+class FakeRPCProvider(BaseProvider):
+    """eth_estimateGas 등에 고정 응답하는 web3 프로바이더"""
+
+    RESPONSES = {
+        'eth_estimateGas': hex(41_000),
+        'eth_chainId': hex(8453),
+        'eth_blockNumber': hex(1),
+    }
+
+    def make_request(self, method, params):
+        return {'jsonrpc': '2.0', 'id': 0, 'result': self.RESPONSES.get(method, '0x0')}
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+def make_bot(size: int):
+    """네트워크 없이 드랍 결정 경로만 쓰는 봇 (USDCDropBot.__init__은 호출하지 않음)"""
+    bot = tx_bot.USDCDropBot.__new__(tx_bot.USDCDropBot)
+    bot.load_config()
+    bot.bot_start_time = bot.bot_start_time.replace(year=2000)
+    bot.max_daily_amount = float('inf')
+    bot.blocked_chat_ids = set()
+    bot.init_drop_state()
+    bot.wallet_manager = tx_bot.WalletManager(storage=MemoryWalletStorage(size))
+    bot.outbox = NullOutbox()
+    bot.tx_manager = FakeTransactionManager()
+    bot.payout_queue = NullPayoutQueue()
+    bot.scheduler = SimpleNamespace(add_job=lambda *args, **kwargs: None)  # 커피 잭팟 예약 무시
+    return bot
+
+
+def make_transaction_manager(gas_cache_ttl: float = 600.0):
+    """gas_cache_ttl < 0 이면 가스 캐시가 항상 만료돼서 매번 estimate_gas 경로를 탐"""
+    tm = tx_bot.TransactionManager.__new__(tx_bot.TransactionManager)
+    tm.w3 = Web3(FakeRPCProvider())
+    tm.usdc_contract = tm.w3.eth.contract(address=SAMPLE_ADDRESS, abi=tx_bot.USDC_ABI)
+    tm.account = Account.create()
+    tm.gas_cache = tx_bot.GasLimitCache(ttl=gas_cache_ttl)
+    return tm
+
+
+def build_and_sign_transfer(manager):
+    """드랍 1건의 송신 전 로컬 작업 (calldata 인코딩, 트랜잭션 구성, 서명)"""
+    builder = tx_bot.TransferBuilder(SAMPLE_ADDRESS, 8453)
+    data = builder.transfer_data(SAMPLE_ADDRESS, 10_000)
+    fees = {'maxFeePerGas': 2 * 10 ** 9, 'maxPriorityFeePerGas': 10 ** 8}
+    return manager.account.sign_transaction(builder.build(SAMPLE_ADDRESS, data, 0, 60_000, fees))
+
+
+def make_messages(size: int, count: int = 10_000) -> list:
+    """등록/미등록 사용자가 섞인 그룹 메시지"""
+    now = int(time.time())
+    messages = []
+    for index in range(count):
+        user_id = random.randrange(size * 2)  # 절반은 지갑 미등록
+        messages.append(SimpleNamespace(
+            text="오늘 날씨 좋네요 다들 안녕하세요" if index % 5 else "ㅋㅋ",
+            date=now,
+            message_id=index,
+            chat=SimpleNamespace(id=-1001234567890, title="bench"),
+            from_user=SimpleNamespace(id=user_id, first_name=f"user{user_id}", username=None),
+        ))
+    return messages
+
+
+def measure(func, min_seconds: float = 1.0, alloc_calls: int = 1000) -> dict:
+    """초당 호출 수와 호출당 할당량 (tracemalloc은 처리량 측정과 분리)"""
+    func()  # 준비 호출
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    batch = 100
+    while elapsed < min_seconds:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        batch = min(batch * 2, 100_000)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(alloc_calls):
+        func()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': calls / elapsed,
+        'peak_bytes_per_op': (peak - before) / alloc_calls,
+        'retained_bytes_per_op': (after - before) / alloc_calls,
+    }
+
+
+def run_size(size: int, min_seconds: float) -> dict:
+    random.seed(size)
+    bot = make_bot(size)
+    messages = make_messages(size)
+    message_iter = iter(())
+
+    def drop_decision():
+        nonlocal message_iter
+        message = next(message_iter, None)
+        if message is None:
+            message_iter = iter(messages)
+            message = next(message_iter)
+        bot.process_message_drop(message, str(message.from_user.id), message.from_user.first_name)
+
+    manager = bot.wallet_manager
+    user_ids = [str(random.randrange(size)) for _ in range(1000)]
+    set_counter = iter(range(10 ** 12))
+
+    def set_wallet():
+        manager.set_wallet(user_ids[next(set_counter) % len(user_ids)], SAMPLE_ADDRESS.lower())
+
+    results = {
+        'process_message_drop': measure(drop_decision, min_seconds),
+        'is_valid_address': measure(lambda: manager.is_valid_address(SAMPLE_ADDRESS), min_seconds),
+        'set_wallet': measure(set_wallet, min_seconds),
+        'parse_set_command': measure(
+            lambda: tx_bot.USDCDropBot.parse_set_command(f'/set "{SAMPLE_ADDRESS}"'), min_seconds
+        ),
+    }
+    return results
+
+
+def run(sizes, min_seconds: float) -> dict:
+    report = {}
+    for size in sizes:
+        report[str(size)] = run_size(size, min_seconds)
+
+    # 지갑 수와 무관한 경로는 한 번만 측정
+    manager = make_transaction_manager()
+    # 전송 경로(get_gas_limit): 보낸 적 있는 수신자 + 실측치 캐시 적중 / 캐시 만료로 매번 추정
+    manager.gas_cache.observe('warm', 45_000)
+    manager.gas_cache.observe('cold', 62_000)
+    manager.gas_cache.mark_warm(SAMPLE_ADDRESS)
+    uncached = make_transaction_manager(gas_cache_ttl=-1.0)
+    report['gas'] = {
+        'get_optimal_gas_estimate': measure(
+            lambda: manager.get_optimal_gas_estimate(SAMPLE_ADDRESS, 0.01), min_seconds, alloc_calls=200
+        ),
+        'get_gas_limit_cached': measure(lambda: manager.get_gas_limit(SAMPLE_ADDRESS, 0.01), min_seconds),
+        'get_gas_limit_uncached': measure(
+            lambda: uncached.get_gas_limit(SAMPLE_ADDRESS, 0.01), min_seconds, alloc_calls=200
+        ),
+        'build_and_sign_transfer': measure(lambda: build_and_sign_transfer(manager), min_seconds, alloc_calls=200),
+    }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'지갑 수':>10} {'벤치마크':<26} {'ops/s':>14} {'peak B/op':>12} {'retained B/op':>14}")
+    for size, results in report.items():
+        for name, result in results.items():
+            print(
+                f"{size:>10} {name:<26} {result['ops_per_sec']:>14,.0f} "
+                f"{result['peak_bytes_per_op']:>12,.0f} {result['retained_bytes_per_op']:>14,.1f}"
+            )
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """기준값보다 tolerance 이상 느려진 항목"""
+    regressions = []
+    for size, results in report.items():
+        for name, result in results.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = result['ops_per_sec'] / base['ops_per_sec']
+            if ratio < 1 - tolerance:
+                regressions.append((size, name, base['ops_per_sec'], result['ops_per_sec'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="드랍 결정 / 지갑 핫패스 벤치마크")
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="등록 지갑 수 (쉼표로 구분)")
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="벤치마크별 최소 측정 시간")
+    parser.add_argument('--save', metavar='PATH', help="결과를 기준값 파일로 저장")
+    parser.add_argument('--compare', metavar='PATH', help="기준값 파일과 비교")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="허용 처리량 감소 비율 (기본 20%%)")
+    parser.add_argument('--log', action='store_true', help="봇 로그 출력 유지 (기본은 측정 중 로그 끔)")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.CRITICAL)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    report = run(sizes, args.min_seconds)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': report,
+            }, f, indent=2)
+        print(f"\n기준값 저장: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n처리량 감소 ({args.tolerance:.0%} 초과):")
+            for size, name, before, after, ratio in regressions:
+                print(f"  {size} {name}: {before:,.0f} -> {after:,.0f} ops/s ({ratio:.0%})")
+            sys.exit(1)
+        print(f"\n기준값 대비 처리량 감소 없음 ({args.compare})")
+
+
+if __name__ == "__main__":
+    main()
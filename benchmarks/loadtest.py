@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+종단간 부하 테스트 (가짜 텔레그램 Bot API + 가짜 Base JSON-RPC 노드)
+
+로컬에 두 서버를 띄우고 USDCDropBot을 그대로 실행한 뒤 합성(또는 녹화된) 그룹
+대화를 N배속으로 흘려보낸다. 네트워크/실제 자금 없이 처리량, 드랍->답장 지연
+백분위, 실패 건수를 측정해서 그룹 규모 증가에 대비한 용량 계획에 쓴다.
+
+사용법:
+    python3 benchmarks/loadtest.py --rate 50 --duration 30
+    python3 benchmarks/loadtest.py --rate 200 --rpc-latency-ms 150 --rpc-error-rate 0.05
+    python3 benchmarks/loadtest.py --replay traffic.jsonl --speed 10
+
+녹화 파일(JSONL) 형식: {"ts": 초, "chat_id": -100..., "user_id": 123, "text": "..."}
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USDC_ADDRESS = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+
+
+class FaultInjector:
+    """응답 지연 및 오류 주입 설정"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self):
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeTelegramAPI:
+    """getUpdates / sendMessage 등을 흉내내는 로컬 Bot API 서버
+
+    getUpdates는 롱폴링으로 동작하고, sendMessage는 답장 대상 메시지가 대기열에
+    들어간 시점부터의 지연을 기록한다. error_rate 비율로 429를 돌려준다.
+    """
+
+    def __init__(self, faults: FaultInjector, retry_after: int = 1):
+        self.faults = faults
+        self.retry_after = retry_after
+        self.lock = threading.Condition()
+        self.updates = deque()
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.offered_at = {}  # (chat_id, message_id) -> 대기열에 넣은 시각
+        self.delivered = 0
+        self.counts = Counter()
+        self.drop_latencies = []
+        self.reply_latencies = []
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/bot{{0}}/{{1}}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-telegram", daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def offer(self, chat_id: int, user_id: int, text: str):
+        """그룹 메시지 한 건을 업데이트 대기열에 추가"""
+        now = time.time()
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+            self.updates.append({
+                'update_id': self.next_update_id,
+                'message': {
+                    'message_id': message_id,
+                    'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+                    'chat': {'id': chat_id, 'type': 'supergroup', 'title': 'loadtest'},
+                    # 봇 시작 시각보다 앞서지 않도록 올림
+                    'date': math.ceil(now),
+                    'text': text,
+                }
+            })
+            self.next_update_id += 1
+            self.offered_at[(chat_id, message_id)] = time.perf_counter()
+            self.lock.notify_all()
+
+    def backlog(self) -> int:
+        with self.lock:
+            return len(self.updates)
+
+    def _get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset', 0) or 0)
+        timeout = float(params.get('timeout', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        deadline = time.monotonic() + min(timeout, 2.0)
+        with self.lock:
+            if offset < 0:
+                # offset=-1: 마지막 업데이트만 (과거 업데이트 스킵용)
+                return list(self.updates)[-1:]
+            while self.updates and self.updates[0]['update_id'] < offset:
+                self.updates.popleft()
+            while not self.updates and time.monotonic() < deadline:
+                self.lock.wait(timeout=deadline - time.monotonic())
+            result = list(self.updates)[:limit]
+            self.delivered += sum(1 for update in result if update['update_id'] >= offset)
+            return result
+
+    def _send_message(self, params: dict) -> dict:
+        chat_id = int(params['chat_id'])
+        text = params.get('text', '')
+        reply_to = params.get('reply_to_message_id')
+        now = time.perf_counter()
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+            if reply_to:
+                offered = self.offered_at.pop((chat_id, int(reply_to)), None)
+                if offered is not None:
+                    latency = now - offered
+                    if "USDC 드랍" in text:
+                        self.drop_latencies.append(latency)
+                    else:
+                        self.reply_latencies.append(latency)
+            if "USDC 드랍" in text and not reply_to:
+                self.counts['drop_digest'] += 1
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'supergroup' if chat_id < 0 else 'private'},
+            'text': text,
+        }
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(QuietHandler):
+            def _handle(self):
+                parsed = urlparse(self.path)
+                method = parsed.path.rsplit('/', 1)[-1]
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                if length:
+                    body = self.rfile.read(length).decode('utf-8')
+                    if 'json' in (self.headers.get('Content-Type') or ''):
+                        params.update(json.loads(body))
+                    else:
+                        params.update({key: values[-1] for key, values in parse_qs(body).items()})
+                api.counts[method] += 1
+
+                if method == 'getUpdates':
+                    self.send_json(200, {'ok': True, 'result': api._get_updates(params)})
+                    return
+
+                api.faults.delay()
+                if method in ('sendMessage', 'editMessageText') and api.faults.should_fail():
+                    api.counts['429'] += 1
+                    self.send_json(429, {
+                        'ok': False,
+                        'error_code': 429,
+                        'description': f"Too Many Requests: retry after {api.retry_after}",
+                        'parameters': {'retry_after': api.retry_after},
+                    })
+                    return
+
+                if method == 'getMe':
+                    result = {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest_bot'}
+                elif method == 'sendMessage':
+                    result = api._send_message(params)
+                elif method == 'editMessageText':
+                    result = {
+                        'message_id': int(params.get('message_id', 0)),
+                        'date': int(time.time()),
+                        'chat': {'id': int(params.get('chat_id', 0)), 'type': 'supergroup'},
+                        'text': params.get('text', ''),
+                    }
+                else:
+                    result = True  # deleteWebhook 등
+                self.send_json(200, {'ok': True, 'result': result})
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
+
+
+class FakeRPCNode:
+    """USDC 드랍에 필요한 메서드만 흉내내는 Base JSON-RPC 노드 (배치 요청 지원)
+
+    전송된 트랜잭션은 block_time초 뒤 성공 영수증을 돌려준다.
+    error_rate 비율로 HTTP 503을 돌려주고, revert_rate 비율로 실패 영수증을 만든다.
+    """
+
+    def __init__(self, faults: FaultInjector, block_time: float = 2.0, revert_rate: float = 0.0):
+        self.faults = faults
+        self.block_time = block_time
+        self.revert_rate = revert_rate
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.nonce = 0
+        self.transactions = {}  # 해시 -> (포함 시각, 성공 여부)
+        self.counts = Counter()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-rpc", daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def block_number(self) -> int:
+        return int((time.monotonic() - self.started_at) / self.block_time) + 1
+
+    def call(self, method: str, params: list):
+        self.counts[method] += 1
+        if method == 'eth_chainId':
+            return hex(8453)
+        if method == 'net_version':
+            return "8453"
+        if method == 'web3_clientVersion':
+            return "fake-rpc/1.0"
+        if method == 'eth_blockNumber':
+            return hex(self.block_number())
+        if method == 'eth_getTransactionCount':
+            with self.lock:
+                return hex(self.nonce)
+        if method == 'eth_estimateGas':
+            return hex(random.choice((34_500, 51_600)))
+        if method == 'eth_feeHistory':
+            count = int(params[0], 16) if isinstance(params[0], str) else int(params[0])
+            return {
+                'oldestBlock': hex(max(1, self.block_number() - count)),
+                'baseFeePerGas': [hex(5_000_000)] * (count + 1),
+                'gasUsedRatio': [0.5] * count,
+                'reward': [[hex(1_000_000)]] * count,
+            }
+        if method == 'eth_call':
+            return "0x" + f"{10 ** 12:064x}"  # balanceOf: 100만 USDC
+        if method == 'eth_getBalance':
+            return hex(10 ** 20)
+        if method == 'eth_sendRawTransaction':
+            tx_hash = "0x" + hashlib.sha256(params[0].encode()).hexdigest()
+            with self.lock:
+                self.nonce += 1
+                self.transactions[tx_hash] = (
+                    time.monotonic() + self.block_time, random.random() >= self.revert_rate
+                )
+            return tx_hash
+        if method == 'eth_getTransactionReceipt':
+            with self.lock:
+                entry = self.transactions.get(params[0])
+            if entry is None or time.monotonic() < entry[0]:
+                return None
+            return {
+                'transactionHash': params[0],
+                'blockNumber': hex(self.block_number()),
+                'status': '0x1' if entry[1] else '0x0',
+                'gasUsed': hex(34_500),
+            }
+        raise ValueError(f"지원하지 않는 메서드: {method}")
+
+    def _make_handler(self):
+        node = self
+
+        class Handler(QuietHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                request = json.loads(self.rfile.read(length))
+                node.faults.delay()
+                if node.faults.should_fail():
+                    node.counts['injected_error'] += 1
+                    self.send_json(503, {'error': 'injected failure'})
+                    return
+                requests_ = request if isinstance(request, list) else [request]
+                responses = []
+                for item in requests_:
+                    try:
+                        result = node.call(item['method'], item.get('params', []))
+                        responses.append({'jsonrpc': '2.0', 'id': item.get('id'), 'result': result})
+                    except Exception as e:
+                        responses.append({'jsonrpc': '2.0', 'id': item.get('id'),
+                                          'error': {'code': -32601, 'message': str(e)}})
+                self.send_json(200, responses if isinstance(request, list) else responses[0])
+
+        return Handler
+
+
+def synthetic_traffic(rate: float, duration: float, users: int, chats: int):
+    """(지연초, chat_id, user_id, text) - 포아송 도착"""
+    elapsed = 0.0
+    texts = ("오늘 다들 뭐하세요", "USDC 드랍 언제 오나요", "ㅋㅋㅋㅋ", "좋은 아침입니다 여러분", "ㅇㅇ")
+    while True:
+        elapsed += random.expovariate(rate)
+        if elapsed > duration:
+            return
+        yield (elapsed, -1000000000000 - random.randrange(chats),
+               random.randrange(1, users + 1), random.choice(texts))
+
+
+def recorded_traffic(path: str, speed: float):
+    """녹화된 JSONL 대화를 speed배속으로 재생"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    rows.sort(key=lambda row: row['ts'])
+    if not rows:
+        return
+    start = rows[0]['ts']
+    for row in rows:
+        yield ((row['ts'] - start) / speed, int(row['chat_id']), int(row['user_id']), row.get('text', ''))
+
+
+def percentiles(values: list) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50 {pick(0.5):.0f}ms, p90 {pick(0.9):.0f}ms, p99 {pick(0.99):.0f}ms, max {values[-1] * 1000:.0f}ms"
+
+
+def configure_environment(args, rpc_url: str, workdir: str):
+    """봇 설정 (import 전에 환경변수로 지정)"""
+    from eth_account import Account
+
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': '0:loadtest',
+        'PRIVATE_KEY': Account.create().key.hex(),
+        'USDC_CONTRACT_ADDRESS': USDC_ADDRESS,
+        'RPC_URL': rpc_url,
+        'RPC_URLS': rpc_url,
+        'DROP_RATE': str(args.drop_rate),
+        'MAX_DAILY_AMOUNT': '1000000',
+        'COOLDOWN_SECONDS': str(args.cooldown),
+        'WALLET_STORAGE': 'sqlite',
+        'WALLET_DB_PATH': os.path.join(workdir, 'wallets.db'),
+        'RATE_STATE_PATH': os.path.join(workdir, 'rate_state.json'),
+        'PAYOUT_STATS_PATH': os.path.join(workdir, 'payout_stats.json'),
+        'LEDGER_PATH': os.path.join(workdir, 'payout_ledger.jsonl'),
+        'WELCOME_MESSAGE_ENABLED': 'false',
+        'BATCH_CONTRACT_ADDRESS': '',
+        'WEBHOOK_URL': '',
+        'ADMIN_USER_ID': '',
+        'GROUP_CHAT_ID': '',
+    })
+
+
+def run_load_test(args) -> int:
+    telegram = FakeTelegramAPI(FaultInjector(args.tg_latency_ms, args.tg_jitter_ms, args.tg_error_rate))
+    node = FakeRPCNode(
+        FaultInjector(args.rpc_latency_ms, args.rpc_jitter_ms, args.rpc_error_rate),
+        block_time=args.block_time, revert_rate=args.revert_rate
+    )
+    telegram.start()
+    node.start()
+
+    workdir = tempfile.mkdtemp(prefix='tgbot-loadtest-')
+    configure_environment(args, node.url, workdir)
+
+    import telebot
+    import tx_bot
+
+    telebot.apihelper.API_URL = telegram.api_url
+    if not args.log:
+        logging.disable(logging.WARNING)
+
+    bot = tx_bot.USDCDropBot()
+    for user_id in range(1, args.users + 1):
+        if random.random() < args.wallet_ratio:
+            bot.wallet_manager.set_wallet(str(user_id), "0x" + hashlib.sha256(str(user_id).encode()).hexdigest()[:40])
+
+    bot_thread = threading.Thread(target=bot.run, name="bot", daemon=True)
+    bot_thread.start()
+    time.sleep(1.0)  # 폴링/스케줄러 시작 대기
+
+    traffic = (recorded_traffic(args.replay, args.speed) if args.replay
+               else synthetic_traffic(args.rate * args.speed, args.duration / args.speed, args.users, args.chats))
+
+    offered = 0
+    started = time.perf_counter()
+    for delay, chat_id, user_id, text in traffic:
+        wait = started + delay - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        telegram.offer(chat_id, user_id, text)
+        offered += 1
+    offer_seconds = time.perf_counter() - started
+
+    # 남은 업데이트/답장/영수증 처리 대기
+    drain_deadline = time.monotonic() + args.drain
+    while time.monotonic() < drain_deadline:
+        if (telegram.backlog() == 0 and bot.outbox.pending_count() == 0
+                and bot.payout_queue.qsize() == 0 and len(bot.tx_manager.inflight.items()) == 0):
+            break
+        time.sleep(0.2)
+    total_seconds = time.perf_counter() - started
+
+    bot.bot.stop_polling()
+    bot_thread.join(timeout=15)
+    telegram.stop()
+    node.stop()
+
+    decisions = {key[0]: int(value) for key, value in tx_bot.DROP_DECISIONS.values.items()}
+    payouts = {key[0]: int(value) for key, value in tx_bot.PAYOUT_RESULTS.values.items()}
+    print("\n=== 부하 테스트 결과 ===")
+    print(f"메시지: {offered}건 / 전송 {offer_seconds:.1f}s ({offered / max(offer_seconds, 1e-9):.1f} msg/s 입력)")
+    print(f"처리: 봇 수신 {telegram.delivered}건, 전체 {total_seconds:.1f}s "
+          f"({telegram.delivered / max(total_seconds, 1e-9):.1f} msg/s)")
+    print(f"드랍 결정: {decisions}")
+    print(f"드랍 전송: 트랜잭션 {node.counts['eth_sendRawTransaction']}건, 결과 {payouts}")
+    print(f"드랍 -> 답장 지연: {percentiles(telegram.drop_latencies)} ({len(telegram.drop_latencies)}건, "
+          f"요약 메시지 {telegram.counts['drop_digest']}건)")
+    print(f"기타 답장 지연: {percentiles(telegram.reply_latencies)} ({len(telegram.reply_latencies)}건)")
+    print(f"텔레그램: 호출 {dict(telegram.counts)}")
+    print(f"RPC: 호출 {dict(node.counts)}")
+    print(f"남은 업데이트 {telegram.backlog()}건, 발신 대기 {bot.outbox.pending_count()}건, "
+          f"미확정 트랜잭션 {len(bot.tx_manager.inflight.items())}건")
+
+    failures = payouts.get('send_failed', 0) + payouts.get('failed', 0) + payouts.get('dropped', 0)
+    return 1 if failures and args.fail_on_errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="USDC 드랍 봇 종단간 부하 테스트")
+    traffic = parser.add_argument_group('트래픽')
+    traffic.add_argument('--rate', type=float, default=20.0, help="초당 메시지 수 (합성 트래픽)")
+    traffic.add_argument('--duration', type=float, default=30.0, help="트래픽 길이 (초, 배속 적용 전)")
+    traffic.add_argument('--speed', type=float, default=1.0, help="배속 (N배 빠르게 재생)")
+    traffic.add_argument('--replay', metavar='JSONL', help="녹화된 대화 재생")
+    traffic.add_argument('--users', type=int, default=1000, help="사용자 수")
+    traffic.add_argument('--chats', type=int, default=3, help="그룹 수")
+    traffic.add_argument('--wallet-ratio', type=float, default=0.6, help="지갑 등록 사용자 비율")
+    bot_group = parser.add_argument_group('봇 설정')
+    bot_group.add_argument('--drop-rate', type=float, default=0.05)
+    bot_group.add_argument('--cooldown', type=float, default=30.0)
+    fault = parser.add_argument_group('지연/오류 주입')
+    fault.add_argument('--tg-latency-ms', type=float, default=30.0)
+    fault.add_argument('--tg-jitter-ms', type=float, default=20.0)
+    fault.add_argument('--tg-error-rate', type=float, default=0.0, help="sendMessage 429 비율")
+    fault.add_argument('--rpc-latency-ms', type=float, default=50.0)
+    fault.add_argument('--rpc-jitter-ms', type=float, default=50.0)
+    fault.add_argument('--rpc-error-rate', type=float, default=0.0, help="RPC HTTP 503 비율")
+    fault.add_argument('--revert-rate', type=float, default=0.0, help="실패 영수증 비율")
+    fault.add_argument('--block-time', type=float, default=2.0)
+    parser.add_argument('--drain', type=float, default=30.0, help="트래픽 종료 후 처리 대기 최대 시간")
+    parser.add_argument('--fail-on-errors', action='store_true', help="드랍 전송 실패가 있으면 종료 코드 1")
+    parser.add_argument('--log', action='store_true', help="봇 로그 출력")
+    args = parser.parse_args()
+
+    sys.exit(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
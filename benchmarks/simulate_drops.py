@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+드랍 경제 시뮬레이터 (DROP_RATE / MAX_DAILY_AMOUNT / COOLDOWN_SECONDS 튜닝용)
+
+메시지 도착 분포(또는 녹화된 대화 로그)를 NumPy로 만들고, 봇이 실제로 쓰는
+USDCDropBot.decide_drop에 시뮬레이션 시각을 넣어 그대로 판정한다. 드랍 확률,
+0.005~0.05 USDC 균등 금액, 사용자별 쿨타임, 일일 한도 절삭, 커피 잭팟이 모두
+실제 코드와 같은 순서로 적용된다. 집계(시간대별 드랍 수, 한도 소진 시각,
+트랜잭션/가스 부하, 사용자 간 공정성)는 NumPy로 벡터화해서 계산한다.
+
+사용법:
+    python3 benchmarks/simulate_drops.py --messages 2000000 --users 5000 --days 7
+    python3 benchmarks/simulate_drops.py --drop-rate 0.02,0.05,0.1 --max-daily 5,10,20
+    python3 benchmarks/simulate_drops.py --replay traffic.jsonl --json report.json
+
+녹화 파일(JSONL) 형식은 loadtest.py와 같다: {"ts": 초, "chat_id": -100..., "user_id": 123, "text": "..."}
+NumPy가 필요하다 (봇 실행에는 필요 없음).
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 봇 설정은 환경변수에서 읽으므로 import 전에 시뮬레이션용 값 지정
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:simulate')
+os.environ['RATE_STATE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tgbot-sim-'), 'rate_state.json')
+os.environ['PAYOUT_STATS_PATH'] = os.path.join(os.path.dirname(os.environ['RATE_STATE_PATH']), 'payout_stats.json')
+os.environ['LEDGER_PATH'] = ''  # 시뮬레이션 드랍은 원장에 남기지 않음
+
+import tx_bot
+
+SIM_EPOCH = 1704067200  # 2024-01-01 00:00 UTC (일일 한도의 UTC 날짜 경계에 맞춤)
+GROUP_CHAT_ID = -1001234567890
+LONG_TEXT = "오늘 날씨 좋네요 다들 안녕하세요"
+SHORT_TEXT = "ㅋㅋ"
+
+
+def synthetic_traffic(args, rng) -> dict:
+    """합성 트래픽: 하루 주기 도착률 + 소수 사용자에 몰리는(Zipf) 발화량"""
+    hours = args.days * 24
+    hour_of_day = np.arange(hours) % 24
+    if args.flat:
+        weights = np.ones(hours)
+    else:
+        # UTC 4시 최저, 16시 최고인 하루 주기
+        weights = 0.2 + 0.8 * (1 - np.cos(2 * np.pi * (hour_of_day - 4) / 24)) / 2
+    hour_index = rng.choice(hours, size=args.messages, p=weights / weights.sum())
+    ts = SIM_EPOCH + hour_index * 3600 + rng.random(args.messages) * 3600
+    order = np.argsort(ts, kind='stable')
+
+    activity = 1.0 / np.arange(1, args.users + 1) ** args.zipf
+    users = rng.permutation(args.users)[rng.choice(args.users, size=args.messages, p=activity / activity.sum())]
+    long_text = rng.random(args.messages) >= args.short_ratio
+    return {
+        'ts': ts[order],
+        'user': users[order],
+        'chat_id': np.full(args.messages, GROUP_CHAT_ID, dtype=np.int64),
+        'long_text': long_text[order],
+        'user_ids': np.arange(args.users),
+    }
+
+
+def recorded_traffic(path: str) -> dict:
+    """녹화된 JSONL 대화 (시각은 SIM_EPOCH 기준으로 옮기되 하루 중 시각은 유지)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if not rows:
+        raise SystemExit(f"빈 로그: {path}")
+    ts = np.array([float(row['ts']) for row in rows])
+    order = np.argsort(ts, kind='stable')
+    ts = ts[order]
+    ts = ts - (ts[0] - ts[0] % 86400) + SIM_EPOCH
+    user_ids, users = np.unique(np.array([int(row['user_id']) for row in rows])[order], return_inverse=True)
+    return {
+        'ts': ts,
+        'user': users,
+        'chat_id': np.array([int(row.get('chat_id', GROUP_CHAT_ID)) for row in rows], dtype=np.int64)[order],
+        'long_text': np.array([len(row.get('text') or '') >= 5 for row in rows])[order],
+        'user_ids': user_ids,
+    }
+
+
+def make_bot(wallets: dict, drop_rate: float, max_daily: float, hot_wallet_usdc):
+    """네트워크 없이 decide_drop만 쓰는 봇 (USDCDropBot.__init__은 호출하지 않음)"""
+    bot = tx_bot.USDCDropBot.__new__(tx_bot.USDCDropBot)
+    bot.load_config()
+    bot.bot_start_time = bot.bot_start_time.replace(year=2000)
+    bot.drop_rate = drop_rate
+    bot.max_daily_amount = max_daily
+    bot.init_drop_state()
+    bot.wallet_manager = SimpleNamespace(get_wallet=wallets.get)
+
+    balance_monitor = tx_bot.BalanceMonitor()
+    if hot_wallet_usdc is not None:
+        # 예약분은 확정 처리하지 않으므로 그대로 잔고에서 빠진 것으로 본다
+        balance_monitor.update(hot_wallet_usdc, 10 ** 18)
+    bot.tx_manager = SimpleNamespace(
+        fee_oracle=SimpleNamespace(max_cost_wei=lambda gas_limit: 0),
+        gas_cache=SimpleNamespace(max_gas=100000),
+        balance_monitor=balance_monitor,
+        should_drop=lambda rate: random.random() < rate,
+    )
+    return bot
+
+
+def simulate(traffic: dict, registered: np.ndarray, drop_rate: float, max_daily: float, args) -> dict:
+    """메시지마다 decide_drop 호출 후 결과를 배열로 수집"""
+    random.seed(args.seed)
+    user_ids = traffic['user_ids']
+    wallets = {str(user_ids[index]): f"0x{index + 1:040x}" for index in np.flatnonzero(registered)}
+    bot = make_bot(wallets, drop_rate, max_daily, args.hot_wallet_usdc)
+    decide_drop = bot.decide_drop
+
+    codes = {}  # 판정 사유 -> 정수 코드 (메시지 수백만 건을 문자열 배열로 두지 않음)
+    decisions = []
+    payout_index = []
+    payout_amount = []
+    user_keys = [str(user_id) for user_id in user_ids]
+    started = time.perf_counter()
+    for index, (ts, user, chat_id, long_text) in enumerate(zip(
+        traffic['ts'].tolist(), traffic['user'].tolist(), traffic['chat_id'].tolist(), traffic['long_text'].tolist()
+    )):
+        now = datetime.fromtimestamp(ts)
+        decision, reservation = decide_drop(
+            user_keys[user], user_keys[user], LONG_TEXT if long_text else SHORT_TEXT, now, chat_id, now=now
+        )
+        decisions.append(codes.setdefault(decision, len(codes)))
+        if reservation:
+            payout_index.append(index)
+            payout_amount.append(reservation['amount'])
+    elapsed = time.perf_counter() - started
+
+    return {
+        'drop_rate': drop_rate,
+        'max_daily': max_daily,
+        'decisions': np.array(decisions, dtype=np.int8),
+        'codes': codes,
+        'payout_index': np.array(payout_index, dtype=np.int64),
+        'payout_amount': np.array(payout_amount, dtype=np.float64),
+        'elapsed': elapsed,
+    }
+
+
+def gini(values: np.ndarray) -> float:
+    """지니 계수 (0: 완전 균등, 1: 한 명 독식)"""
+    if values.size == 0 or values.sum() == 0:
+        return 0.0
+    values = np.sort(values)
+    n = values.size
+    return float(2 * np.sum(np.arange(1, n + 1) * values) / (n * values.sum()) - (n + 1) / n)
+
+
+def summarize(traffic: dict, registered: np.ndarray, result: dict, args) -> dict:
+    """한도 소진 시각, 시간대별 드랍 수, 트랜잭션/가스 부하, 공정성"""
+    ts = traffic['ts']
+    decisions = result['decisions']
+    codes = result['codes']
+    payout_ts = ts[result['payout_index']]
+    payout_user = traffic['user'][result['payout_index']]
+    amounts = result['payout_amount']
+    days = int((ts[-1] - SIM_EPOCH) // 86400) + 1
+
+    # 일별 지급액과 한도 소진 시각 (첫 'budget'/'too_small' 판정)
+    day_of_payout = ((payout_ts - SIM_EPOCH) // 86400).astype(np.int64)
+    spent_per_day = np.bincount(day_of_payout, weights=amounts, minlength=days)
+    exhausted_mask = np.isin(decisions, [codes[name] for name in ('budget', 'too_small') if name in codes])
+    exhausted_ts = ts[exhausted_mask]
+    exhausted_day = ((exhausted_ts - SIM_EPOCH) // 86400).astype(np.int64)
+    first_in_day = np.unique(exhausted_day, return_index=True)
+    exhausted_at = {int(day): (exhausted_ts[index] - SIM_EPOCH) % 86400 / 3600 for day, index in zip(*first_in_day)}
+
+    # 시간대(UTC 시)별 평균 드랍 수와 분당 최대 트랜잭션 수
+    hour_of_day = ((payout_ts - SIM_EPOCH) % 86400 // 3600).astype(np.int64)
+    payouts_per_hour = np.bincount(hour_of_day, minlength=24) / days
+    per_minute = np.bincount(((payout_ts - SIM_EPOCH) // 60).astype(np.int64)) if payout_ts.size else np.zeros(1)
+    gas_total = amounts.size * args.gas_per_tx
+    gas_eth = gas_total * args.gas_price_gwei / 1e9
+
+    # 공정성: 지갑 등록 후 5글자 이상 메시지를 보낸 사용자 대상
+    user_count = traffic['user_ids'].size
+    eligible_messages = np.bincount(traffic['user'][traffic['long_text']], minlength=user_count)
+    eligible = registered & (eligible_messages > 0)
+    received = np.bincount(payout_user, weights=amounts, minlength=user_count)[eligible]
+    top_count = max(1, int(np.ceil(received.size * 0.1)))
+    top_share = float(np.sort(received)[::-1][:top_count].sum() / received.sum()) if received.sum() else 0.0
+    per_message = received / eligible_messages[eligible] if received.size else received
+    counts = np.bincount(decisions, minlength=len(codes))
+
+    return {
+        'drop_rate': result['drop_rate'],
+        'max_daily': result['max_daily'],
+        'messages': int(ts.size),
+        'days': days,
+        'decisions_per_sec': ts.size / result['elapsed'] if result['elapsed'] else 0.0,
+        'decisions': {name: int(counts[code]) for name, code in codes.items()},
+        'payouts': int(amounts.size),
+        'paid_usdc': float(amounts.sum()),
+        'avg_payout_usdc': float(amounts.mean()) if amounts.size else 0.0,
+        'spent_per_day': [round(float(value), 3) for value in spent_per_day],
+        'budget_exhausted_days': len(exhausted_at),
+        'budget_exhausted_at_hour': {str(day): round(hour, 2) for day, hour in exhausted_at.items()},
+        'median_exhausted_hour': float(np.median(list(exhausted_at.values()))) if exhausted_at else None,
+        'payouts_per_hour': [round(float(value), 2) for value in payouts_per_hour],
+        'peak_tx_per_minute': int(per_minute.max()),
+        'gas_total': int(gas_total),
+        'gas_cost_eth': gas_eth,
+        'eligible_users': int(eligible.sum()),
+        'users_with_drop': int((received > 0).sum()),
+        'gini': gini(received),
+        'top10_share': top_share,
+        'usdc_per_message_p10_p90': [float(value) for value in np.percentile(per_message, [10, 90])] if per_message.size else [0.0, 0.0],
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\n=== DROP_RATE {summary['drop_rate']}, MAX_DAILY_AMOUNT {summary['max_daily']} ===")
+    print(f"메시지 {summary['messages']:,}건 / {summary['days']}일 (판정 {summary['decisions_per_sec']:,.0f}건/초)")
+    print("판정: " + ", ".join(f"{name} {count:,}" for name, count in sorted(summary['decisions'].items())))
+    print(
+        f"드랍 {summary['payouts']:,}건, 총 {summary['paid_usdc']:.3f} USDC "
+        f"(평균 {summary['avg_payout_usdc']:.4f} USDC, 하루 평균 {summary['paid_usdc'] / summary['days']:.3f} USDC)"
+    )
+    if summary['budget_exhausted_days']:
+        print(
+            f"일일 한도 소진: {summary['budget_exhausted_days']}/{summary['days']}일, "
+            f"소진 시각 중앙값 UTC {summary['median_exhausted_hour']:.1f}시"
+        )
+    else:
+        print("일일 한도 소진: 없음")
+    hourly = summary['payouts_per_hour']
+    print("시간대별 드랍 수(UTC, 하루 평균): " + " ".join(f"{hour}시 {count:g}" for hour, count in enumerate(hourly)))
+    print(
+        f"트랜잭션 부하: 분당 최대 {summary['peak_tx_per_minute']}건, 가스 {summary['gas_total']:,} "
+        f"(약 {summary['gas_cost_eth']:.6f} ETH)"
+    )
+    low, high = summary['usdc_per_message_p10_p90']
+    print(
+        f"공정성: 대상 {summary['eligible_users']:,}명 중 {summary['users_with_drop']:,}명 수령, "
+        f"지니 {summary['gini']:.3f}, 상위 10% 몫 {summary['top10_share']:.1%}, "
+        f"메시지당 수령액 p10 {low:.5f} / p90 {high:.5f} USDC"
+    )
+
+
+def parse_floats(value: str) -> list:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="드랍 경제 시뮬레이터")
+    parser.add_argument('--messages', type=int, default=1_000_000, help="합성 메시지 수")
+    parser.add_argument('--users', type=int, default=2_000, help="합성 사용자 수")
+    parser.add_argument('--days', type=int, default=7, help="시뮬레이션 일수")
+    parser.add_argument('--zipf', type=float, default=1.1, help="사용자 발화량 치우침 (0이면 균등)")
+    parser.add_argument('--short-ratio', type=float, default=0.2, help="5글자 미만 메시지 비율")
+    parser.add_argument('--wallet-ratio', type=float, default=0.6, help="지갑 등록 사용자 비율")
+    parser.add_argument('--flat', action='store_true', help="하루 주기 없이 균일한 도착률")
+    parser.add_argument('--replay', metavar='PATH', help="녹화된 대화 JSONL로 시뮬레이션")
+    parser.add_argument('--drop-rate', default=os.getenv('DROP_RATE', '0.05'), help="드랍 확률 (쉼표로 여러 값)")
+    parser.add_argument('--max-daily', default=os.getenv('MAX_DAILY_AMOUNT', '10.0'), help="일일 한도 USDC (쉼표로 여러 값)")
+    parser.add_argument('--cooldown', type=float, help="쿨타임 초 (기본 COOLDOWN_SECONDS)")
+    parser.add_argument('--hot-wallet-usdc', type=float, help="핫월렛 USDC 잔고 (기본 무제한)")
+    parser.add_argument('--gas-per-tx', type=int, default=65_000, help="드랍 1건 가스 사용량")
+    parser.add_argument('--gas-price-gwei', type=float, default=0.01, help="가스 가격 (gwei)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help="결과를 JSON으로 저장")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # 판정마다 찍히는 쿨타임 로그 끔
+    if args.cooldown is not None:
+        os.environ['COOLDOWN_SECONDS'] = str(args.cooldown)
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    traffic = recorded_traffic(args.replay) if args.replay else synthetic_traffic(args, rng)
+    registered = rng.random(traffic['user_ids'].size) < args.wallet_ratio
+    print(
+        f"트래픽 준비: 메시지 {traffic['ts'].size:,}건, 사용자 {traffic['user_ids'].size:,}명 "
+        f"(지갑 등록 {int(registered.sum()):,}명), {time.perf_counter() - started:.2f}초"
+    )
+
+    summaries = []
+    for drop_rate in parse_floats(args.drop_rate):
+        for max_daily in parse_floats(args.max_daily):
+            result = simulate(traffic, registered, drop_rate, max_daily, args)
+            summary = summarize(traffic, registered, result, args)
+            print_summary(summary)
+            summaries.append(summary)
+
+    if len(summaries) > 1:
+        print(f"\n{'DROP_RATE':>10} {'MAX_DAILY':>10} {'드랍':>10} {'USDC/일':>10} {'소진일':>7} {'소진시각':>8} {'지니':>7}")
+        for summary in summaries:
+            hour = summary['median_exhausted_hour']
+            print(
+                f"{summary['drop_rate']:>10g} {summary['max_daily']:>10g} {summary['payouts']:>10,} "
+                f"{summary['paid_usdc'] / summary['days']:>10.3f} {summary['budget_exhausted_days']:>7} "
+                f"{'-' if hour is None else f'{hour:.1f}시':>8} {summary['gini']:>7.3f}"
+            )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': summaries}, f, indent=2, ensure_ascii=False)
+        print(f"\n결과 저장: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
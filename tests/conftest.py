@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# 저장소 루트의 tx_bot 모듈을 바로 import (import 시 설정되는 로그 파일은 임시 디렉터리로)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'tx_bot_test.log'))
@@ -0,0 +1,209 @@
+"""크래시 복구/자금 경로 테스트 (원장 재생, 한도 병합, 논스 정리) - 네트워크 없음"""
+
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import tx_bot
+from tx_bot import NonceManager, PayoutLedger, RateState, USDCDropBot
+
+
+def write_ledger(path, records, tail: str = ""):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        f.write(tail)
+
+
+def reserved(payout_id: str, amount: float, day: str, timestamp: float, user_id: str = "1") -> dict:
+    return {'e': 'reserved', 'id': payout_id, 'u': user_id, 'n': f"user{user_id}", 'c': -100,
+            'w': "0x" + "ab" * 20, 'a': amount, 'd': day, 't': timestamp}
+
+
+@pytest.fixture
+def now():
+    return time.time()
+
+
+@pytest.fixture
+def today(now):
+    return RateState.day_key(now)
+
+
+def test_replay_merges_event_sequences(tmp_path, now, today):
+    path = tmp_path / "ledger.jsonl"
+    write_ledger(path, [
+        reserved('confirmed', 0.5, today, now),
+        {'e': 'sent', 'id': 'confirmed', 'h': '0x01', 'o': 7},
+        {'e': 'sent', 'id': 'confirmed', 'h': '0x02', 'o': 7},  # 수수료 인상 교체
+        {'e': 'final', 'id': 'confirmed', 's': 'confirmed', 'h': '0x02'},
+        reserved('released', 0.2, today, now),
+        {'e': 'released', 'id': 'released'},
+        reserved('pending', 0.3, today, now),
+        {'e': 'sent', 'id': 'pending', 'h': '0x03', 'o': 8},
+        reserved('reserved_only', 0.1, today, now),
+        {'e': 'sent', 'id': 'compacted', 'h': '0x04'},  # 예약 기록이 잘린 이전 항목
+    ], tail='{"e":"final","id":"pending","s":"conf')  # 쓰다 만 마지막 줄
+
+    entries = PayoutLedger.replay(str(path))
+
+    assert set(entries) == {'confirmed', 'released', 'pending', 'reserved_only'}
+    assert entries['confirmed']['s'] == 'confirmed'
+    assert entries['confirmed']['h'] == ['0x01', '0x02']
+    assert entries['confirmed']['o'] == 7
+    assert entries['released']['s'] == 'released'
+    assert entries['pending']['s'] is None
+    assert entries['pending']['h'] == ['0x03']
+    assert entries['pending']['o'] == 8
+    assert entries['reserved_only']['s'] is None
+    assert entries['reserved_only']['h'] == []
+    assert 'o' not in entries['reserved_only']
+
+
+def test_replay_skips_torn_line_followed_by_retried_records(tmp_path, now, today):
+    # 기록 실패 후 재시도는 새 줄에서 시작하므로 잘린 줄만 버려짐
+    path = tmp_path / "ledger.jsonl"
+    path.write_text(
+        '{"e":"rese\n'
+        + json.dumps(reserved('p1', 0.4, today, now)) + "\n"
+        + json.dumps({'e': 'sent', 'id': 'p1', 'h': '0x0a', 'o': 3}) + "\n",
+        encoding='utf-8'
+    )
+
+    entries = PayoutLedger.replay(str(path))
+
+    assert list(entries) == ['p1']
+    assert entries['p1']['a'] == 0.4
+    assert entries['p1']['h'] == ['0x0a']
+
+
+def test_compaction_round_trip_keeps_hashes_and_nonce(tmp_path, now, today):
+    path = tmp_path / "ledger.jsonl"
+    write_ledger(path, [
+        reserved('p1', 0.5, today, now),
+        {'e': 'sent', 'id': 'p1', 'h': '0x01', 'o': 9},
+        {'e': 'sent', 'id': 'p1', 'h': '0x02', 'o': 9},
+        reserved('p2', 0.2, today, now),
+        {'e': 'final', 'id': 'p2', 's': 'unknown'},
+    ])
+    entries = PayoutLedger.replay(str(path))
+
+    ledger = PayoutLedger(str(path), commit_interval=0)
+    ledger.start(entries)
+    ledger.stop()
+
+    assert PayoutLedger.replay(str(path)) == entries
+
+
+def test_rate_state_restore_day_keeps_larger_of_snapshot_and_ledger(today):
+    state = RateState(cooldown_seconds=60)
+    state.reserve(today, 3.0)
+    state.confirm(today, 1.0)
+
+    state.restore_day(today, 1.5, 2.0)
+    assert state.sent(today) == 3.0
+    assert state.confirmed(today) == 2.0
+
+    state.restore_day(today, 4.0, 0.5)
+    assert state.sent(today) == 4.0
+    assert state.confirmed(today) == 2.0
+
+
+def make_recovering_bot(path, rate_state) -> USDCDropBot:
+    """recover_from_ledger에 필요한 상태만 있는 봇 (텔레그램/체인 연결 없음)"""
+    bot = USDCDropBot.__new__(USDCDropBot)
+    bot.payout_ledger = PayoutLedger(str(path), commit_interval=0)
+    bot.rate_state = rate_state
+    bot.cooldown_seconds = 60
+    bot.ledger_pending = {}
+    return bot
+
+
+@pytest.mark.parametrize("snapshot_sent, expected_sent", [(0.2, 0.9), (1.5, 1.5)])
+def test_recover_from_ledger_merges_budget_with_snapshot(tmp_path, now, today, snapshot_sent, expected_sent):
+    path = tmp_path / "ledger.jsonl"
+    write_ledger(path, [
+        reserved('confirmed', 0.5, today, now - 3600, user_id="1"),
+        {'e': 'sent', 'id': 'confirmed', 'h': '0x01', 'o': 1},
+        {'e': 'final', 'id': 'confirmed', 's': 'confirmed', 'h': '0x01'},
+        reserved('pending', 0.3, today, now - 10, user_id="2"),
+        {'e': 'sent', 'id': 'pending', 'h': '0x02', 'o': 2},
+        reserved('released', 0.2, today, now - 3600, user_id="3"),
+        {'e': 'released', 'id': 'released'},
+        reserved('unknown', 0.1, today, now - 3600, user_id="4"),
+    ])
+    rate_state = RateState(cooldown_seconds=60)
+    rate_state.reserve(today, snapshot_sent)
+    bot = make_recovering_bot(path, rate_state)
+
+    try:
+        bot.recover_from_ledger()
+    finally:
+        bot.payout_ledger.stop()
+
+    # 확정 0.5 + 대기 0.3 + 확인 불가 0.1 은 한도에 남고 취소분 0.2는 빠짐
+    assert rate_state.sent(today) == pytest.approx(expected_sent)
+    assert rate_state.confirmed(today) == pytest.approx(0.5)
+    assert list(bot.ledger_pending) == ['pending']
+    assert rate_state.cooldown_remaining("2", now) > 0
+    assert PayoutLedger.replay(str(path))['unknown']['s'] == 'unknown'
+
+
+class FakeEth:
+    def __init__(self, pending_nonce: int):
+        self.pending_nonce = pending_nonce
+        self.calls = []
+
+    def get_transaction_count(self, address, block_identifier):
+        self.calls.append(block_identifier)
+        return self.pending_nonce
+
+
+def make_nonce_manager(next_nonce: int = 10, pending_nonce: int = 42):
+    eth = FakeEth(pending_nonce)
+    manager = NonceManager(SimpleNamespace(eth=eth), "0x" + "cd" * 20)
+    manager.reset(next_nonce)
+    return manager, eth
+
+
+@pytest.mark.parametrize("error, sent", [
+    (RuntimeError("서명 실패"), False),
+    (requests.exceptions.ReadTimeout("read timed out"), False),
+    (ValueError({'code': -32000, 'message': 'insufficient funds for gas * price + value'}), True),
+    (ValueError({'code': -32000, 'message': 'replacement transaction underpriced'}), True),
+])
+def test_settle_failed_releases_nonce_that_never_left(error, sent):
+    manager, eth = make_nonce_manager()
+    nonce = manager.allocate()
+
+    manager.settle_failed(nonce, error, sent=sent)
+
+    assert manager.allocate() == nonce
+    assert eth.calls == []
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ReadTimeout("read timed out"),
+    requests.exceptions.ConnectionError("connection reset"),
+    ValueError("응답 형식 오류"),
+])
+def test_settle_failed_resyncs_from_pending_when_broadcast_is_uncertain(error):
+    manager, eth = make_nonce_manager()
+    nonce = manager.allocate()
+    manager.allocate()
+    manager.release(nonce + 1)
+
+    manager.settle_failed(nonce, error, sent=True)
+
+    assert manager.allocate() == 42
+    assert eth.calls == ['pending']
+
+
+def test_rejection_detection_matches_json_rpc_error_responses():
+    assert NonceManager.is_rejection(ValueError({'code': -32000, 'message': 'nonce too low'}))
+    assert not NonceManager.is_rejection(ValueError("nonce too low"))
+    assert not NonceManager.is_rejection(requests.exceptions.Timeout())
+    assert tx_bot.NonceManager.is_resync_error("Nonce too low: next nonce 5")
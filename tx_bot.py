@@ -9,33 +9,380 @@ Base 체인 USDC 드랍 텔레그램 봇
 """
 
 import os
+import asyncio
+import atexit
+import csv
+import io
+import hmac
+import itertools
 import json
 import logging
+import multiprocessing
+import queue
 import random
 import re
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Optional, Dict, Any, Tuple
+import requests
 import telebot
 from dotenv import load_dotenv
 from web3 import Web3
+from web3.providers import JSONBaseProvider
 from eth_account import Account
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # 환경변수 로드
 load_dotenv()
 
+# 드랍 금액 범위 (USDC) 및 커피 잭팟 확률 (0.0001%)
+DROP_AMOUNT_MIN = 0.005
+DROP_AMOUNT_MAX = 0.05
+COFFEE_JACKPOT_RATE = 0.000001
+
+# USDC 컨트랙트 ABI (transfer/balanceOf/approve/allowance)
+USDC_ABI = [
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "_to", "type": "address"},
+            {"name": "_value", "type": "uint256"}
+        ],
+        "name": "transfer",
+        "outputs": [{"name": "", "type": "bool"}],
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [{"name": "_owner", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "type": "function"
+    },
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "_spender", "type": "address"},
+            {"name": "_value", "type": "uint256"}
+        ],
+        "name": "approve",
+        "outputs": [{"name": "", "type": "bool"}],
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [
+            {"name": "_owner", "type": "address"},
+            {"name": "_spender", "type": "address"}
+        ],
+        "name": "allowance",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "type": "function"
+    }
+]
+
+# 멀티 전송 컨트랙트 ABI (Disperse 호환 disperseToken 함수만)
+BATCH_ABI = [
+    {
+        "constant": False,
+        "inputs": [
+            {"name": "token", "type": "address"},
+            {"name": "recipients", "type": "address[]"},
+            {"name": "values", "type": "uint256[]"}
+        ],
+        "name": "disperseToken",
+        "outputs": [],
+        "type": "function"
+    }
+]
+
+class LogQueueHandler(QueueHandler):
+    """같은 프로세스 큐용 핸들러 (메시지 포맷은 기록 스레드에서, 큐가 꽉 차면 버림)"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 호출 스레드에서는 포맷하지 않고 레코드를 그대로 넘김
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'root', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"로그 대기열 포화로 {dropped}건 버림",
+                }))
+            except queue.Full:
+                self.dropped += dropped
+
+class LogSampler:
+    """반복되는 핫패스 로그 샘플링 (키별로 interval초에 한 번만 기록하고 생략 건수를 덧붙임)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = {}  # 키 -> 다음 기록 가능 시각 (monotonic)
+        self.suppressed = {}  # 키 -> 생략 건수
+
+    def log(self, key: str, level: int, msg: str, *args):
+        if not logging.getLogger().isEnabledFor(level):
+            return
+        skipped = 0
+        if self.interval > 0:
+            now = time.monotonic()
+            with self.lock:
+                if now < self.next_at.get(key, 0.0):
+                    self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                    return
+                self.next_at[key] = now + self.interval
+                skipped = self.suppressed.pop(key, 0)
+        if skipped:
+            msg += f" (직전 {self.interval:g}초간 {skipped}건 생략)"
+        logging.log(level, msg, *args)
+
+def setup_logging() -> QueueListener:
+    """로깅 설정 - 핸들러 스레드는 큐에 넣기만 하고 백그라운드 스레드가 콘솔/파일에 기록
+    
+    LOG_FILE은 LOG_MAX_BYTES 크기마다(또는 LOG_ROTATE_WHEN 주기마다) 회전하고
+    LOG_BACKUP_COUNT개까지 보관한다.
+    """
+    level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
+    level = logging.getLevelName(level_name)
+    if not isinstance(level, int):
+        level = logging.INFO
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    handlers = [logging.StreamHandler()]
+    log_file = os.getenv('LOG_FILE', 'tx_bot.log')
+    if log_file:
+        backup_count = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+        rotate_when = os.getenv('LOG_ROTATE_WHEN')
+        if rotate_when:
+            handlers.append(TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8', delay=True, utc=True
+            ))
+        else:
+            handlers.append(RotatingFileHandler(
+                log_file, maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+                backupCount=backup_count, encoding='utf-8', delay=True
+            ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    root = logging.getLogger()
+    root.handlers[:] = [LogQueueHandler(log_queue)]
+    root.setLevel(level)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    if level_name != logging.getLevelName(level):
+        logging.warning(f"알 수 없는 LOG_LEVEL: {level_name} (INFO 사용)")
+    return listener
+
+def stop_logging():
+    """남은 로그를 모두 기록하고 기록 스레드 종료 (종료시 자동 호출)"""
+    global LOG_LISTENER
+    if LOG_LISTENER:
+        LOG_LISTENER.stop()
+        LOG_LISTENER = None
+
+def setup_worker_logging(log_queue):
+    """샤드 워커 로그는 부모 프로세스로 보내서 한 곳에서 기록/회전"""
+    handlers = LOG_LISTENER.handlers if LOG_LISTENER else ()
+    stop_logging()
+    for handler in handlers:
+        handler.close()
+    logging.getLogger().handlers[:] = [QueueHandler(log_queue)]
+
 # 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('tx_bot.log'),
-        logging.StreamHandler()
-    ]
-)
+LOG_LISTENER = setup_logging()
+atexit.register(stop_logging)
 
-class WalletManager:
-    """지갑 주소 관리 클래스"""
+# 쿨타임/차단 대화방/과거 메시지처럼 메시지마다 반복되는 로그
+HOT_LOG = LogSampler(float(os.getenv('LOG_SAMPLE_SECONDS', '10')))
+
+class Metric:
+    """Prometheus 텍스트 형식 지표 (라벨 값 튜플별 값 보관)"""
+
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def _label_text(self, label_values: tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{name}="{self._escape(value)}"' for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list:
+        with self.lock:
+            return [f"{self.name}{self._label_text(key)} {value}" for key, value in self.values.items()]
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"] + self.samples()
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+class Gauge(Metric):
+    """현재 값 지표 (set_function으로 수집 시점에 값을 읽을 수도 있음)"""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        super().__init__(name, help_text, labels)
+        self.functions = {}
+
+    def set(self, value: float, *label_values):
+        with self.lock:
+            self.values[label_values] = value
+
+    def set_function(self, function, *label_values):
+        with self.lock:
+            self.functions[label_values] = function
+
+    def samples(self) -> list:
+        with self.lock:
+            functions = list(self.functions.items())
+        for label_values, function in functions:
+            try:
+                self.set(function(), *label_values)
+            except Exception:
+                pass
+        return super().samples()
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values):
+        with self.lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][index] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        """with 블록 실행 시간 기록"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self) -> list:
+        lines = []
+        with self.lock:
+            for key, entry in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry['counts']):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{self._label_text(key, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', '+Inf'))} {entry['count']}")
+                lines.append(f"{self.name}_sum{self._label_text(key)} {entry['sum']}")
+                lines.append(f"{self.name}_count{self._label_text(key)} {entry['count']}")
+        return lines
+
+class MetricsRegistry:
+    """지표 목록 및 /metrics 텍스트 생성"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 지표 (METRICS_PORT 설정시 /metrics로 노출)
+METRICS = MetricsRegistry()
+HANDLER_SECONDS = METRICS.register(Histogram(
+    'tgbot_handler_seconds', '텔레그램 메시지 핸들러 처리 시간', ('handler',)))
+DROP_DECISIONS = METRICS.register(Counter(
+    'tgbot_drop_decisions_total', '메시지별 드랍 결정 사유', ('reason',)))
+RPC_SECONDS = METRICS.register(Histogram(
+    'tgbot_rpc_seconds', 'JSON-RPC 메서드별 응답 시간 (노드 전환 포함)', ('method',)))
+RPC_ERRORS = METRICS.register(Counter(
+    'tgbot_rpc_errors_total', 'JSON-RPC 메서드별 실패 (모든 노드 실패)', ('method',)))
+GAS_UNITS = METRICS.register(Histogram(
+    'tgbot_gas_units', 'USDC 전송 가스 (source=estimate_gas 추정치, receipt 실측치)', ('kind', 'source'),
+    buckets=(30000, 35000, 40000, 45000, 50000, 55000, 60000, 70000, 80000, 100000)))
+PAYOUT_QUEUE_DEPTH = METRICS.register(Gauge(
+    'tgbot_payout_queue_depth', '드랍 전송 대기열 길이'))
+PAYOUT_RESULTS = METRICS.register(Counter(
+    'tgbot_payouts_total', '드랍 전송 결과 (send_failed, confirmed, failed, dropped)', ('status',)))
+INFLIGHT_TRANSACTIONS = METRICS.register(Gauge(
+    'tgbot_inflight_transactions', '블록 포함 대기 중인 트랜잭션 수'))
+OUTBOUND_PENDING = METRICS.register(Gauge(
+    'tgbot_outbound_pending', '텔레그램 발신 대기열 길이'))
+TELEGRAM_SEND_SECONDS = METRICS.register(Histogram(
+    'tgbot_telegram_send_seconds', '텔레그램 API 발신 시간', ('kind',)))
+TELEGRAM_RATE_LIMITED = METRICS.register(Counter(
+    'tgbot_telegram_429_total', '텔레그램 429 응답 수'))
+TELEGRAM_ERRORS = METRICS.register(Counter(
+    'tgbot_telegram_errors_total', '텔레그램 발신 오류 (오류 코드별)', ('code',)))
+
+# 이더리움 주소 형식 (0x + 40자리 hex)
+ADDRESS_PATTERN = re.compile(r'^0x[a-fA-F0-9]{40}$')
+
+@lru_cache(maxsize=65536)
+def checksum_address(address: str) -> Optional[str]:
+    """주소 검증 + 체크섬 변환 (실패시 None) - 같은 주소는 keccak을 다시 계산하지 않음"""
+    try:
+        if not ADDRESS_PATTERN.match(address) or not Web3.is_address(address):
+            return None
+        return Web3.to_checksum_address(address)
+    except Exception:
+        return None
+
+class JsonWalletStorage:
+    """JSON 파일 저장소 (변경시 파일 전체를 다시 씀)"""
     
     def __init__(self, wallet_file: str = "wallets.json", users_file: str = "users.json"):
         self.wallet_file = wallet_file
@@ -88,677 +435,5140 @@ class WalletManager:
             logging.error(f"사용자 데이터 저장 실패: {e}")
             return False
     
-    """신규 사용자 확인 및 등록"""
-    def is_new_user(self, user_id: str) -> bool:
-        if user_id not in self.known_users:
-            self.known_users.add(user_id)
-            self._save_known_users()
-            return True
-        return False
+    def load_wallets(self) -> Dict[str, str]:
+        return dict(self.wallets)
     
-    """지갑 주소 유효성 검사"""
-    def is_valid_address(self, address: str) -> bool:
+    def load_known_users(self) -> set:
+        return set(self.known_users)
+    
+    def get_wallet(self, user_id: str) -> Optional[str]:
+        return self.wallets.get(user_id)
+    
+    def count_wallets(self) -> int:
+        return len(self.wallets)
+    
+    def upsert_wallet(self, user_id: str, address: str) -> bool:
+        self.wallets[user_id] = address
+        return self._save_wallets()
+    
+    def upsert_wallets(self, wallets: Dict[str, str]) -> bool:
+        self.wallets.update(wallets)
+        return self._save_wallets()
+    
+    def delete_wallet(self, user_id: str) -> bool:
+        self.wallets.pop(user_id, None)
+        return self._save_wallets()
+    
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self.known_users
+    
+    def add_user(self, user_id: str) -> bool:
+        self.known_users.add(user_id)
+        return self._save_known_users()
+
+class SqliteWalletStorage:
+    """SQLite(WAL) 저장소 - 변경시 해당 행만 upsert"""
+    
+    def __init__(self, db_path: str = "tx_bot.db"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # 핸들러/워커 스레드가 공유하므로 락으로 직렬화
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS wallets ("
+            " user_id TEXT PRIMARY KEY,"
+            " address TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS wallets_updated_at ON wallets (updated_at)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id TEXT PRIMARY KEY,"
+            " first_seen REAL NOT NULL)"
+        )
+    
+    def migrate_from_json(self, wallet_file: str, users_file: str):
+        """기존 JSON 파일을 한 번만 가져오고 .migrated 로 이름 변경"""
+        legacy = JsonWalletStorage(wallet_file, users_file)
+        wallets = legacy.load_wallets()
+        users = legacy.load_known_users()
+        if not wallets and not users:
+            return
+        
+        now = time.time()
+        with self.lock:
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO wallets (user_id, address, updated_at) VALUES (?, ?, ?)",
+                    [(user_id, address, now) for user_id, address in wallets.items()]
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, first_seen) VALUES (?, ?)",
+                    [(user_id, now) for user_id in users]
+                )
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                self.conn.execute("ROLLBACK")
+                logging.error(f"JSON -> SQLite 마이그레이션 실패: {e}")
+                return
         
+        for path in (wallet_file, users_file):
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+        logging.info(f"JSON -> SQLite 마이그레이션 완료: 지갑 {len(wallets)}개, 사용자 {len(users)}명")
+    
+    def load_wallets(self) -> Dict[str, str]:
+        with self.lock:
+            return dict(self.conn.execute("SELECT user_id, address FROM wallets"))
+    
+    def load_known_users(self) -> set:
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT user_id FROM users")}
+    
+    def load_wallets_since(self, timestamp: float) -> Dict[str, str]:
+        """timestamp 이후 변경된 지갑 (다른 프로세스 변경분 반영용)"""
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT user_id, address FROM wallets WHERE updated_at >= ?", (timestamp,)
+            ))
+    
+    def get_wallet(self, user_id: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT address FROM wallets WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def count_wallets(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+    
+    def upsert_wallet(self, user_id: str, address: str) -> bool:
         try:
-            # 이더리움 주소 형식 검사 (0x + 40자리 hex)
-            pattern = r'^0x[a-fA-F0-9]{40}$'
-            if not re.match(pattern, address):
+            with self.lock:
+                self.conn.execute(
+                    "INSERT INTO wallets (user_id, address, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET address = excluded.address, "
+                    "updated_at = excluded.updated_at",
+                    (user_id, address, time.time())
+                )
+            return True
+        except Exception as e:
+            logging.error(f"지갑 데이터 저장 실패: {e}")
+            return False
+    
+    def upsert_wallets(self, wallets: Dict[str, str]) -> bool:
+        """여러 지갑을 한 트랜잭션으로 저장 (실패시 전부 롤백)"""
+        now = time.time()
+        with self.lock:
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    "INSERT INTO wallets (user_id, address, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET address = excluded.address, "
+                    "updated_at = excluded.updated_at",
+                    [(user_id, address, now) for user_id, address in wallets.items()]
+                )
+                self.conn.execute("COMMIT")
+                return True
+            except Exception as e:
+                self.conn.execute("ROLLBACK")
+                logging.error(f"지갑 일괄 저장 실패: {e}")
                 return False
-            
-            # Web3를 통한 체크섬 검증
-            return Web3.is_address(address)
-        except Exception:
+    
+    def delete_wallet(self, user_id: str) -> bool:
+        try:
+            with self.lock:
+                self.conn.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
+            return True
+        except Exception as e:
+            logging.error(f"지갑 데이터 삭제 실패: {e}")
+            return False
+    
+    def has_user(self, user_id: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is not None
+    
+    def add_user(self, user_id: str) -> bool:
+        try:
+            with self.lock:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO users (user_id, first_seen) VALUES (?, ?)",
+                    (user_id, time.time())
+                )
+            return True
+        except Exception as e:
+            logging.error(f"사용자 데이터 저장 실패: {e}")
+            return False
+
+def create_wallet_storage():
+    """WALLET_STORAGE 환경변수에 따라 지갑 저장소 생성 (기본: sqlite)"""
+    storage_type = os.getenv('WALLET_STORAGE', 'sqlite').lower()
+    wallet_file = os.getenv('WALLET_FILE', 'wallets.json')
+    users_file = os.getenv('USERS_FILE', 'users.json')
+    
+    if storage_type == 'json':
+        return JsonWalletStorage(wallet_file, users_file)
+    
+    storage = SqliteWalletStorage(os.getenv('WALLET_DB_PATH', 'tx_bot.db'))
+    storage.migrate_from_json(wallet_file, users_file)
+    return storage
+
+class WalletManager:
+    """지갑 주소 관리 클래스
+    
+    지갑 전체를 메모리에 올리지 않고 저장소 조회 앞에 크기 제한 LRU 캐시를 둔다.
+    미등록 사용자(None)도 캐시해서 채팅마다 저장소를 조회하지 않게 한다.
+    """
+    
+    def __init__(self, wallet_file: str = "wallets.json", users_file: str = "users.json",
+                 storage=None, cache_size: int = 10000):
+        self.storage = storage or JsonWalletStorage(wallet_file, users_file)
+        self.synced_at = time.time()
+        self.cache_size = max(1, cache_size)
+        self.cache = OrderedDict()  # user_id -> 주소 (미등록은 None), LRU로 크기 제한
+        self.lock = threading.Lock()
+    
+    """신규 사용자 확인 및 등록 (저장소에서 바로 조회)"""
+    def is_new_user(self, user_id: str) -> bool:
+        if self.storage.has_user(user_id):
             return False
+        self.storage.add_user(user_id)
+        return True
+    
+    """지갑 주소 유효성 검사"""
+    def is_valid_address(self, address: str) -> bool:
+        # 형식 검사 + Web3 체크섬 검증 (결과 캐시)
+        return isinstance(address, str) and checksum_address(address) is not None
     """지갑 주소 등록"""
     def set_wallet(self, user_id: str, wallet_address: str) -> bool:
        
-        if not self.is_valid_address(wallet_address):
-            return False
-        
         # 체크섬 주소로 변환
-        checksum_address = Web3.to_checksum_address(wallet_address)
-        self.wallets[user_id] = checksum_address
+        address = checksum_address(wallet_address) if isinstance(wallet_address, str) else None
+        if not address:
+            return False
         
-        return self._save_wallets()
+        saved = self.storage.upsert_wallet(user_id, address)
+        if saved:
+            self._remember(user_id, address)
+        else:
+            self._forget([user_id])
+        return saved
     """지갑 주소 조회"""
     def get_wallet(self, user_id: str) -> Optional[str]:
-        
-        return self.wallets.get(user_id)
+        with self.lock:
+            if user_id in self.cache:
+                self.cache.move_to_end(user_id)
+                return self.cache[user_id]
+        address = self.storage.get_wallet(user_id)
+        # 조회하는 사이 set_wallet이 먼저 캐시했으면 그 값을 유지
+        return self._remember(user_id, address, overwrite=False)
     """지갑 주소 삭제"""
     def remove_wallet(self, user_id: str) -> bool:
         
-        if user_id in self.wallets:
-            del self.wallets[user_id]
-            return self._save_wallets()
-        return False
-    """모든 지갑 주소 조회"""
+        if self.get_wallet(user_id) is None:
+            return False
+        self._forget([user_id])
+        return self.storage.delete_wallet(user_id)
+    """모든 지갑 주소 조회 (저장소 전체 조회 - 내보내기용)"""
     def get_all_wallets(self) -> Dict[str, str]:
-        return self.wallets.copy()
-
-class TransactionManager:
-    """Base 체인 트랜잭션 관리 클래스"""
+        return self.storage.load_wallets()
     
-    def __init__(self, rpc_url: str, usdc_contract_address: str, private_key: str):
-        self.rpc_url = rpc_url
-        self.usdc_contract_address = Web3.to_checksum_address(usdc_contract_address)
-        self.private_key = private_key
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
-        
-        # USDC 컨트랙트 ABI (transfer 함수만)
-        self.usdc_abi = [
-            {
-                "constant": False,
-                "inputs": [
-                    {"name": "_to", "type": "address"},
-                    {"name": "_value", "type": "uint256"}
-                ],
-                "name": "transfer",
-                "outputs": [{"name": "", "type": "bool"}],
-                "type": "function"
-            },
-            {
-                "constant": True,
-                "inputs": [{"name": "_owner", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "balance", "type": "uint256"}],
-                "type": "function"
-            }
-        ]
+    def count_wallets(self) -> int:
+        return self.storage.count_wallets()
+    
+    def _remember(self, user_id: str, address: Optional[str], overwrite: bool = True) -> Optional[str]:
+        with self.lock:
+            if overwrite or user_id not in self.cache:
+                self.cache[user_id] = address
+            self.cache.move_to_end(user_id)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return self.cache[user_id]
+    
+    def _forget(self, user_ids):
+        with self.lock:
+            for user_id in user_ids:
+                self.cache.pop(user_id, None)
+    
+    def sync_from_storage(self) -> int:
+        """다른 프로세스가 저장한 지갑 반영 (SQLite 저장소만, 변경 시각 기준 증분)"""
+        load_since = getattr(self.storage, 'load_wallets_since', None)
+        if not load_since:
+            return 0
+        started = time.time()
+        # 프로세스 간 시계/트랜잭션 시점 차이를 감안해 1초 겹쳐서 조회
+        changed = load_since(self.synced_at - 1.0)
+        self._forget(changed)
+        self.synced_at = started
+        return len(changed)
+    
+    @staticmethod
+    def parse_wallet_rows(data: str, filename: str = "") -> list:
+        """CSV(user_id,address) 또는 JSON({user_id: address} / [{user_id, address}]) -> [(행 번호, user_id, address)]"""
+        text = data.lstrip('\ufeff').strip()
+        if filename.lower().endswith('.json') or text[:1] in ('{', '['):
+            parsed = json.loads(text)
+            if isinstance(parsed, dict):
+                return [(index, key, value) for index, (key, value) in enumerate(parsed.items(), 1)]
+            return [
+                (index, item.get('user_id'), item.get('address')) if isinstance(item, dict) else (index, None, None)
+                for index, item in enumerate(parsed, 1)
+            ]
         
-        self.usdc_contract = self.w3.eth.contract(
-            address=self.usdc_contract_address,
-            abi=self.usdc_abi
-        )
+        rows = []
+        for index, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if index == 1 and row[0].strip().lower() in ('user_id', 'userid', 'id'):
+                continue  # 헤더
+            rows.append((index, row[0] if row else None, row[1] if len(row) > 1 else None))
+        return rows
+    
+    def import_wallets(self, rows: list) -> Tuple[int, list]:
+        """지갑 일괄 등록 - 검증/체크섬 변환 후 한 번에 저장 (같은 사용자는 마지막 행 적용)
         
-        # 지갑 계정 설정
-        self.account = Account.from_key(private_key)
+        반환: (등록 수, [(행 번호, 원본 값, 거부 사유)])
+        """
+        accepted = {}
+        rejected = []
+        for line, user_id, address in rows:
+            user_id = str(user_id).strip() if user_id is not None else ""
+            if not user_id.lstrip('-').isdigit():
+                rejected.append((line, user_id, "잘못된 사용자 ID"))
+                continue
+            address = checksum_address(address.strip()) if isinstance(address, str) else None
+            if not address:
+                rejected.append((line, user_id, "잘못된 지갑 주소"))
+                continue
+            accepted[user_id] = address
         
-    def is_connected(self) -> bool:
-        """Base 체인 연결 상태 확인"""
-        try:
-            return self.w3.is_connected()
-        except Exception as e:
-            logging.error(f"Base 체인 연결 실패: {e}")
-            return False
+        if accepted:
+            if not self.storage.upsert_wallets(accepted):
+                raise RuntimeError("지갑 일괄 저장 실패 (변경 없음)")
+            self._forget(accepted)
+        logging.info(f"지갑 일괄 등록: {len(accepted)}개 등록, {len(rejected)}행 거부")
+        return len(accepted), rejected
     
-    def should_drop(self, drop_rate: float) -> bool:
-        """랜덤 드랍 여부 결정"""
-        return random.random() < drop_rate
+    def export_wallets(self, fmt: str = "csv") -> str:
+        """등록 지갑 내보내기 (csv: user_id,address / json: wallets.json 형식)"""
+        wallets = self.get_all_wallets()
+        if fmt == "json":
+            return json.dumps(wallets, indent=2, ensure_ascii=False)
+        
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(('user_id', 'address'))
+        writer.writerows(sorted(wallets.items()))
+        return output.getvalue()
+
+class RateState:
+    """드랍 쿨타임 / 일일 한도 상태 (메모리 상한 + 스냅샷으로 재시작 복구)
     
-    def get_usdc_balance(self, address: str) -> float:
-        """USDC 잔고 조회"""
-        try:
-            balance_wei = self.usdc_contract.functions.balanceOf(
-                Web3.to_checksum_address(address)
-            ).call()
-            # USDC는 6자리 소수점
-            return balance_wei / (10 ** 6)
-        except Exception as e:
-            logging.error(f"USDC 잔고 조회 실패: {e}")
+    쿨타임은 bucket_seconds 단위 시간 버킷 휠에 기록하고 쿨타임이 지난 버킷은
+    통째로 비운다. 일일 한도는 UTC 날짜별로 최근 keep_days일만 보관한다.
+    스레드 안전하지 않으므로 호출자 락(state_lock) 안에서 사용한다.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cooldown_seconds: float, bucket_seconds: float = 5.0, keep_days: int = 2):
+        self.cooldown_seconds = cooldown_seconds
+        self.bucket_seconds = bucket_seconds
+        self.keep_days = keep_days
+        self.last_drop = {}  # user_id -> 마지막 드랍 시각 (epoch 초), 쿨타임 중인 사용자만
+        self.buckets = deque()  # (버킷 번호, {user_id}) 시간순
+        self.daily = OrderedDict()  # UTC 날짜 -> {'sent': 예약+대기+확정, 'confirmed': 확정분}
+
+    @staticmethod
+    def day_key(timestamp: float) -> str:
+        """UTC 날짜 키 (YYYY-MM-DD)"""
+        return datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()
+
+    def expire(self, now: float):
+        """쿨타임이 끝난 버킷 비우기"""
+        horizon = int((now - self.cooldown_seconds) // self.bucket_seconds)
+        while self.buckets and self.buckets[0][0] < horizon:
+            index, users = self.buckets.popleft()
+            bucket_end = (index + 1) * self.bucket_seconds
+            for user_id in users:
+                # 이후 다시 드랍 받은 사용자는 새 버킷에 남아 있음
+                if self.last_drop.get(user_id, bucket_end) < bucket_end:
+                    del self.last_drop[user_id]
+
+    def cooldown_remaining(self, user_id: str, now: float) -> float:
+        """남은 쿨타임 (초)"""
+        self.expire(now)
+        last = self.last_drop.get(user_id)
+        if last is None:
             return 0.0
-    
-    def get_optimal_gas_estimate(self, to_address: str, amount: float) -> dict:
-        """실제 전송 전 동적 가스 추정"""
-        try:
-            to_checksum = Web3.to_checksum_address(to_address)
-            amount_wei = int(amount * (10 ** 6))  # USDC 6자리 소수점
-            
-            # 현재 네트워크 상황으로 가스 추정
-            estimated_gas = self.usdc_contract.functions.transfer(
-                to_checksum, amount_wei
-            ).estimate_gas({
-                'from': self.account.address
-            })
-            
-            # Base 공식 문서 기준: ERC-20 전송은 ~65,000 gas
-            base_recommended = 65000
-            
-            # 추정값과 권장값 중 높은 값에 안전 마진 추가
-            optimal_gas = max(estimated_gas, base_recommended)
-            safe_gas = int(optimal_gas * 1.1)  # 10% 안전 마진
-            
-            # 최대 한도 설정 (과도한 가스 방지)
-            max_gas = 100000
-            final_gas = min(safe_gas, max_gas)
-            
-            logging.info(f"가스 추정 결과: 추정={estimated_gas:,}, 권장={base_recommended:,}, 최종={final_gas:,}")
-            
-            return {
-                'estimated': estimated_gas,
-                'recommended': base_recommended,
-                'final': final_gas,
-                'margin': f"{((final_gas - estimated_gas) / estimated_gas * 100):.1f}%"
-            }
-            
-        except Exception as e:
-            logging.warning(f"동적 가스 추정 실패, 기본값 사용: {e}")
-            # 추정 실패시 Base 권장값 + 마진
-            return {
-                'estimated': 0,
-                'recommended': 65000,
-                'final': 71500,  # 65000 * 1.1
-                'margin': '10.0%'
-            }
+        return max(0.0, self.cooldown_seconds - (now - last))
 
-    def send_usdc(self, to_address: str, amount: float, retry_count: int = 0) -> Optional[str]:
-        """USDC 전송 (동적 가스 추정)"""
-        try:
-            to_checksum = Web3.to_checksum_address(to_address)
-            amount_wei = int(amount * (10 ** 6))  # USDC 6자리 소수점
-            
-            # 1단계: 현재 상황에 최적화된 가스 추정
-            gas_info = self.get_optimal_gas_estimate(to_address, amount)
-            optimal_gas = gas_info['final']
-            
-            # 2단계: 가스 가격 동적 조정 (재시도시 증가)
-            base_gas_price = 0.1
-            gas_price = base_gas_price + (retry_count * 0.05)
-            
-            # 3단계: 트랜잭션 구성 (가스 한도 명시적 설정)
-            transaction_params = {
-                'from': self.account.address,
-                'gasPrice': self.w3.to_wei(str(gas_price), 'gwei'),
-                'gas': optimal_gas,  # 동적으로 계산된 최적 가스
-                'nonce': self.w3.eth.get_transaction_count(self.account.address, 'pending'),
-            }
+    def start_cooldown(self, user_id: str, now: float) -> Optional[float]:
+        """쿨타임 시작 - 되돌리기용으로 이전 드랍 시각 반환"""
+        prev = self.last_drop.get(user_id)
+        self.last_drop[user_id] = now
+        index = int(now // self.bucket_seconds)
+        if self.buckets and self.buckets[-1][0] >= index:
+            # 같은 버킷이거나 시계가 거꾸로 간 경우 마지막 버킷에 넣음 (만료만 늦어짐)
+            self.buckets[-1][1].add(user_id)
+        else:
+            self.buckets.append((index, {user_id}))
+        return prev
 
-            # 4단계: 트랜잭션 빌드 및 전송
-            transaction = self.usdc_contract.functions.transfer(
-                to_checksum, amount_wei
-            ).build_transaction(transaction_params)
-            
-            # 트랜잭션 서명 및 전송
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, self.private_key)
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            logging.info(f"USDC 전송 성공: {amount} USDC를 {to_address}로")
-            logging.info(f"가스 정보: {gas_info['margin']} 마진, 한도 {optimal_gas:,}, 해시: {tx_hash.hex()}")
-            return tx_hash.hex()
-            
-        except Exception as e:
-            error_msg = str(e)
-            
-            # underpriced 오류 처리
-            if "underpriced" in error_msg.lower() and retry_count < 3:
-                logging.warning(f"Underpriced 오류, 재시도 {retry_count + 1}/3")
-                import time
-                time.sleep(2)
-                return self.send_usdc(to_address, amount, retry_count + 1)
-            
-            logging.error(f"USDC 전송 실패 (재시도 {retry_count}회): {e}")
-            return None
+    def revert_cooldown(self, user_id: str, reserved_at: float, prev: Optional[float], now: float):
+        """예약한 쿨타임 되돌리기 (이후 다른 드랍이 갱신하지 않았을 때만)"""
+        if self.last_drop.get(user_id) != reserved_at:
+            return
+        if prev is not None and now - prev < self.cooldown_seconds:
+            # 새 버킷에 남아 있으므로 그 버킷이 비워질 때 함께 정리됨
+            self.last_drop[user_id] = prev
+        else:
+            del self.last_drop[user_id]
 
-class USDCDropBot:
-    """USDC 드랍 텔레그램 봇"""
+    def _day(self, day: str) -> dict:
+        entry = self.daily.get(day)
+        if entry is None:
+            entry = self.daily[day] = {'sent': 0.0, 'confirmed': 0.0}
+            # 최근 keep_days일만 보관
+            for old_day in sorted(self.daily)[:-self.keep_days]:
+                del self.daily[old_day]
+        return entry
+
+    def sent(self, day: str) -> float:
+        entry = self.daily.get(day)
+        return entry['sent'] if entry else 0.0
+
+    def confirmed(self, day: str) -> float:
+        entry = self.daily.get(day)
+        return entry['confirmed'] if entry else 0.0
+
+    def reserve(self, day: str, amount: float):
+        self._day(day)['sent'] += amount
+
+    def release(self, day: str, amount: float):
+        entry = self.daily.get(day)
+        if entry:
+            entry['sent'] = max(0.0, entry['sent'] - amount)
+
+    def confirm(self, day: str, amount: float):
+        self._day(day)['confirmed'] += amount
+
+    def restore_day(self, day: str, sent: float, confirmed: float):
+        """원장 재생 결과 반영 (스냅샷과 둘 중 큰 값 - 이미 나간 돈을 한도에서 빠뜨리지 않음)"""
+        entry = self._day(day)
+        entry['sent'] = max(entry['sent'], sent)
+        entry['confirmed'] = max(entry['confirmed'], confirmed)
+
+    def to_dict(self, now: float) -> dict:
+        """스냅샷용 상태 (쿨타임 중인 사용자와 보관 중인 날짜만)"""
+        self.expire(now)
+        return {
+            'version': self.VERSION,
+            'saved_at': now,
+            'cooldowns': dict(self.last_drop),
+            'daily': {day: dict(entry) for day, entry in self.daily.items()},
+        }
+
+    def load_dict(self, data: dict, now: float):
+        """스냅샷 복원 (이미 끝난 쿨타임은 버림)"""
+        if data.get('version') != self.VERSION:
+            raise ValueError(f"지원하지 않는 상태 파일 버전: {data.get('version')}")
+        for user_id, last in sorted(data.get('cooldowns', {}).items(), key=lambda item: item[1]):
+            if now - last < self.cooldown_seconds:
+                self.start_cooldown(user_id, last)
+        for day in sorted(data.get('daily', {})):
+            entry = data['daily'][day]
+            self._day(day).update(sent=float(entry.get('sent', 0.0)), confirmed=float(entry.get('confirmed', 0.0)))
+
+    @staticmethod
+    def write_snapshot(path: str, data: dict):
+        """원자적 파일 교체로 스냅샷 저장 (쓰는 도중 종료돼도 이전 파일 유지)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+class PayoutLedger:
+    """드랍 선기록 원장 (추가 전용 JSONL, 묶음 fsync)
     
-    def __init__(self):
-        # 봇 시작 시간 기록 (과거 메시지 필터링용)
-        self.bot_start_time = datetime.now()
+    드랍마다 reserved -> sent(해시, 논스 - 수수료 인상 교체마다 추가) -> final(확정 결과)
+    또는 released(전송 전 취소)
+    순서로 한 줄씩 기록한다. append는 버퍼에 넣기만 하고, 기록 스레드가
+    commit_interval 동안 모인 줄을 한 번에 쓰고 fsync 한 번으로 디스크에 남긴다.
+    핸들러는 디스크를 기다리지 않고, 전송 워커만 wait_durable로 예약 기록이
+    남은 뒤에 트랜잭션을 보낸다.
+    """
+
+    def __init__(self, path: str, commit_interval: float = 0.02):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.cond = threading.Condition()
+        self.buffer = []
+        self.appended = 0  # 버퍼에 넣은 줄 수 (append가 반환하는 순번)
+        self.durable = 0  # fsync까지 끝난 순번
+        self.file = None
+        self.thread = None
+        self.stopping = False
+        # 재시작 후에도 겹치지 않는 드랍 ID (시작 시각 + 일련번호)
+        self.id_prefix = format(int(time.time() * 1000), 'x')
+        self.id_counter = itertools.count(1)
+
+    def next_id(self) -> str:
+        return f"{self.id_prefix}-{next(self.id_counter)}"
+
+    @staticmethod
+    def replay(path: str) -> dict:
+        """원장 파일을 드랍 ID별 최종 상태로 합침 (쓰다 만 마지막 줄은 무시)
         
-        # 환경변수 로드
-        self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.base_rpc = os.getenv('RPC_URL', 'https://base-mainnet.public.blastapi.io')
-        self.usdc_contract = os.getenv('USDC_CONTRACT_ADDRESS')
-        self.private_key = os.getenv('PRIVATE_KEY')
-        self.drop_rate = float(os.getenv('DROP_RATE', '0.05'))  # 5%
+        {payout_id: {'u', 'n', 'c', 'w', 'a', 'd', 't', 'o': 논스, 'h': [해시], 's': 최종 상태 또는 None}}
+        """
+        entries = {}
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"원장 {line_number}행 손상 - 건너뜀")
+                    continue
+                entry = entries.setdefault(record['id'], {'h': [], 's': None})
+                event = record['e']
+                if event == 'reserved':
+                    entry.update({key: value for key, value in record.items() if key not in ('e', 'id')})
+                elif event == 'sent':
+                    entry['h'].append(record['h'])
+                    if record.get('o') is not None:
+                        entry['o'] = record['o']
+                elif event == 'final':
+                    entry['s'] = record['s']
+                elif event == 'released':
+                    entry['s'] = 'released'
+        # 예약 기록이 없는 항목(압축으로 잘린 이전 기록)은 버림
+        return {payout_id: entry for payout_id, entry in entries.items() if 'a' in entry}
+
+    @staticmethod
+    def entry_lines(payout_id: str, entry: dict) -> list:
+        """합친 항목을 다시 원장 줄로 (압축용)"""
+        reserved = {key: value for key, value in entry.items() if key not in ('h', 's')}
+        lines = [dict(e='reserved', id=payout_id, **reserved)]
+        lines += [{'e': 'sent', 'id': payout_id, 'h': tx_hash} for tx_hash in entry['h']]
+        if entry['s'] == 'released':
+            lines.append({'e': 'released', 'id': payout_id})
+        elif entry['s']:
+            lines.append({'e': 'final', 'id': payout_id, 's': entry['s']})
+        return [json.dumps(line, separators=(',', ':'), ensure_ascii=False) for line in lines]
+
+    def start(self, keep: Optional[dict] = None):
+        """기록 시작 - keep이 있으면 그 항목만 남기도록 원장을 다시 씀 (원자적 교체)"""
+        if keep is not None:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for payout_id, entry in keep.items():
+                    f.write("".join(line + "\n" for line in self.entry_lines(payout_id, entry)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.thread = threading.Thread(target=self._writer, name="payout-ledger", daemon=True)
+        self.thread.start()
+
+    def append(self, event: str, payout_id: str, **fields) -> int:
+        """기록 추가 (버퍼에만 넣음) - 순번 반환"""
+        line = json.dumps(dict(e=event, id=payout_id, **fields), separators=(',', ':'), ensure_ascii=False)
+        with self.cond:
+            self.buffer.append(line)
+            self.appended += 1
+            self.cond.notify_all()
+            return self.appended
+
+    def wait_durable(self, seq: int, timeout: float = 5.0) -> bool:
+        """순번 seq까지 디스크에 남을 때까지 대기 - 기록 실패/종료/시간 초과면 False"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.durable >= seq or self.thread is None, timeout)
+            return self.durable >= seq
+
+    def _writer(self):
+        torn = False  # 직전 기록이 실패해서 마지막 줄이 잘렸을 수 있음
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.buffer or self.stopping)
+                if not self.buffer:
+                    return
+            if self.commit_interval > 0 and not self.stopping:
+                time.sleep(self.commit_interval)  # 묶음 창 - 그 사이 들어온 기록을 같은 fsync로 확정
+            with self.cond:
+                lines, self.buffer = self.buffer, []
+                seq = self.appended
+            try:
+                self.file.write(("\n" if torn else "") + "".join(line + "\n" for line in lines))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                torn = False
+            except Exception as e:
+                # 확정 순번은 그대로 두고 다음 묶음에서 다시 쓴다 - 대기 중인 전송은 시간 초과로 취소된다
+                logging.error(f"원장 기록 실패 ({len(lines)}줄): {e}")
+                torn = True
+                if self.stopping:
+                    return
+                with self.cond:
+                    self.buffer[:0] = lines
+                time.sleep(1)
+                continue
+            with self.cond:
+                self.durable = seq
+                self.cond.notify_all()
+
+    def stop(self):
+        """남은 기록을 모두 쓰고 종료"""
+        if not self.thread:
+            return
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.thread.join(10)
+        with self.cond:
+            self.thread = None
+            self.cond.notify_all()
+        self.file.close()
+
+class RankedList:
+    """순위 조회용 정렬 목록 (sortedcontainers 방식 블록 분할)
+    
+    정렬된 작은 블록들의 목록에 블록 길이 펜윅 트리를 붙여서 삽입/삭제는
+    O(log n + 블록 크기), 순위는 O(log n), 앞에서부터 k개는 O(k)로 처리한다.
+    """
+
+    LOAD = 512
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self.blocks = [items[start:start + self.LOAD] for start in range(0, len(items), self.LOAD)]
+        self._reindex()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reindex(self):
+        """블록 분할/삭제 후 최댓값 목록과 펜윅 트리 재구성 (블록 수에 비례)"""
+        self.maxes = [block[-1] for block in self.blocks]
+        self.size = sum(len(block) for block in self.blocks)
+        self.tree = [0] * (len(self.blocks) + 1)
+        for position, block in enumerate(self.blocks, 1):
+            self.tree[position] += len(block)
+            parent = position + (position & -position)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[position]
+
+    def _add(self, index: int, delta: int):
+        position = index + 1
+        while position < len(self.tree):
+            self.tree[position] += delta
+            position += position & -position
+
+    def _prefix(self, index: int) -> int:
+        """0 ~ index-1번 블록 길이 합"""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def add(self, item):
+        if not self.blocks:
+            self.blocks = [[item]]
+            self._reindex()
+            return
+        index = min(bisect_left(self.maxes, item), len(self.blocks) - 1)
+        block = self.blocks[index]
+        insort(block, item)
+        self.maxes[index] = block[-1]
+        self.size += 1
+        if len(block) > 2 * self.LOAD:
+            self.blocks[index:index + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._reindex()
+        else:
+            self._add(index, 1)
+
+    def remove(self, item):
+        """항목 삭제 (반드시 들어 있는 항목)"""
+        index = bisect_left(self.maxes, item)
+        block = self.blocks[index]
+        del block[bisect_left(block, item)]
+        self.size -= 1
+        if block:
+            self.maxes[index] = block[-1]
+            self._add(index, -1)
+        else:
+            del self.blocks[index]
+            self._reindex()
+
+    def index(self, item) -> int:
+        """item보다 앞에 있는 항목 수"""
+        index = bisect_left(self.maxes, item)
+        if index == len(self.blocks):
+            return self.size
+        return self._prefix(index) + bisect_left(self.blocks[index], item)
+
+    def head(self, k: int) -> list:
+        """앞에서부터 k개"""
+        result = []
+        for block in self.blocks:
+            if len(result) >= k:
+                break
+            result.extend(block[:k - len(result)])
+        return result
+
+class PayoutStats:
+    """확정된 드랍 통계 인덱스 (사용자별/대화방별 누적, UTC 날짜별 집계)
+    
+    드랍이 확정될 때마다 증분 갱신하므로 조회시 이력을 훑지 않는다. 금액은
+    마이크로 USDC 정수로 보관하고, 사용자 순위는 (-누적액, user_id) RankedList로
+    유지해서 상위 k명 조회는 O(k), 내 순위는 O(log n)이다.
+    스레드 안전하지 않으므로 호출자 락(state_lock) 안에서 사용한다.
+    """
+
+    VERSION = 1
+    MICRO = 1_000_000
+
+    def __init__(self, keep_days: int = 35):
+        self.keep_days = keep_days
+        self.users = {}  # user_id -> [누적 마이크로 USDC, 횟수, 마지막 당첨 시각, 이름]
+        self.chats = {}  # chat_id -> [누적 마이크로 USDC, 횟수]
+        self.daily = OrderedDict()  # UTC 날짜 -> [마이크로 USDC, 횟수]
+        self.total = [0, 0]
+        self.ranking = RankedList()  # (-누적 마이크로 USDC, user_id) 오름차순
+        self.dirty = False
+
+    def record(self, user_id: str, user_name: str, chat_id, amount: float, timestamp: float):
+        """확정된 드랍 1건 반영"""
+        micro = int(round(amount * self.MICRO))
+        entry = self.users.get(user_id)
+        if entry:
+            self.ranking.remove((-entry[0], user_id))
+        else:
+            entry = self.users[user_id] = [0, 0, 0.0, ""]
+        entry[0] += micro
+        entry[1] += 1
+        entry[2] = timestamp
+        entry[3] = user_name or entry[3]
+        self.ranking.add((-entry[0], user_id))
+        
+        if chat_id is not None:
+            chat = self.chats.setdefault(str(chat_id), [0, 0])
+            chat[0] += micro
+            chat[1] += 1
+        
+        day = RateState.day_key(timestamp)
+        daily = self.daily.get(day)
+        if daily is None:
+            daily = self.daily[day] = [0, 0]
+            # 최근 keep_days일만 보관
+            for old_day in sorted(self.daily)[:-self.keep_days]:
+                del self.daily[old_day]
+        daily[0] += micro
+        daily[1] += 1
+        self.total[0] += micro
+        self.total[1] += 1
+        self.dirty = True
+
+    def user(self, user_id: str) -> Optional[dict]:
+        """사용자 누적 통계와 순위"""
+        entry = self.users.get(user_id)
+        if not entry:
+            return None
+        return {
+            'amount': entry[0] / self.MICRO,
+            'count': entry[1],
+            'last_win': entry[2],
+            'name': entry[3],
+            'rank': self.ranking.index((-entry[0], user_id)) + 1,
+        }
+
+    def chat(self, chat_id) -> Tuple[float, int]:
+        micro, count = self.chats.get(str(chat_id), (0, 0))
+        return micro / self.MICRO, count
+
+    def top_users(self, k: int) -> list:
+        """상위 k명 [(user_id, 이름, USDC, 횟수)]"""
+        result = []
+        for _, user_id in self.ranking.head(k):
+            micro, count, _, name = self.users[user_id]
+            result.append((user_id, name, micro / self.MICRO, count))
+        return result
+
+    def top_chats(self, k: int) -> list:
+        """누적액 상위 대화방 [(chat_id, USDC, 횟수)] (대화방 수는 적음)"""
+        chats = sorted(self.chats.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [(chat_id, micro / self.MICRO, count) for chat_id, (micro, count) in chats]
+
+    def window(self, days: int, now: float) -> Tuple[float, int]:
+        """오늘 포함 최근 days일 (UTC) 합계 (USDC, 횟수)"""
+        micro = count = 0
+        for offset in range(days):
+            entry = self.daily.get(RateState.day_key(now - offset * 86400))
+            if entry:
+                micro += entry[0]
+                count += entry[1]
+        return micro / self.MICRO, count
+
+    def totals(self) -> Tuple[float, int, int]:
+        """전체 누적 (USDC, 횟수, 수령자 수)"""
+        return self.total[0] / self.MICRO, self.total[1], len(self.users)
+
+    def to_dict(self) -> dict:
+        """스냅샷용 상태 (락 밖에서 저장하도록 복사본)"""
+        return {
+            'version': self.VERSION,
+            'users': {user_id: list(entry) for user_id, entry in self.users.items()},
+            'chats': {chat_id: list(entry) for chat_id, entry in self.chats.items()},
+            'daily': {day: list(entry) for day, entry in self.daily.items()},
+        }
+
+    def load_dict(self, data: dict):
+        if data.get('version') != self.VERSION:
+            raise ValueError(f"지원하지 않는 통계 파일 버전: {data.get('version')}")
+        self.users = {user_id: list(entry) for user_id, entry in data.get('users', {}).items()}
+        self.chats = {chat_id: list(entry) for chat_id, entry in data.get('chats', {}).items()}
+        self.daily = OrderedDict((day, list(data['daily'][day])) for day in sorted(data.get('daily', {})))
+        self.total = [sum(entry[0] for entry in self.users.values()), sum(entry[1] for entry in self.users.values())]
+        self.ranking = RankedList((-entry[0], user_id) for user_id, entry in self.users.items())
+        self.dirty = False
+
+class NonceManager:
+    """핫월렛 논스 로컬 할당기 (전송마다 get_transaction_count 호출 제거)"""
+
+    # 체인 논스와 어긋났음을 뜻하는 노드 오류 메시지
+    RESYNC_ERRORS = ('nonce too low', 'already known')
+
+    def __init__(self, w3, address: str, gap_timeout: float = 60.0):
+        self.w3 = w3
+        self.address = address
+        self.gap_timeout = gap_timeout
+        self.lock = threading.Lock()
+        self.next_nonce = None
+        self.released = set()  # 전송되지 못하고 반환된 논스 (우선 재사용)
+        self.last_allocated_at = 0.0
+
+    def sync(self) -> Optional[int]:
+        """체인의 pending 논스로 재동기화"""
+        with self.lock:
+            return self._sync_locked()
+
+    def _sync_locked(self) -> Optional[int]:
+        try:
+            self.next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            self.released.clear()
+            logging.info(f"논스 동기화: 다음 논스 {self.next_nonce}")
+        except Exception as e:
+            self.next_nonce = None
+            logging.error(f"논스 동기화 실패: {e}")
+        return self.next_nonce
+
+    def allocate(self) -> int:
+        """다음 논스 할당 (스레드 안전)"""
+        with self.lock:
+            now = time.monotonic()
+            # 오래 쉬었으면 외부 전송/드랍된 트랜잭션 반영을 위해 재동기화
+            idle = now - self.last_allocated_at
+            if self.next_nonce is None or (self.last_allocated_at and idle > self.gap_timeout):
+                if self._sync_locked() is None:
+                    raise RuntimeError("논스를 가져올 수 없습니다")
+            self.last_allocated_at = now
+            
+            if self.released:
+                nonce = min(self.released)
+                self.released.discard(nonce)
+                return nonce
+            
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int):
+        """전송되지 않은 논스 반환 (다음 할당에서 빈 자리를 채움)"""
+        with self.lock:
+            if self.next_nonce is None:
+                return
+            if nonce == self.next_nonce - 1:
+                self.next_nonce = nonce
+            elif nonce < self.next_nonce:
+                self.released.add(nonce)
+
+    def needs_sync(self) -> bool:
+        """다음 할당 전에 체인 조회가 필요한지 (비동기 엔진에서 미리 조회용)"""
+        with self.lock:
+            idle = time.monotonic() - self.last_allocated_at
+            return self.next_nonce is None or bool(self.last_allocated_at and idle > self.gap_timeout)
+
+    def reset(self, nonce: int):
+        """외부에서 조회한 pending 논스로 재설정"""
+        with self.lock:
+            self.next_nonce = nonce
+            self.released.clear()
+            self.last_allocated_at = time.monotonic()
+            logging.info(f"논스 동기화: 다음 논스 {nonce}")
+
+    def settle_failed(self, nonce: int, error: Exception, sent: bool):
+        """전송 실패한 논스 정리 (sent: send_raw_transaction까지 호출했는지)
+        
+        호출 전 실패나 노드 거절이면 전파되지 않은 것이 확실하므로 반환해서 빈 자리가 생기지 않게 하고,
+        그 밖의 전송 오류(시간 초과, 연결 끊김 등)는 이미 전파됐을 수 있으므로 pending 기준으로 재동기화한다.
+        """
+        if not sent or self.is_rejection(error):
+            self.release(nonce)
+        else:
+            logging.warning(f"전송 결과 불명 (논스 {nonce}) - 논스 재동기화")
+            self.mark_stale()
+
+    def mark_stale(self):
+        """다음 할당 시 체인에서 다시 가져오도록 표시"""
+        with self.lock:
+            self.next_nonce = None
+            self.released.clear()
+
+    @classmethod
+    def is_resync_error(cls, error_msg: str) -> bool:
+        """논스 재동기화가 필요한 오류인지 확인"""
+        error_msg = error_msg.lower()
+        return any(err in error_msg for err in cls.RESYNC_ERRORS)
+
+    @staticmethod
+    def is_rejection(error: Exception) -> bool:
+        """노드가 JSON-RPC 오류 응답으로 거절했는지 (시간 초과/연결 오류와 달리 전파되지 않은 것이 확실함)"""
+        return isinstance(error, ValueError) and bool(error.args) and isinstance(error.args[0], dict)
+
+class GasLimitCache:
+    """USDC 전송 가스 한도 캐시 (수신자 잔고 슬롯 warm/cold 별 실측값 학습)
+    
+    잔고가 0인 슬롯에 처음 쓰는 전송(cold)은 이미 잔고가 있는 슬롯(warm)보다
+    SSTORE 비용이 커서 따로 관리한다. 한 번 보낸 주소는 warm으로 보지만 그 사이
+    잔고를 비웠을 수 있으므로, 한도는 항상 cold 전송까지 덮게 잡는다.
+    EIP-1559는 한도가 아니라 gasUsed만 청구하므로 여유분은 비용이 들지 않는다.
+    """
+
+    MIN_GAS = 65000  # Base 공식 문서 기준 ERC-20 전송 권장값 (gas_info_from_estimate와 같음)
+    COLD_SSTORE_DELTA = 20000 - 2900  # 0 -> 0 아님 SSTORE와 0 아님 -> 0 아님 SSTORE 차이 (EIP-2929)
+
+    def __init__(self, ttl: float = 600.0, margin: float = 1.1,
+                 max_gas: int = 100000, max_recipients: int = 100000):
+        self.ttl = ttl
+        self.margin = margin
+        self.max_gas = max_gas
+        self.max_recipients = max_recipients
+        self.lock = threading.Lock()
+        self.entries = {}  # kind -> {'gas_used': int, 'updated_at': float}
+        self.warm_recipients = OrderedDict()  # LRU로 크기 제한
+
+    def recipient_kind(self, address: str) -> str:
+        """수신자 잔고 슬롯 상태 ('warm' 또는 'cold')"""
+        with self.lock:
+            if address in self.warm_recipients:
+                self.warm_recipients.move_to_end(address)
+                return 'warm'
+            return 'cold'
+
+    def mark_warm(self, address: str):
+        """전송 완료된 수신자를 warm으로 기록"""
+        with self.lock:
+            self.warm_recipients[address] = True
+            self.warm_recipients.move_to_end(address)
+            while len(self.warm_recipients) > self.max_recipients:
+                self.warm_recipients.popitem(last=False)
+
+    def forget_recipient(self, address: str):
+        """수신자 warm 기록 삭제 (잔고를 비웠을 수 있는 경우)"""
+        with self.lock:
+            self.warm_recipients.pop(address, None)
+
+    def get(self, kind: str) -> Optional[dict]:
+        """캐시된 가스 한도 (없거나 TTL 지나면 None) - 권장값 하한과 cold 전송 비용을 항상 포함"""
+        with self.lock:
+            now = time.monotonic()
+            fresh = {
+                entry_kind: entry for entry_kind, entry in self.entries.items()
+                if now - entry['updated_at'] <= self.ttl
+            }
+            if kind not in fresh:
+                return None
+            gas_used = fresh[kind]['gas_used']
+            source = fresh[kind]['source']
+        # warm 실측치에는 cold SSTORE 차이를 더해서 잔고를 비운 수신자도 가스 부족으로 실패하지 않게 함
+        covered = max(
+            fresh['cold']['gas_used'] if 'cold' in fresh else 0,
+            fresh['warm']['gas_used'] + self.COLD_SSTORE_DELTA if 'warm' in fresh else 0
+        )
+        recommended = max(covered, self.MIN_GAS)
+        final_gas = min(int(recommended * self.margin), self.max_gas)
+        return {
+            'estimated': gas_used,
+            'recommended': recommended,
+            'final': final_gas,
+            'margin': f"{(self.margin - 1) * 100:.1f}% (실측 {source})",
+            'kind': kind
+        }
+
+    def observe(self, kind: str, gas_used: int, source: str = 'receipt'):
+        """실측(또는 추정) 가스 사용량 반영 - TTL 안에서는 최댓값 유지"""
+        if gas_used <= 0:
+            return
+        GAS_UNITS.observe(gas_used, kind, source)
+        with self.lock:
+            now = time.monotonic()
+            entry = self.entries.get(kind)
+            if entry and now - entry['updated_at'] <= self.ttl and entry['gas_used'] >= gas_used:
+                return
+            self.entries[kind] = {'gas_used': gas_used, 'updated_at': now, 'source': source}
+
+    def learn_from_receipt(self, kind: Optional[str], recipient: Optional[str], receipt) -> bool:
+        """영수증 반영 - 성공이면 실측 gasUsed 학습, 실패면 캐시 초기화"""
+        if receipt['status'] == 1:
+            if kind:
+                self.observe(kind, receipt['gasUsed'])
+                self.mark_warm(recipient)
+            return True
+        
+        tx_hash = receipt['transactionHash']
+        if not isinstance(tx_hash, str):
+            tx_hash = tx_hash.hex()
+        logging.warning(f"트랜잭션 실패 (가스 사용 {receipt['gasUsed']:,}): {tx_hash} - 가스 캐시 초기화")
+        if kind:
+            self.invalidate(kind)
+            self.forget_recipient(recipient)
+        return False
+
+    def invalidate(self, kind: Optional[str] = None):
+        """캐시 무효화 (실패한 트랜잭션 이후 재추정 유도)"""
+        with self.lock:
+            if kind is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(kind, None)
+
+class FeeOracle:
+    """EIP-1559 수수료 오라클 (eth_feeHistory 표본을 캐시해두고 백그라운드 갱신)"""
+
+    def __init__(self, w3, block_count: int = 10, percentile: int = 50,
+                 min_priority_gwei: float = 0.001, max_fee_gwei: float = 1.0,
+                 base_fee_multiplier: float = 2.0):
+        self.w3 = w3
+        self.block_count = block_count
+        self.percentile = percentile
+        self.min_priority_wei = Web3.to_wei(min_priority_gwei, 'gwei')
+        self.max_fee_wei = Web3.to_wei(max_fee_gwei, 'gwei')
+        self.base_fee_multiplier = base_fee_multiplier
+        self.lock = threading.Lock()
+        self.snapshot = None  # {'base_fee': int, 'priority_fee': int, 'updated_at': float}
+
+    def refresh(self) -> bool:
+        """eth_feeHistory로 수수료 표본 갱신"""
+        try:
+            history = self.w3.eth.fee_history(self.block_count, 'latest', [self.percentile])
+            self.update_from_history(history)
+            return True
+        except Exception as e:
+            logging.warning(f"수수료 표본 갱신 실패: {e}")
+            return False
+
+    def update_from_history(self, history: dict):
+        """feeHistory 응답으로 표본 교체"""
+        # baseFeePerGas 마지막 값은 다음 블록의 base fee
+        base_fee = history['baseFeePerGas'][-1]
+        rewards = sorted(r[0] for r in history.get('reward', []) if r)
+        priority_fee = rewards[len(rewards) // 2] if rewards else 0
+        priority_fee = max(priority_fee, self.min_priority_wei)
+        with self.lock:
+            self.snapshot = {
+                'base_fee': base_fee,
+                'priority_fee': priority_fee,
+                'updated_at': time.monotonic()
+            }
+
+    def get_fees(self, bump_level: int = 0) -> dict:
+        """maxFeePerGas / maxPriorityFeePerGas 계산 (bump_level마다 12.5% 인상)"""
+        with self.lock:
+            snapshot = self.snapshot
+        if snapshot is None:
+            # 백그라운드 갱신 전 첫 전송에서만 동기 조회
+            self.refresh()
+            with self.lock:
+                snapshot = self.snapshot
+        return self.fees_from_snapshot(snapshot, bump_level)
+
+    def fees_from_snapshot(self, snapshot: Optional[dict], bump_level: int = 0) -> dict:
+        if snapshot is None:
+            raise RuntimeError("수수료 정보를 가져올 수 없습니다")
+        
+        factor = 1.125 ** bump_level
+        priority_fee = int(snapshot['priority_fee'] * factor)
+        max_fee = int((snapshot['base_fee'] * self.base_fee_multiplier) * factor) + priority_fee
+        max_fee = min(max_fee, self.max_fee_wei)
+        priority_fee = min(priority_fee, max_fee)
+        return {
+            'maxFeePerGas': max_fee,
+            'maxPriorityFeePerGas': priority_fee
+        }
+
+    def max_cost_wei(self, gas_limit: int) -> int:
+        """가스 한도만큼 쓸 때 최대 수수료 (표본이 없으면 0, RPC 호출 없음)"""
+        with self.lock:
+            snapshot = self.snapshot
+        if snapshot is None:
+            return 0
+        return self.fees_from_snapshot(snapshot)['maxFeePerGas'] * gas_limit
+
+    def bump_transaction(self, transaction: dict, bump_level: int) -> dict:
+        """같은 논스 교체용 트랜잭션 (기존보다 최소 12.5% 높은 수수료)"""
+        transaction = dict(transaction)
+        fees = self.get_fees(bump_level)
+        # 교체 트랜잭션은 기존보다 최소 10% 이상 높아야 노드가 받아줌
+        for key in ('maxFeePerGas', 'maxPriorityFeePerGas'):
+            transaction[key] = max(fees[key], int(transaction[key] * 1.125) + 1)
+        return transaction
+
+class BalanceMonitor:
+    """핫월렛 잔고 캐시 (USDC / 가스용 ETH)
+    
+    체인 잔고는 주기적으로 다시 읽고, 그 사이에는 예약된 드랍 금액과 최대 가스비를
+    대기분으로 빼서 보낼 수 없는 드랍은 RPC 호출 전에 걸러낸다. 잔고가 기준 아래로
+    내려가면 on_alert(usdc, eth_wei)를 한 번 호출한다 (기준 위로 회복되면 다시 활성).
+    """
+
+    def __init__(self, alert_usdc: float = 1.0, alert_eth: float = 0.0005, on_alert=None):
+        self.alert_usdc = alert_usdc
+        self.alert_eth_wei = Web3.to_wei(alert_eth, 'ether')
+        self.on_alert = on_alert
+        self.lock = threading.Lock()
+        self.usdc = None  # 마지막 조회 잔고 (확정된 드랍은 다음 조회 전까지 직접 차감)
+        self.eth_wei = None
+        self.pending_usdc = 0.0  # 예약 후 아직 확정되지 않은 드랍
+        self.pending_gas_wei = 0
+        self.alerted = False
+
+    def update(self, usdc: float, eth_wei: int):
+        """체인 잔고 반영"""
+        with self.lock:
+            self.usdc = usdc
+            self.eth_wei = eth_wei
+            low = usdc < self.alert_usdc or eth_wei < self.alert_eth_wei
+            fire = low and not self.alerted
+            self.alerted = low
+        if fire and self.on_alert:
+            try:
+                self.on_alert(usdc, eth_wei)
+            except Exception as e:
+                logging.error(f"잔고 부족 알림 실패: {e}")
+
+    def available(self) -> Optional[Tuple[float, int]]:
+        """대기분을 뺀 사용 가능 잔고 (USDC, ETH wei) - 아직 조회 전이면 None"""
+        with self.lock:
+            if self.usdc is None:
+                return None
+            return self.usdc - self.pending_usdc, self.eth_wei - self.pending_gas_wei
+
+    def reserve(self, amount: float, gas_wei: int) -> bool:
+        """드랍 금액과 가스비 예약 (잔고가 모자라면 False)"""
+        with self.lock:
+            if self.usdc is not None:
+                if (self.usdc - self.pending_usdc < amount
+                        or self.eth_wei - self.pending_gas_wei < gas_wei):
+                    return False
+            self.pending_usdc += amount
+            self.pending_gas_wei += gas_wei
+            return True
+
+    def release(self, amount: float, gas_wei: int):
+        """전송 실패한 드랍의 예약 취소"""
+        with self.lock:
+            self.pending_usdc = max(0.0, self.pending_usdc - amount)
+            self.pending_gas_wei = max(0, self.pending_gas_wei - gas_wei)
+
+    def settle(self, amount: float, gas_wei: int):
+        """확정된 드랍을 잔고에서 차감 (다음 조회 전까지의 추정치)"""
+        self.release(amount, gas_wei)
+        with self.lock:
+            if self.usdc is not None:
+                self.usdc -= amount
+                self.eth_wei -= gas_wei
+
+class InflightTracker:
+    """블록 포함 대기 중인 트랜잭션 목록 (논스 -> 정보)"""
+
+    def __init__(self, stuck_seconds: float = 30.0, max_bumps: int = 5, max_age: float = 600.0):
+        self.stuck_seconds = stuck_seconds
+        self.max_bumps = max_bumps
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.records = {}
+        self.on_bump = None  # on_bump(nonce, tx_hash) - 교체 전송마다 호출 (원장 기록용)
+
+    def track(self, nonce: int, transaction: dict, tx_hash: str,
+              gas_kind: Optional[str] = None, recipient: Optional[str] = None, on_final=None):
+        """블록 포함 확인 대상으로 등록
+        
+        on_final(status, tx_hash)는 확정('confirmed'), 실패('failed'),
+        미포함('dropped' - 다른 트랜잭션이 논스를 사용) 중 하나로 추적이 끝날 때 한 번 호출된다.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.records[nonce] = {
+                'transaction': transaction,
+                'hashes': [tx_hash],
+                'gas_kind': gas_kind,
+                'recipient': recipient,
+                'on_final': on_final,
+                'sent_at': now,
+                'bumped_at': now,
+                'bumps': 0
+            }
+
+    def items(self) -> list:
+        with self.lock:
+            return list(self.records.items())
+
+    def remove(self, nonce: int):
+        with self.lock:
+            self.records.pop(nonce, None)
+
+    def settle(self, nonce: int, record: dict, status: str, tx_hash: Optional[str] = None):
+        """추적 종료 및 결과 콜백 호출"""
+        self.remove(nonce)
+        callback = record.get('on_final')
+        if callback:
+            try:
+                callback(status, tx_hash or record['hashes'][-1])
+            except Exception as e:
+                logging.error(f"트랜잭션 확정 콜백 실패 (논스 {nonce}): {e}")
+
+    @staticmethod
+    def pick_receipt(record: dict, receipts: dict):
+        """교체 전송 포함 해시들 중 블록에 포함된 영수증 (최신 해시 우선)"""
+        for tx_hash in reversed(record['hashes']):
+            receipt = receipts.get(tx_hash)
+            if receipt is not None:
+                return tx_hash, receipt
+        return None, None
+
+    def is_expired(self, record: dict) -> bool:
+        return time.monotonic() - record['sent_at'] > self.max_age
+
+    def is_dropped(self, nonce: int, record: dict, latest_nonce: Optional[int]) -> bool:
+        """영수증 없이 시간이 지났고 계정 latest 논스가 이미 이 논스를 지났는지
+        
+        latest_nonce는 영수증 조회보다 먼저 읽은 값이어야 한다 (그 사이 포함된
+        트랜잭션을 미포함으로 오판하지 않게). 논스가 아직 소비되지 않았으면 멤풀에
+        남아 나중에 포함될 수 있으므로 예약을 유지하고 계속 확인/교체한다.
+        """
+        return self.is_expired(record) and latest_nonce is not None and latest_nonce > nonce
+
+    def needs_latest_nonce(self, records: list) -> bool:
+        return any(self.is_expired(record) for _, record in records)
+
+    def needs_bump(self, record: dict) -> bool:
+        return (time.monotonic() - record['bumped_at'] > self.stuck_seconds
+                and record['bumps'] < self.max_bumps)
+
+    def record_bump(self, record: dict, transaction: Optional[dict] = None, tx_hash: Optional[str] = None):
+        """교체 전송 결과 반영 (실패시 다음 시도까지 대기만 갱신)"""
+        with self.lock:
+            if tx_hash:
+                record['transaction'] = transaction
+                record['hashes'].append(tx_hash)
+                record['bumps'] += 1
+            record['bumped_at'] = time.monotonic()
+        if tx_hash and self.on_bump:
+            try:
+                self.on_bump(transaction['nonce'], tx_hash)
+            except Exception as e:
+                logging.error(f"교체 전송 기록 실패 (논스 {transaction['nonce']}): {e}")
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.records)
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """여러 RPC 엔드포인트를 묶은 web3 프로바이더
+    
+    엔드포인트마다 keep-alive 세션을 유지하고 응답 시간/오류율을 지수이동평균으로
+    기록한다. 조회는 점수가 가장 좋은 노드부터 시도하고 실패하면 다음 노드로 넘어가며,
+    서명된 트랜잭션은 상위 여러 노드에 동시에 전송한다.
+    """
+
+    BROADCAST_METHODS = ('eth_sendRawTransaction',)
+    NODE_LIMIT_ERRORS = ('rate limit', 'limit exceeded', 'too many requests')
+    UNKNOWN_LATENCY = 0.5  # 아직 측정되지 않은 노드의 가정 응답 시간 (초)
+
+    def __init__(self, urls: list, timeout: float = 10.0, broadcast_fanout: int = 3,
+                 failure_threshold: int = 3, failure_cooldown: float = 30.0,
+                 max_block_lag: int = 5, pool_size: int = 20, alpha: float = 0.2):
+        super().__init__()
+        if not urls:
+            raise ValueError("RPC 엔드포인트가 설정되지 않았습니다.")
+        self.timeout = timeout
+        self.broadcast_fanout = max(1, broadcast_fanout)
+        self.failure_threshold = failure_threshold
+        self.failure_cooldown = failure_cooldown
+        self.max_block_lag = max_block_lag
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.endpoints = [self._make_endpoint(url, pool_size) for url in urls]
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(self.broadcast_fanout, len(self.endpoints)),
+            thread_name_prefix="rpc-pool"
+        )
+
+    def __str__(self):
+        return f"RPC pool {[endpoint['url'] for endpoint in self.endpoints]}"
+
+    @staticmethod
+    def _make_endpoint(url: str, pool_size: int) -> dict:
+        # 노드마다 세션 하나를 재사용해서 TCP/TLS 연결을 유지
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return {
+            'url': url,
+            'session': session,
+            'latency': None,  # 응답 시간 지수이동평균 (초)
+            'error_rate': 0.0,  # 오류율 지수이동평균 (0~1)
+            'calls': 0,
+            'errors': 0,
+            'consecutive_failures': 0,
+            'down_until': 0.0,
+            'block_number': None,
+            'lagging': False,
+        }
+
+    def _score(self, endpoint: dict, now: float) -> tuple:
+        """정렬 키 (장애 노드, 뒤처진 노드 순으로 밀리고 그 안에서는 오류 가중 응답 시간순)"""
+        latency = endpoint['latency'] if endpoint['latency'] is not None else self.UNKNOWN_LATENCY
+        return (
+            endpoint['down_until'] > now,
+            endpoint['lagging'],
+            latency * (1 + 10 * endpoint['error_rate']),
+        )
+
+    def ranked(self) -> list:
+        """점수순 엔드포인트 목록 (장애 노드도 마지막 후보로 남김)"""
+        now = time.monotonic()
+        with self.lock:
+            return sorted(self.endpoints, key=lambda endpoint: self._score(endpoint, now))
+
+    def _record(self, endpoint: dict, elapsed: float, ok: bool):
+        with self.lock:
+            endpoint['calls'] += 1
+            if endpoint['latency'] is None:
+                endpoint['latency'] = elapsed
+            else:
+                endpoint['latency'] += self.alpha * (elapsed - endpoint['latency'])
+            endpoint['error_rate'] += self.alpha * ((0.0 if ok else 1.0) - endpoint['error_rate'])
+            if ok:
+                endpoint['consecutive_failures'] = 0
+                endpoint['down_until'] = 0.0
+                return
+            endpoint['errors'] += 1
+            endpoint['consecutive_failures'] += 1
+            if endpoint['consecutive_failures'] >= self.failure_threshold:
+                endpoint['down_until'] = time.monotonic() + self.failure_cooldown
+
+    def _check_limit(self, result):
+        error = result.get('error') if isinstance(result, dict) else None
+        if error and any(text in str(error).lower() for text in self.NODE_LIMIT_ERRORS):
+            raise ValueError(f"노드 요청 제한: {error}")
+
+    def _post(self, endpoint: dict, request_data: bytes):
+        """엔드포인트 하나에 JSON-RPC 요청 (전송/HTTP 오류와 노드 제한 오류는 예외)"""
+        started = time.monotonic()
+        try:
+            response = endpoint['session'].post(
+                endpoint['url'],
+                data=request_data,
+                headers={'Content-Type': 'application/json'},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            result = self.decode_rpc_response(response.content)
+            for item in (result if isinstance(result, list) else [result]):
+                self._check_limit(item)
+        except Exception:
+            self._record(endpoint, time.monotonic() - started, ok=False)
+            raise
+        self._record(endpoint, time.monotonic() - started, ok=True)
+        return result
+
+    def _request(self, endpoint: dict, method: str, params) -> dict:
+        return self._post(endpoint, self.encode_rpc_request(method, params))
+
+    def make_batch_request(self, calls: list) -> list:
+        """JSON-RPC 배치 요청 1회 - calls: [(method, params), ...], 결과는 요청 순서대로"""
+        method = "batch:" + ",".join(sorted({method for method, _ in calls}))
+        with RPC_SECONDS.time(method):
+            try:
+                return self._batch_failover(calls)
+            except Exception:
+                RPC_ERRORS.inc(method)
+                raise
+
+    def _batch_failover(self, calls: list) -> list:
+        request_data = json.dumps([
+            {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': index}
+            for index, (method, params) in enumerate(calls)
+        ]).encode()
+        
+        last_error = None
+        for endpoint in self.ranked():
+            try:
+                responses = self._post(endpoint, request_data)
+                if not isinstance(responses, list):
+                    raise ValueError(f"배치 요청 거부: {responses.get('error')}")
+                by_id = {response.get('id'): response for response in responses}
+                return [by_id.get(index, {}) for index in range(len(calls))]
+            except Exception as e:
+                last_error = e
+                logging.warning(f"RPC 배치 요청 실패 ({endpoint['url']}, {len(calls)}건): {e}")
+        raise last_error
+
+    def make_request(self, method, params):
+        with RPC_SECONDS.time(method):
+            try:
+                if method in self.BROADCAST_METHODS:
+                    return self._broadcast(method, params)
+                return self._failover(method, params)
+            except Exception:
+                RPC_ERRORS.inc(method)
+                raise
+
+    def _failover(self, method: str, params) -> dict:
+        last_error = None
+        for endpoint in self.ranked():
+            try:
+                return self._request(endpoint, method, params)
+            except Exception as e:
+                last_error = e
+                logging.warning(f"RPC 요청 실패 ({endpoint['url']}, {method}): {e}")
+        raise last_error
+
+    def _broadcast(self, method: str, params) -> dict:
+        """상위 노드 여러 곳에 동시 전송 - 하나라도 받아들이면 성공"""
+        targets = self.ranked()[:self.broadcast_fanout]
+        futures = {self.executor.submit(self._request, endpoint, method, params): endpoint for endpoint in targets}
+        
+        error_response = None
+        last_error = None
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                logging.warning(f"트랜잭션 전파 실패 ({futures[future]['url']}): {e}")
+                continue
+            if 'error' not in result:
+                return result
+            if error_response is None:
+                error_response = result
+        
+        # 모든 노드가 거절하면 첫 번째 노드 오류를 그대로 전달 (nonce too low 등 판별용)
+        if error_response is not None:
+            return error_response
+        raise last_error
+
+    def probe(self):
+        """모든 엔드포인트 블록 높이 조회 (응답 점수 갱신 및 뒤처진 노드 표시)"""
+        futures = {
+            self.executor.submit(self._request, endpoint, 'eth_blockNumber', []): endpoint
+            for endpoint in self.endpoints
+        }
+        for future in as_completed(futures):
+            endpoint = futures[future]
+            try:
+                result = future.result()
+                endpoint['block_number'] = int(result['result'], 16)
+            except Exception as e:
+                logging.warning(f"RPC 상태 확인 실패 ({endpoint['url']}): {e}")
+        
+        heights = [endpoint['block_number'] for endpoint in self.endpoints if endpoint['block_number'] is not None]
+        if not heights:
+            return
+        best = max(heights)
+        with self.lock:
+            for endpoint in self.endpoints:
+                height = endpoint['block_number']
+                endpoint['lagging'] = height is None or best - height > self.max_block_lag
+
+    def stats(self) -> list:
+        """엔드포인트별 통계 (점수순)"""
+        now = time.monotonic()
+        with self.lock:
+            ranked = sorted(self.endpoints, key=lambda endpoint: self._score(endpoint, now))
+            return [
+                {
+                    'url': endpoint['url'],
+                    'latency_ms': round(endpoint['latency'] * 1000, 1) if endpoint['latency'] is not None else None,
+                    'error_rate': round(endpoint['error_rate'], 3),
+                    'calls': endpoint['calls'],
+                    'errors': endpoint['errors'],
+                    'block_number': endpoint['block_number'],
+                    'lagging': endpoint['lagging'],
+                    'down': endpoint['down_until'] > now,
+                }
+                for endpoint in ranked
+            ]
+
+class TransferBuilder:
+    """USDC transfer 트랜잭션 로컬 빌더 (동기/비동기 엔진 공통)
+    
+    selector와 인자를 직접 이어 붙여 calldata를 만들고, 체인 ID는 한 번 조회한 값을
+    쓴다. 가스 한도/수수료/논스가 모두 로컬에 있으면 드랍당 네트워크 호출은
+    send_raw_transaction 한 번뿐이다.
+    """
+
+    TRANSFER_SELECTOR = "a9059cbb"  # keccak256("transfer(address,uint256)")[:4]
+
+    def __init__(self, token_address: str, chain_id: Optional[int] = None):
+        self.token_address = token_address
+        self.chain_id = chain_id
+
+    @classmethod
+    def transfer_data(cls, to_address: str, amount_wei: int) -> str:
+        """transfer(to, amount) calldata (주소/금액을 32바이트 워드로 인코딩)"""
+        if not 0 <= amount_wei < 2 ** 256:
+            raise ValueError(f"잘못된 전송 금액: {amount_wei}")
+        return "0x" + cls.TRANSFER_SELECTOR + to_address[2:].lower().rjust(64, "0") + format(amount_wei, "064x")
+
+    def build(self, to: str, data: str, nonce: int, gas: int, fees: dict) -> dict:
+        """서명 가능한 EIP-1559 트랜잭션 dict"""
+        return {
+            'type': 2,
+            'chainId': self.chain_id,
+            'nonce': nonce,
+            'to': to,
+            'value': 0,
+            'data': data,
+            'gas': gas,
+            'maxFeePerGas': fees['maxFeePerGas'],
+            'maxPriorityFeePerGas': fees['maxPriorityFeePerGas'],
+        }
+
+class TransactionManager:
+    """Base 체인 트랜잭션 관리 클래스"""
+    
+    def __init__(self, rpc_url: str, usdc_contract_address: str, private_key: str,
+                 batch_contract_address: Optional[str] = None, rpc_urls: Optional[list] = None):
+        self.rpc_url = rpc_url
+        self.usdc_contract_address = Web3.to_checksum_address(usdc_contract_address)
+        self.private_key = private_key
+        
+        # RPC 노드 풀 (조회는 가장 빠른 정상 노드로, 트랜잭션은 여러 노드로 전파)
+        self.rpc_pool = PooledHTTPProvider(
+            rpc_urls or [rpc_url],
+            timeout=float(os.getenv('RPC_TIMEOUT', '10')),
+            broadcast_fanout=int(os.getenv('RPC_BROADCAST_FANOUT', '3'))
+        )
+        self.w3 = Web3(self.rpc_pool)
+        
+        # USDC 컨트랙트 ABI (transfer 함수만)
+        self.usdc_abi = USDC_ABI
+        
+        # 멀티 전송 컨트랙트 ABI (Disperse 호환 disperseToken 함수만)
+        self.batch_abi = BATCH_ABI
+        
+        self.usdc_contract = self.w3.eth.contract(
+            address=self.usdc_contract_address,
+            abi=self.usdc_abi
+        )
+        
+        # 멀티 전송 컨트랙트 (설정된 경우에만 일괄 전송 사용)
+        self.batch_contract = None
+        self.batch_allowance = 0  # 멀티 전송 컨트랙트에 남은 승인액 추정치 (wei)
+        self.batch_allowance_target = 0
+        self.batch_allowance_topping = False
+        self.allowance_lock = threading.Lock()
+        if batch_contract_address:
+            self.batch_contract = self.w3.eth.contract(
+                address=Web3.to_checksum_address(batch_contract_address),
+                abi=self.batch_abi
+            )
+        
+        # 지갑 계정 설정
+        self.account = Account.from_key(private_key)
+        
+        # 체인 ID는 시작시 한 번만 조회 (트랜잭션은 로컬에서 구성/서명)
+        self.builder = TransferBuilder(self.usdc_contract_address, self.w3.eth.chain_id)
+        
+        # 논스는 시작시 한 번만 조회하고 이후 로컬에서 할당
+        self.nonce_manager = NonceManager(
+            self.w3,
+            self.account.address,
+            gap_timeout=float(os.getenv('NONCE_GAP_TIMEOUT', '60'))
+        )
+        self.nonce_manager.sync()
+        
+        # 가스 한도 캐시 (캐시 적중시 estimate_gas 생략)
+        self.gas_cache = GasLimitCache(ttl=float(os.getenv('GAS_CACHE_TTL', '600')))
+        
+        # EIP-1559 수수료 오라클 (스케줄러에서 주기 갱신)
+        self.fee_oracle = FeeOracle(
+            self.w3,
+            min_priority_gwei=float(os.getenv('MIN_PRIORITY_FEE_GWEI', '0.001')),
+            max_fee_gwei=float(os.getenv('MAX_FEE_GWEI', '1.0'))
+        )
+        
+        # 블록 포함 대기 중인 트랜잭션: 가스 실측 학습 및 수수료 인상 대상
+        self.inflight = InflightTracker(
+            stuck_seconds=float(os.getenv('FEE_BUMP_AFTER_SECONDS', '30')),
+            max_bumps=int(os.getenv('MAX_FEE_BUMPS', '5'))
+        )
+        self.receipt_batch_size = int(os.getenv('RECEIPT_BATCH_SIZE', '100'))
+        
+        # 핫월렛 잔고 캐시 (스케줄러에서 주기 갱신, 드랍 결정시 RPC 없이 확인)
+        self.balance_monitor = BalanceMonitor(
+            alert_usdc=float(os.getenv('LOW_BALANCE_USDC', '1.0')),
+            alert_eth=float(os.getenv('LOW_BALANCE_ETH', '0.0005'))
+        )
+        
+    def is_connected(self) -> bool:
+        """Base 체인 연결 상태 확인"""
+        try:
+            return self.w3.is_connected()
+        except Exception as e:
+            logging.error(f"Base 체인 연결 실패: {e}")
+            return False
+    
+    def should_drop(self, drop_rate: float) -> bool:
+        """랜덤 드랍 여부 결정"""
+        return random.random() < drop_rate
+    
+    def get_usdc_balance(self, address: str) -> float:
+        """USDC 잔고 조회"""
+        try:
+            balance_wei = self.usdc_contract.functions.balanceOf(
+                Web3.to_checksum_address(address)
+            ).call()
+            # USDC는 6자리 소수점
+            return balance_wei / (10 ** 6)
+        except Exception as e:
+            logging.error(f"USDC 잔고 조회 실패: {e}")
+            return 0.0
+    
+    def refresh_balances(self) -> bool:
+        """핫월렛 USDC/ETH 잔고를 배치 요청 1회로 갱신"""
+        try:
+            responses = self.rpc_pool.make_batch_request([
+                ('eth_call', [{
+                    'to': self.usdc_contract_address,
+                    'data': self.usdc_contract.encodeABI(fn_name='balanceOf', args=[self.account.address])
+                }, 'latest']),
+                ('eth_getBalance', [self.account.address, 'latest']),
+            ])
+            usdc_wei = int(responses[0]['result'], 16)
+            eth_wei = int(responses[1]['result'], 16)
+        except Exception as e:
+            logging.warning(f"핫월렛 잔고 조회 실패: {e}")
+            return False
+        self.balance_monitor.update(usdc_wei / (10 ** 6), eth_wei)
+        return True
+    
+    def get_optimal_gas_estimate(self, to_address: str, amount: float) -> dict:
+        """실제 전송 전 동적 가스 추정"""
+        try:
+            to_checksum = Web3.to_checksum_address(to_address)
+            amount_wei = int(amount * (10 ** 6))  # USDC 6자리 소수점
+            
+            # 현재 네트워크 상황으로 가스 추정
+            estimated_gas = self.usdc_contract.functions.transfer(
+                to_checksum, amount_wei
+            ).estimate_gas({
+                'from': self.account.address
+            })
+            return self.gas_info_from_estimate(estimated_gas)
+            
+        except Exception as e:
+            logging.warning(f"동적 가스 추정 실패, 기본값 사용: {e}")
+            return self.default_gas_info()
+
+    @staticmethod
+    def gas_info_from_estimate(estimated_gas: int) -> dict:
+        """estimate_gas 결과에 권장값/안전 마진 적용"""
+        # Base 공식 문서 기준: ERC-20 전송은 ~65,000 gas
+        base_recommended = 65000
+        
+        # 추정값과 권장값 중 높은 값에 안전 마진 추가
+        optimal_gas = max(estimated_gas, base_recommended)
+        safe_gas = int(optimal_gas * 1.1)  # 10% 안전 마진
+        
+        # 최대 한도 설정 (과도한 가스 방지)
+        max_gas = 100000
+        final_gas = min(safe_gas, max_gas)
+        
+        logging.info(f"가스 추정 결과: 추정={estimated_gas:,}, 권장={base_recommended:,}, 최종={final_gas:,}")
+        
+        return {
+            'estimated': estimated_gas,
+            'recommended': base_recommended,
+            'final': final_gas,
+            'margin': f"{((final_gas - estimated_gas) / estimated_gas * 100):.1f}%"
+        }
+
+    @staticmethod
+    def default_gas_info() -> dict:
+        """추정 실패시 Base 권장값 + 마진"""
+        return {
+            'estimated': 0,
+            'recommended': 65000,
+            'final': 71500,  # 65000 * 1.1
+            'margin': '10.0%'
+        }
+
+    def get_gas_limit(self, to_address: str, amount: float) -> dict:
+        """가스 한도 결정 (캐시 우선, 없을 때만 estimate_gas)"""
+        kind = self.gas_cache.recipient_kind(to_address)
+        gas_info = self.gas_cache.get(kind)
+        if gas_info:
+            return gas_info
+        
+        gas_info = self.get_optimal_gas_estimate(to_address, amount)
+        gas_info['kind'] = kind
+        self.gas_cache.observe(kind, gas_info['estimated'], source='estimate_gas')
+        return gas_info
+    
+    def send_usdc(self, to_address: str, amount: float, on_final=None, on_sent=None) -> Optional[str]:
+        """USDC 전송 (캐시된 가스 한도 사용, 확정 결과는 on_final로 통지)"""
+        try:
+            to_checksum = checksum_address(to_address)
+            if not to_checksum:
+                raise ValueError(f"잘못된 지갑 주소: {to_address}")
+            amount_wei = int(amount * (10 ** 6))  # USDC 6자리 소수점
+            
+            # 1단계: 가스 한도 (캐시 적중시 RPC 없음)
+            gas_info = self.get_gas_limit(to_checksum, amount)
+            data = TransferBuilder.transfer_data(to_checksum, amount_wei)
+        except Exception as e:
+            logging.error(f"USDC 전송 준비 실패: {e}")
+            return None
+        
+        tx_hash = self._send_transaction(
+            self.usdc_contract_address, data, gas_info, f"{amount} USDC를 {to_address}로",
+            gas_kind=gas_info['kind'], recipient=to_checksum, on_final=on_final, on_sent=on_sent
+        )
+        
+        if not tx_hash:
+            # 실패한 전송 이후에는 다시 추정
+            self.gas_cache.invalidate(gas_info['kind'])
+        return tx_hash
+    
+    @staticmethod
+    def receipt_from_json(result: dict) -> dict:
+        """JSON-RPC 영수증 응답에서 필요한 필드만 정수로 변환"""
+        return {
+            'transactionHash': result['transactionHash'],
+            'blockNumber': int(result['blockNumber'], 16),
+            'status': int(result['status'], 16),
+            'gasUsed': int(result['gasUsed'], 16),
+        }
+    
+    def latest_nonce(self) -> int:
+        """블록에 포함된 마지막 트랜잭션 다음 논스 (이보다 작은 논스는 소비됨)"""
+        return self.w3.eth.get_transaction_count(self.account.address, 'latest')
+    
+    def fetch_receipts(self, tx_hashes: list) -> dict:
+        """여러 트랜잭션 영수증을 JSON-RPC 배치 요청으로 조회 (해시 -> 영수증, 미포함은 제외)"""
+        receipts = {}
+        for start in range(0, len(tx_hashes), self.receipt_batch_size):
+            chunk = tx_hashes[start:start + self.receipt_batch_size]
+            responses = self.rpc_pool.make_batch_request(
+                [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in chunk]
+            )
+            for tx_hash, response in zip(chunk, responses):
+                if response.get('result'):
+                    receipts[tx_hash] = self.receipt_from_json(response['result'])
+        return receipts
+    
+    def monitor_inflight(self):
+        """대기 중인 트랜잭션 확인 (스케줄러에서 주기 실행)
+        
+        대기 중인 모든 해시의 영수증을 배치 요청 한 번으로 조회해서 확정/실패를
+        통지하고 실제 gasUsed를 학습한다. 오래 걸리는 트랜잭션은 같은 논스로
+        수수료를 올려 교체한다.
+        """
+        records = self.inflight.items()
+        if not records:
+            return
+        
+        try:
+            # 미포함 판정용 latest 논스는 영수증보다 먼저 조회
+            latest_nonce = None
+            if self.inflight.needs_latest_nonce(records):
+                latest_nonce = self.latest_nonce()
+            receipts = self.fetch_receipts([tx_hash for _, record in records for tx_hash in record['hashes']])
+        except Exception as e:
+            logging.warning(f"영수증 조회 실패 ({len(records)}건): {e}")
+            return
+        
+        for nonce, record in records:
+            tx_hash, receipt = self.inflight.pick_receipt(record, receipts)
+            if receipt is None:
+                if self.inflight.is_dropped(nonce, record, latest_nonce):
+                    logging.warning(f"트랜잭션 미포함 (논스 {nonce}가 다른 트랜잭션으로 사용됨) - 추적 중단")
+                    self.inflight.settle(nonce, record, 'dropped')
+                    self.nonce_manager.mark_stale()
+                elif self.inflight.needs_bump(record):
+                    self.bump_fee(nonce, record)
+                continue
+            
+            success = self.gas_cache.learn_from_receipt(record['gas_kind'], record['recipient'], receipt)
+            self.inflight.settle(nonce, record, 'confirmed' if success else 'failed', tx_hash)
+    
+    def bump_fee(self, nonce: int, record: dict) -> Optional[str]:
+        """멈춘 트랜잭션을 같은 논스, 더 높은 수수료로 교체"""
+        try:
+            transaction = self.fee_oracle.bump_transaction(record['transaction'], record['bumps'] + 1)
+            signed_txn = self.account.sign_transaction(transaction)
+            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction).hex()
+            
+            self.inflight.record_bump(record, transaction, tx_hash)
+            logging.info(f"수수료 인상 교체 전송 (논스 {nonce}, {record['bumps']}회차): {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            if "nonce too low" in str(e).lower():
+                # 기존 트랜잭션이 이미 포함됨 - 다음 확인에서 영수증 처리
+                logging.info(f"수수료 인상 불필요 (논스 {nonce} 이미 포함됨)")
+            else:
+                logging.warning(f"수수료 인상 실패 (논스 {nonce}): {e}")
+            self.inflight.record_bump(record)
+            return None
+    
+    def approve_batch_allowance(self, target_wei: int) -> bool:
+        """멀티 전송 컨트랙트 승인액을 target_wei로 맞춤 (절반 아래로 남았을 때만 approve 후 영수증 대기)
+        
+        무제한 승인 대신 한정된 금액만 승인하고 소진되면 다시 채운다.
+        """
+        self.batch_allowance_target = target_wei
+        try:
+            allowance = self.usdc_contract.functions.allowance(
+                self.account.address, self.batch_contract.address
+            ).call()
+            if allowance < target_wei // 2:
+                data = self.usdc_contract.encodeABI(fn_name='approve', args=[self.batch_contract.address, target_wei])
+                gas_info = {'estimated': 0, 'recommended': 60000, 'final': 60000, 'margin': '0.0%'}
+                tx_hash = self._send_transaction(
+                    self.usdc_contract_address, data, gas_info,
+                    f"멀티 전송 컨트랙트 USDC 승인 ({target_wei / 10 ** 6:.3f} USDC)"
+                )
+                if not tx_hash:
+                    return False
+                receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
+                if receipt.get('status') != 1:
+                    logging.error(f"멀티 전송 컨트랙트 승인 트랜잭션 실패: {tx_hash}")
+                    return False
+                allowance = self.usdc_contract.functions.allowance(
+                    self.account.address, self.batch_contract.address
+                ).call()
+            with self.allowance_lock:
+                self.batch_allowance = allowance
+            return True
+        except Exception as e:
+            logging.error(f"멀티 전송 컨트랙트 승인 실패: {e}")
+            return False
+    
+    def _top_up_batch_allowance(self):
+        try:
+            self.approve_batch_allowance(self.batch_allowance_target)
+        finally:
+            with self.allowance_lock:
+                self.batch_allowance_topping = False
+    
+    def ensure_batch_allowance(self, min_amount_wei: int) -> bool:
+        """일괄 전송 전 승인 잔액 확인 및 차감 - 부족하면 False
+        
+        전송 워커는 승인 트랜잭션을 기다리지 않는다. 잔액이 목표의 절반 아래로 내려가면
+        백그라운드에서 한 번만 다시 채운다.
+        """
+        with self.allowance_lock:
+            allowed = self.batch_allowance >= min_amount_wei
+            if allowed:
+                self.batch_allowance -= min_amount_wei
+            top_up = (self.batch_allowance < self.batch_allowance_target // 2
+                      and not self.batch_allowance_topping)
+            if top_up:
+                self.batch_allowance_topping = True
+        if top_up:
+            threading.Thread(target=self._top_up_batch_allowance, name="batch-allowance", daemon=True).start()
+        if not allowed:
+            logging.warning(f"멀티 전송 승인 잔액 부족 ({min_amount_wei / 10 ** 6:.3f} USDC 필요) - 일괄 전송 취소")
+        return allowed
+    
+    def send_usdc_batch(self, transfers: list, on_final=None, on_sent=None) -> Optional[str]:
+        """여러 수신자에게 USDC 일괄 전송 (트랜잭션 1개)
+        
+        transfers: [(지갑 주소, 금액), ...]
+        """
+        if not self.batch_contract:
+            logging.error("BATCH_CONTRACT_ADDRESS가 설정되지 않아 일괄 전송을 할 수 없습니다.")
+            return None
+        
+        try:
+            recipients = [Web3.to_checksum_address(address) for address, _ in transfers]
+            values = [int(amount * (10 ** 6)) for _, amount in transfers]
+            total_wei = sum(values)
+            
+            if not self.ensure_batch_allowance(total_wei):
+                return None
+            
+            contract_call = self.batch_contract.functions.disperseToken(
+                self.usdc_contract_address, recipients, values
+            )
+            
+            # 수신자 수에 비례해 가스 한도 산정 (추정 실패시 수신자당 ERC-20 전송 기준)
+            fallback_gas = 40000 + 65000 * len(recipients)
+            try:
+                estimated_gas = contract_call.estimate_gas({'from': self.account.address})
+            except Exception as e:
+                logging.warning(f"일괄 전송 가스 추정 실패, 기본값 사용: {e}")
+                estimated_gas = 0
+            final_gas = int(max(estimated_gas, 0) * 1.2) or fallback_gas
+            gas_info = {
+                'estimated': estimated_gas,
+                'recommended': fallback_gas,
+                'final': final_gas,
+                'margin': '20.0%' if estimated_gas else '기본값'
+            }
+        except Exception as e:
+            logging.error(f"USDC 일괄 전송 준비 실패: {e}")
+            return None
+        
+        total = sum(amount for _, amount in transfers)
+        return self._send_transaction(
+            self.batch_contract.address, contract_call._encode_transaction_data(), gas_info,
+            f"{total:.3f} USDC를 {len(transfers)}명에게", on_final=on_final, on_sent=on_sent
+        )
+    
+    def _send_transaction(self, to: str, data: str, gas_info: dict, description: str,
+                          gas_kind: Optional[str] = None, recipient: Optional[str] = None,
+                          on_final=None, on_sent=None) -> Optional[str]:
+        """컨트랙트 호출 트랜잭션 로컬 구성/서명 및 전송 (논스/수수료 재시도 처리)
+        
+        underpriced 오류는 대기 없이 수수료를 올려 즉시 재전송하고,
+        전송 후 멈춘 트랜잭션은 monitor_inflight에서 교체한다.
+        on_sent(nonce, tx_hash)는 추적 등록 전에 호출되므로 on_final보다 항상 먼저다.
+        """
+        optimal_gas = gas_info['final']
+        retry_count = 0
+        bump_level = 0
+        
+        while True:
+            nonce = None
+            signed_txn = None
+            transaction = None
+            try:
+                # 2단계: EIP-1559 수수료 (캐시된 feeHistory 기반)
+                fees = self.fee_oracle.get_fees(bump_level)
+                
+                # 3단계: 트랜잭션 구성 (가스 한도 명시적 설정, 논스는 로컬 할당, RPC 없음)
+                nonce = self.nonce_manager.allocate()
+                transaction = self.builder.build(to, data, nonce, optimal_gas, fees)
+                
+                # 4단계: 로컬 서명 후 전송 (드랍당 유일한 네트워크 호출)
+                signed_txn = self.account.sign_transaction(transaction)
+                tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction).hex()
+                
+                logging.info(f"USDC 전송 성공: {description}")
+                logging.info(
+                    f"가스 정보: {gas_info['margin']} 마진, 한도 {optimal_gas:,}, "
+                    f"maxFee {fees['maxFeePerGas']:,} wei, 팁 {fees['maxPriorityFeePerGas']:,} wei, "
+                    f"논스 {nonce}, 해시: {tx_hash}"
+                )
+                if on_sent:
+                    on_sent(nonce, tx_hash)
+                self.inflight.track(nonce, transaction, tx_hash, gas_kind, recipient, on_final)
+                return tx_hash
+                
+            except Exception as e:
+                error_msg = str(e)
+                
+                # 논스 불일치: 체인에서 재동기화
+                if NonceManager.is_resync_error(error_msg):
+                    self.nonce_manager.mark_stale()
+                    # 같은 트랜잭션이 이미 멤풀에 있으면 전송된 것으로 처리
+                    if "already known" in error_msg.lower() and signed_txn is not None:
+                        logging.warning(f"이미 전송된 트랜잭션 (논스 {nonce})")
+                        tx_hash = signed_txn.hash.hex()
+                        if on_sent:
+                            on_sent(nonce, tx_hash)
+                        self.inflight.track(nonce, transaction, tx_hash, gas_kind, recipient, on_final)
+                        return tx_hash
+                    if retry_count < 3:
+                        retry_count += 1
+                        logging.warning(f"논스 불일치 ({nonce}), 재동기화 후 재시도 {retry_count}/3")
+                        continue
+                elif nonce is not None:
+                    self.nonce_manager.settle_failed(nonce, e, sent=signed_txn is not None)
+                
+                # underpriced 오류 처리: 표본 갱신 후 수수료 인상해서 즉시 재전송
+                if "underpriced" in error_msg.lower() and retry_count < 3:
+                    retry_count += 1
+                    bump_level += 1
+                    logging.warning(f"Underpriced 오류, 수수료 인상 후 재시도 {retry_count}/3")
+                    self.fee_oracle.refresh()
+                    continue
+                
+                logging.error(f"USDC 전송 실패 (재시도 {retry_count}회): {e}")
+                return None
+
+class PayoutQueue:
+    """드랍 전송 대기열 (전용 워커 풀에서 체인 전송 처리)
+    
+    batch_size > 1 이면 batch_window 초 동안 모인 작업을 묶어서 handler에 넘긴다.
+    """
+
+    def __init__(self, handler, num_workers: int = 2, max_size: int = 1000,
+                 batch_size: int = 1, batch_window: float = 0.0):
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_window = max(0.0, batch_window)
+        self.jobs = queue.Queue(maxsize=max_size)
+        self.workers = []
+
+    def start(self):
+        """워커 스레드 시작"""
+        for i in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"payout-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+        logging.info(f"드랍 전송 워커 {self.num_workers}개 시작 (배치 최대 {self.batch_size}건, {self.batch_window}초)")
+
+    def stop(self, timeout: float = 10.0):
+        """대기 중인 작업 처리 후 워커 종료"""
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+        logging.info("드랍 전송 워커 종료 완료")
+
+    def submit(self, job: Dict[str, Any]) -> bool:
+        """전송 작업 등록 (블로킹 없음)"""
+        try:
+            self.jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            logging.warning(f"드랍 전송 대기열 가득 참 ({self.jobs.maxsize}개) - 드랍 취소")
+            return False
+
+    def qsize(self) -> int:
+        """대기 중인 작업 수"""
+        return self.jobs.qsize()
+
+    def _collect_batch(self) -> tuple:
+        """첫 작업을 기다린 뒤 배치 창 동안 추가 작업 수집 (batch, 종료 여부)"""
+        job = self.jobs.get()
+        if job is None:
+            return [], True
+        
+        batch = [job]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _worker_loop(self):
+        while True:
+            batch, stopping = self._collect_batch()
+            try:
+                if batch:
+                    self.handler(batch)
+            except Exception as e:
+                logging.error(f"드랍 전송 작업 처리 실패: {e}")
+            finally:
+                # 종료 신호도 get 한 항목이므로 함께 완료 처리
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self.jobs.task_done()
+            if stopping:
+                return
+
+class SharedDropState:
+    """샤드 워커 프로세스가 공유하는 드랍 상태 (SQLite WAL)
+    
+    전체 일일 한도는 워커별 임대분(lease)으로 나눠 가져서 워커들이 합쳐도 넘지 않는다.
+    워커는 임대받은 범위 안에서는 로컬 RateState만 보고 결정하고, 모자랄 때만
+    lease_chunk 단위로 더 받아간다. 쿨타임은 사용자별 만료 시각을 원자적으로 선점한다.
+    """
+
+    def __init__(self, db_path: str, shard: int, lease_chunk: float = 0.5, keep_days: int = 7):
+        self.shard = shard
+        self.lease_chunk = lease_chunk
+        self.keep_days = keep_days
+        self.lock = threading.Lock()
+        self.granted = {}  # UTC 날짜 -> 이 워커가 임대받은 한도 (오늘 것만 캐시)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS budget_leases ("
+            " day TEXT NOT NULL,"
+            " shard INTEGER NOT NULL,"
+            " granted REAL NOT NULL,"
+            " PRIMARY KEY (day, shard))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cooldowns ("
+            " user_id TEXT PRIMARY KEY,"
+            " until REAL NOT NULL)"
+        )
+
+    def _granted(self, day: str) -> float:
+        if day not in self.granted:
+            row = self.conn.execute(
+                "SELECT granted FROM budget_leases WHERE day = ? AND shard = ?", (day, self.shard)
+            ).fetchone()
+            self.granted = {day: row[0] if row else 0.0}  # 지난 날짜 캐시는 버림
+        return self.granted[day]
+
+    def ensure_budget(self, day: str, used: float, amount: float, limit: float) -> float:
+        """amount를 쓸 수 있게 필요하면 한도를 더 임대 - 남은 임대분 반환 (amount보다 작을 수 있음)"""
+        with self.lock:
+            available = self._granted(day) - used
+            if available >= amount:
+                return available
+            want = max(self.lease_chunk, amount - available)
+            try:
+                # 쓰기 잠금을 먼저 잡아서 워커끼리 합계 확인/임대가 겹치지 않게 함
+                self.conn.execute("BEGIN IMMEDIATE")
+                total = self.conn.execute(
+                    "SELECT COALESCE(SUM(granted), 0) FROM budget_leases WHERE day = ?", (day,)
+                ).fetchone()[0]
+                grant = max(0.0, min(want, limit - total))
+                if grant > 0:
+                    self.conn.execute(
+                        "INSERT INTO budget_leases (day, shard, granted) VALUES (?, ?, ?) "
+                        "ON CONFLICT(day, shard) DO UPDATE SET granted = granted + excluded.granted",
+                        (day, self.shard, grant)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                if self.conn.in_transaction:  # BEGIN 자체가 잠금 대기로 실패했으면 되돌릴 트랜잭션이 없음
+                    self.conn.execute("ROLLBACK")
+                logging.error(f"일일 한도 임대 실패: {e}")
+                return available
+            self.granted[day] += grant
+            if grant > 0:
+                logging.info(f"일일 한도 임대: 샤드 {self.shard} +{grant:.3f} USDC (전체 {total + grant:.3f}/{limit})")
+            return self.granted[day] - used
+
+    def give_back(self, day: str, used: float):
+        """종료시 쓰지 않은 임대분 반납 (다른 워커가 가져갈 수 있게)"""
+        with self.lock:
+            unused = self._granted(day) - used
+            if unused <= 0:
+                return
+            try:
+                self.conn.execute(
+                    "UPDATE budget_leases SET granted = ? WHERE day = ? AND shard = ?",
+                    (max(used, 0.0), day, self.shard)
+                )
+                self.granted[day] = max(used, 0.0)
+                logging.info(f"일일 한도 반납: 샤드 {self.shard} {unused:.3f} USDC")
+            except Exception as e:
+                logging.error(f"일일 한도 반납 실패: {e}")
+
+    def claim_cooldown(self, user_id: str, now: float, cooldown: float) -> bool:
+        """쿨타임 선점 (다른 워커에서 쿨타임 중이면 False)"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO cooldowns (user_id, until) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET until = excluded.until WHERE cooldowns.until <= ?",
+                (user_id, now + cooldown, now)
+            )
+            return cursor.rowcount == 1
+
+    def release_cooldown(self, user_id: str, until: float):
+        """전송 실패한 드랍의 쿨타임 취소 (그 사이 다시 선점된 경우는 그대로 둠)"""
+        with self.lock:
+            self.conn.execute("DELETE FROM cooldowns WHERE user_id = ? AND until = ?", (user_id, until))
+
+    def expire(self, now: float):
+        """끝난 쿨타임과 keep_days일 지난 임대 기록 정리"""
+        oldest = RateState.day_key(now - self.keep_days * 86400)
+        with self.lock:
+            try:
+                self.conn.execute("DELETE FROM cooldowns WHERE until <= ?", (now,))
+                self.conn.execute("DELETE FROM budget_leases WHERE day < ?", (oldest,))
+            except Exception as e:
+                logging.error(f"공유 상태 정리 실패: {e}")
+
+class RemoteChain:
+    """샤드 워커용 체인 상태 (전송은 서명 프로세스가 담당)
+    
+    드랍 결정에 필요한 부분만 TransactionManager와 같은 모양으로 제공한다.
+    잔고는 서명 프로세스가 워커 수로 나눈 몫을, 가스 예약치는 최신 추정치를 보내준다.
+    """
+
+    batch_contract = None
+
+    def __init__(self):
+        self.balance_monitor = BalanceMonitor(alert_usdc=0.0, alert_eth=0.0)  # 잔고 알림은 서명 프로세스에서
+        self.gas_reserve_wei = 0
+        self.max_gas = 0
+        self.inflight = {}
+        # decide_drop은 fee_oracle.max_cost_wei(gas_cache.max_gas)를 호출
+        self.fee_oracle = self
+        self.gas_cache = self
+
+    def max_cost_wei(self, gas_limit: int) -> int:
+        return self.gas_reserve_wei
+
+    def should_drop(self, drop_rate: float) -> bool:
+        """랜덤 드랍 여부 결정"""
+        return random.random() < drop_rate
+
+    def update(self, usdc: float, eth_wei: int, gas_reserve_wei: int):
+        """서명 프로세스가 보낸 잔고 몫/가스 예약치 반영"""
+        self.gas_reserve_wei = gas_reserve_wei
+        self.balance_monitor.update(usdc, eth_wei)
+
+class RemotePayoutQueue:
+    """샤드 워커용 드랍 전송 대기열
+    
+    작업을 서명 프로세스로 넘기고(메시지 객체는 빼고), 결과 이벤트를 받아 on_event로
+    넘긴다. 원래 작업 dict는 확정 결과가 올 때까지 보관해서 알림/정산에 그대로 쓴다.
+    wait_durable(jobs)가 있으면 전달 스레드가 예약 기록이 디스크에 남은 뒤에만 넘기고,
+    실패하면 send_failed로 돌려준다 (원장 없이 전송되는 일이 없게).
+    """
+
+    def __init__(self, shard: int, job_queue, result_queue, on_event, max_pending: int = 1000,
+                 wait_durable=None):
+        self.shard = shard
+        self.job_queue = job_queue
+        self.result_queue = result_queue
+        self.on_event = on_event
+        self.max_pending = max_pending
+        self.wait_durable = wait_durable
+        self.lock = threading.Lock()
+        self.pending = {}  # job_id -> 작업 (확정까지)
+        self.unsent = set()  # 아직 전송 결과를 받지 못한 job_id
+        self.outgoing = queue.Queue()  # 원장 기록을 기다리는 작업
+        self.next_id = 0
+        self.reader = None
+        self.forwarder = None
+
+    def start(self):
+        self.reader = threading.Thread(target=self._reader_loop, name=f"payout-results-{self.shard}", daemon=True)
+        self.reader.start()
+        self.forwarder = threading.Thread(target=self._forward_loop, name=f"payout-forward-{self.shard}", daemon=True)
+        self.forwarder.start()
+
+    def stop(self, timeout: float = 10.0):
+        """서명 프로세스가 보낸 작업을 전송할 때까지 기다린 뒤 종료"""
+        deadline = time.monotonic() + timeout
+        while self.qsize() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self.qsize():
+            logging.warning(f"종료시 전송 결과를 받지 못한 드랍 {self.qsize()}건")
+        self.outgoing.put(None)
+        if self.forwarder:
+            self.forwarder.join(timeout)
+        self.result_queue.put(None)
+        if self.reader:
+            self.reader.join(timeout)
+        logging.info("드랍 전송 결과 수신 종료 완료")
+
+    def submit(self, job: Dict[str, Any]) -> bool:
+        """전송 작업 등록 (블로킹 없음)"""
+        with self.lock:
+            if len(self.unsent) >= self.max_pending:
+                logging.warning(f"드랍 전송 대기열 가득 참 ({self.max_pending}개) - 드랍 취소")
+                return False
+            job_id = f"{self.shard}:{self.next_id}"
+            self.next_id += 1
+            job['job_id'] = job_id
+            self.pending[job_id] = job
+            self.unsent.add(job_id)
+        self.outgoing.put(job)
+        return True
+
+    def _forward_loop(self):
+        """원장 기록 확인 후 서명 프로세스로 전달 (그 사이 쌓인 작업은 한 번에 확인)"""
+        stopping = False
+        while not stopping:
+            job = self.outgoing.get()
+            if job is None:
+                return
+            jobs = [job]
+            while True:
+                try:
+                    job = self.outgoing.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+            
+            if self.wait_durable and not self.wait_durable(jobs):
+                job_ids = [job['job_id'] for job in jobs]
+                with self.lock:
+                    self.unsent.difference_update(job_ids)
+                    for job_id in job_ids:
+                        self.pending.pop(job_id, None)
+                try:
+                    self.on_event('send_failed', jobs)
+                except Exception as e:
+                    logging.error(f"드랍 전송 결과 처리 실패 (send_failed): {e}")
+                continue
+            for job in jobs:
+                payload = {key: value for key, value in job.items() if key != 'message'}
+                payload['shard'] = self.shard
+                self.job_queue.put(payload)
+
+    def qsize(self) -> int:
+        """전송 결과를 기다리는 작업 수"""
+        with self.lock:
+            return len(self.unsent)
+
+    def _reader_loop(self):
+        while True:
+            event = self.result_queue.get()
+            if event is None:
+                return
+            kind, job_ids, *args = event
+            with self.lock:
+                jobs = [self.pending[job_id] for job_id in job_ids if job_id in self.pending]
+                self.unsent.difference_update(job_ids)
+                if kind in ('send_failed', 'final'):
+                    for job_id in job_ids:
+                        self.pending.pop(job_id, None)
+            try:
+                self.on_event(kind, jobs, *args)
+            except Exception as e:
+                logging.error(f"드랍 전송 결과 처리 실패 ({kind}): {e}")
+
+class ChatOrderedDispatcher:
+    """채팅별 순서 보장 디스패처 (같은 채팅은 같은 워커에서 순서대로, 채팅끼리는 병렬)"""
+
+    def __init__(self, handler, num_workers: int = 4, max_queue: int = 1000):
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        # 워커마다 전용 큐를 두고 chat_id로 배정 (채팅 안의 순서 유지)
+        self.queues = [queue.Queue(maxsize=max_queue) for _ in range(self.num_workers)]
+        self.workers = []
+
+    def start(self):
+        """워커 스레드 시작"""
+        for i, work_queue in enumerate(self.queues):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(work_queue,),
+                name=f"update-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+        logging.info(f"업데이트 처리 워커 {self.num_workers}개 시작")
+
+    def stop(self, timeout: float = 10.0):
+        """대기 중인 업데이트 처리 후 워커 종료"""
+        for work_queue in self.queues:
+            work_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+
+    def submit(self, chat_id: int, item) -> bool:
+        """업데이트 등록 (대기열이 가득 차면 False)"""
+        try:
+            self.queues[chat_id % self.num_workers].put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def _worker_loop(self, work_queue: queue.Queue):
+        while True:
+            item = work_queue.get()
+            if item is None:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                logging.error(f"업데이트 처리 실패: {e}")
+
+class WebhookServer:
+    """텔레그램 웹훅 수신 서버 (수신 즉시 응답하고 처리는 디스패처에 위임)"""
+
+    def __init__(self, dispatcher: ChatOrderedDispatcher, listen: str = "0.0.0.0",
+                 port: int = 8443, path: str = "/", secret_token: Optional[str] = None,
+                 ssl_cert: Optional[str] = None, ssl_key: Optional[str] = None):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret_token = secret_token
+        self.httpd = ThreadingHTTPServer((listen, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.serving = False  # serve_forever 시작 여부 (시작 전 httpd.shutdown은 영원히 대기)
+        if ssl_cert and ssl_key:
+            import ssl
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(ssl_cert, ssl_key)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+
+    @staticmethod
+    def extract_chat_id(update: dict) -> int:
+        """업데이트에서 채팅 ID 추출 (순서 보장 단위)"""
+        for key in ('message', 'edited_message', 'channel_post', 'edited_channel_post',
+                    'my_chat_member', 'chat_member', 'chat_join_request'):
+            if key in update:
+                return update[key].get('chat', {}).get('id', 0)
+        callback = update.get('callback_query')
+        if callback and callback.get('message'):
+            return callback['message'].get('chat', {}).get('id', 0)
+        return 0
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if server.secret_token:
+                    received = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+                    if not hmac.compare_digest(received, server.secret_token):
+                        self.send_response(403)
+                        self.end_headers()
+                        return
+                
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    body = self.rfile.read(length).decode('utf-8')
+                    update = json.loads(body)
+                except Exception:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                
+                # 대기열이 가득 차면 503으로 응답해서 텔레그램이 다시 보내게 함
+                accepted = server.dispatcher.submit(server.extract_chat_id(update), body)
+                self.send_response(200 if accepted else 503)
+                self.end_headers()
+                if not accepted:
+                    logging.warning("업데이트 대기열 가득 참 - 텔레그램 재전송 요청")
+
+            def log_message(self, format, *args):
+                pass  # 요청마다 접근 로그 남기지 않음
+
+        return Handler
+
+    def serve_forever(self):
+        self.serving = True
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        if self.serving:
+            self.httpd.shutdown()
+        self.httpd.server_close()
+
+class MetricsServer:
+    """Prometheus 수집용 /metrics HTTP 서버 (백그라운드 스레드)"""
+
+    def __init__(self, registry: MetricsRegistry, listen: str = "0.0.0.0", port: int = 9100):
+        self.registry = registry
+        self.httpd = ThreadingHTTPServer((listen, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = server.registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 수집 요청마다 접근 로그 남기지 않음
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+        logging.info(f"지표 서버 시작: http://{self.httpd.server_address[0]}:{self.httpd.server_address[1]}/metrics")
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class TokenBucket:
+    """토큰 버킷 (초당 rate개 충전, 최대 capacity개) - 호출측 락 안에서 사용"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """토큰 1개를 쓸 수 있을 때까지 남은 시간 (초)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class OutboundSender:
+    """텔레그램 발신 대기열
+    
+    - 전체 초당 global_rate건, 그룹 채팅은 분당 group_rate_per_min건으로 제한
+    - 429 응답은 retry_after 만큼 해당 채팅을 멈췄다가 재전송
+    - 한도에 걸린 채팅에 드랍 알림이 여러 건 쌓이면 요약 메시지 1건으로 합침
+    - 같은 채팅의 메시지는 보낸 순서대로 전송 (채팅당 동시 전송 1건)
+    """
+
+    def __init__(self, bot, global_rate: float = 30.0, group_rate_per_min: float = 20.0,
+                 num_workers: int = 4, max_retries: int = 5, drop_max_retries: int = 50):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.group_rate = group_rate_per_min / 60.0
+        self.group_burst = max(1.0, group_rate_per_min / 4)
+        self.max_retries = max_retries
+        self.drop_max_retries = drop_max_retries
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()  # chat_id -> deque(item)
+        self.chat_buckets = {}
+        self.blocked_until = {}  # chat_id -> 429 해제 시각
+        self.busy = set()  # 전송 중인 채팅
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="outbound")
+        self.dispatcher = None
+        self.stopping = False
+        self.closed = False
+        self.last_prune = time.monotonic()
+
+    def start(self):
+        """발신 디스패처 시작"""
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, name="outbound-dispatcher", daemon=True)
+        self.dispatcher.start()
+        logging.info("텔레그램 발신 대기열 시작")
+
+    def stop(self, timeout: float = 10.0):
+        """대기 중인 메시지를 최대 timeout초 동안 보내고 종료"""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.dispatcher:
+            self.dispatcher.join(timeout)
+        # 시간 안에 못 보낸 메시지가 있어도 디스패처는 멈춤
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.dispatcher:
+            self.dispatcher.join(1.0)
+        self.executor.shutdown(wait=True)
+        with self.cond:
+            left = sum(len(items) for items in self.pending.values())
+        if left:
+            logging.warning(f"종료시 전송하지 못한 메시지 {left}건")
+
+    def send_message(self, chat_id, text: str, kind: str = 'message',
+                     digest_line: Optional[str] = None, on_sent=None,
+                     reply_to_message_id: Optional[int] = None, **kwargs):
+        """메시지 전송 예약 (블로킹 없음)"""
+        self._enqueue({
+            'chat_id': chat_id,
+            'key': self.chat_key(chat_id),
+            'text': text,
+            'kind': kind,
+            'digest_lines': [digest_line] if digest_line else None,
+            'on_sent': [on_sent] if on_sent else [],
+            'reply_to_message_id': reply_to_message_id,
+            'kwargs': kwargs,
+            'attempts': 0,
+            'not_before': 0.0
+        })
+
+    def edit_message(self, chat_id, message_id: int, text: str, **kwargs):
+        """보낸 메시지 수정 예약 (발신과 같은 속도 제한 적용)"""
+        self._enqueue({
+            'chat_id': chat_id,
+            'key': self.chat_key(chat_id),
+            'text': text,
+            'kind': 'edit',
+            'digest_lines': None,
+            'on_sent': [],
+            'reply_to_message_id': None,
+            'edit_message_id': message_id,
+            'kwargs': kwargs,
+            'attempts': 0,
+            'not_before': 0.0
+        })
+
+    def _enqueue(self, item: dict):
+        with self.cond:
+            self.pending.setdefault(item['key'], deque()).append(item)
+            self._notify()
+
+    def reply_to(self, message, text: str, **kwargs):
+        """메시지에 답장 예약"""
+        self.send_message(message.chat.id, text, reply_to_message_id=message.message_id, **kwargs)
+
+    def pending_count(self) -> int:
+        with self.cond:
+            return sum(len(items) for items in self.pending.values())
+
+    @staticmethod
+    def chat_key(chat_id):
+        """대기열/한도 버킷 키 - 숫자 ID는 정수로 (같은 채팅의 "123"과 123을 합침), @채널명은 그대로"""
+        try:
+            return int(chat_id)
+        except (TypeError, ValueError):
+            return str(chat_id)
+
+    def _chat_bucket(self, chat_id) -> Optional[TokenBucket]:
+        # 그룹/채널(음수 ID, @채널명)만 채팅별 한도 적용
+        if isinstance(chat_id, int) and chat_id >= 0:
+            return None
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.group_rate, self.group_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _coalesce_drops(self, items: deque):
+        """한도에 걸린 채팅의 드랍 알림 여러 건을 요약 1건으로 합침"""
+        drops = [item for item in items if item['kind'] == 'drop']
+        if len(drops) < 2:
+            return
+        
+        lines = []
+        callbacks = []
+        for item in drops:
+            lines.extend(item['digest_lines'] or [item['text'].strip()])
+            callbacks.extend(item['on_sent'])
+        digest = {
+            'chat_id': drops[0]['chat_id'],
+            'key': drops[0]['key'],
+            'text': f"💸 USDC 드랍 {len(lines)}건! 🎉\n\n" + "\n".join(lines),
+            'kind': 'drop',
+            'digest_lines': lines,
+            'on_sent': callbacks,
+            'reply_to_message_id': None,
+            'kwargs': {},
+            'attempts': 0,
+            'not_before': min(item['not_before'] for item in drops)
+        }
+        
+        # 첫 드랍 알림 자리에 요약을 넣고 나머지 드랍 알림은 제거
+        merged = deque()
+        for item in items:
+            if item['kind'] != 'drop':
+                merged.append(item)
+            elif digest is not None:
+                merged.append(digest)
+                digest = None
+        items.clear()
+        items.extend(merged)
+
+    def _dispatch_ready(self, now: float) -> float:
+        """보낼 수 있는 메시지를 워커에 넘기고 다음 확인까지 대기 시간 반환"""
+        next_wait = 1.0
+        for chat_id in list(self.pending):
+            if chat_id in self.busy:
+                continue
+            items = self.pending[chat_id]
+            blocked = max(self.blocked_until.get(chat_id, 0.0), items[0]['not_before']) - now
+            if blocked > 0:
+                next_wait = min(next_wait, blocked)
+                continue
+            
+            bucket = self._chat_bucket(chat_id)
+            if bucket:
+                chat_wait = bucket.wait_time(now)
+                if chat_wait > 0:
+                    self._coalesce_drops(items)
+                    next_wait = min(next_wait, chat_wait)
+                    continue
+            
+            global_wait = self.global_bucket.wait_time(now)
+            if global_wait > 0:
+                return min(next_wait, global_wait)
+            
+            self.global_bucket.take(now)
+            if bucket:
+                bucket.take(now)
+            item = items.popleft()
+            if items:
+                self.pending.move_to_end(chat_id)
+            else:
+                del self.pending[chat_id]
+            self.busy.add(chat_id)
+            self._launch(item)
+        
+        # 한가한 채팅 버킷 정리 (메모리 제한)
+        if now - self.last_prune > 60:
+            self.last_prune = now
+            for chat_id in list(self.chat_buckets):
+                if chat_id not in self.pending and chat_id not in self.busy and self.chat_buckets[chat_id].is_full(now):
+                    del self.chat_buckets[chat_id]
+            self.blocked_until = {k: v for k, v in self.blocked_until.items() if v > now}
+        return next_wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self.cond:
+                if self.closed or (self.stopping and not self.pending and not self.busy):
+                    return
+                wait = self._dispatch_ready(time.monotonic())
+                self.cond.wait(timeout=max(wait, 0.01))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """429 응답의 retry_after (초)"""
+        if getattr(error, 'error_code', None) != 429:
+            return None
+        result = getattr(error, 'result_json', None) or {}
+        return float(result.get('parameters', {}).get('retry_after', 5))
+
+    def _notify(self):
+        """디스패처 깨우기 (self.cond 안에서 호출)"""
+        self.cond.notify()
+
+    def _launch(self, item: dict):
+        """전송 워커에 메시지 전달"""
+        self.executor.submit(self._deliver, item)
+
+    def _deliver(self, item: dict):
+        sent = None
+        error = None
+        started = time.perf_counter()
+        try:
+            if item.get('edit_message_id'):
+                sent = self.bot.edit_message_text(
+                    item['text'], item['chat_id'], item['edit_message_id'], **item['kwargs']
+                )
+            else:
+                sent = self.bot.send_message(
+                    item['chat_id'],
+                    item['text'],
+                    reply_to_message_id=item['reply_to_message_id'],
+                    allow_sending_without_reply=True,
+                    **item['kwargs']
+                )
+        except Exception as e:
+            error = e
+        TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started, item['kind'])
+        self._complete(item, sent, error)
+
+    def _complete(self, item: dict, sent, error: Optional[Exception]):
+        """전송 결과 처리 (콜백 실행 또는 재시도 예약)"""
+        chat_id = item['key']
+        requeue = False
+        if error is None:
+            for callback in item['on_sent']:
+                try:
+                    callback(sent)
+                except Exception as e:
+                    logging.error(f"전송 후 콜백 실패: {e}")
+        else:
+            item['attempts'] += 1
+            limit = self.drop_max_retries if item['kind'] == 'drop' else self.max_retries
+            retry_after = self._retry_after(error)
+            TELEGRAM_ERRORS.inc(str(getattr(error, 'error_code', None) or type(error).__name__))
+            if retry_after is not None:
+                TELEGRAM_RATE_LIMITED.inc()
+                logging.warning(f"텔레그램 전송 한도 초과 (429): chat {chat_id}, {retry_after}초 후 재전송")
+                with self.cond:
+                    self.blocked_until[chat_id] = time.monotonic() + retry_after
+                requeue = item['attempts'] <= limit
+            elif getattr(error, 'error_code', None) in (400, 403):
+                # 채팅 없음/봇 차단 등은 재시도해도 실패
+                requeue = False
+            else:
+                item['not_before'] = time.monotonic() + min(60.0, 2 ** item['attempts'])
+                requeue = item['attempts'] <= limit
+            
+            if not requeue:
+                logging.error(f"메시지 전송 포기 ({item['kind']}, {item['attempts']}회 시도): chat {chat_id} - {error}\n{item['text']}")
+        
+        with self.cond:
+            self.busy.discard(chat_id)
+            if requeue:
+                self.pending.setdefault(chat_id, deque()).appendleft(item)
+            self._notify()
+
+class USDCDropBot:
+    """USDC 드랍 텔레그램 봇"""
+    
+    def __init__(self):
+        self.load_config()
+        
+        # 봇 초기화
+        # 웹훅 모드에서는 디스패처가 채팅별 순서를 보장하므로 핸들러를 바로 실행
+        with self.startup_phase("텔레그램 봇"):
+            self.bot = telebot.TeleBot(self.bot_token, threaded=not self.webhook_url)
+        with self.startup_phase("지갑 저장소"):
+            self.wallet_manager = WalletManager(
+                storage=create_wallet_storage(), cache_size=int(os.getenv('WALLET_CACHE_SIZE', '10000'))
+            )
+        
+        # 텔레그램 발신 대기열 (모든 봇 메시지는 여기를 거쳐 속도 제한 적용)
+        self.outbox = OutboundSender(
+            self.bot,
+            global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')),
+            group_rate_per_min=float(os.getenv('TELEGRAM_GROUP_RATE_PER_MIN', '20'))
+        )
+        
+        # 트랜잭션 매니저는 핸들러/스케줄러 구성 후 start_chain()에서 초기화
+        self.tx_manager = None
+        if not self.private_key:
+            logging.warning("PRIVATE_KEY가 설정되지 않았습니다.")
+        
+        with self.startup_phase("드랍 상태 복원"):
+            self.init_drop_state()
+        
+        # 드랍 전송 대기열 (핸들러는 예약만 하고 전송은 워커가 처리)
+        self.payout_queue = self.create_payout_queue()
+        
+        # APScheduler 초기화
+        self.scheduler = BackgroundScheduler()
+        
+        # 핸들러 설정
+        self.setup_handlers()
+        
+        # 정기 안내문 스케줄 설정
+        self.setup_periodic_guide()
+        
+        # 한도/쿨타임 상태 주기 저장
+        self.setup_state_snapshots()
+        
+        # 지표 수집 (METRICS_PORT 설정시 /metrics 노출)
+        self.setup_metrics()
+        
+        # 트랜잭션 매니저 + 체인 관련 백그라운드 작업 (FAST_START면 백그라운드 스레드에서)
+        self.start_chain()
+        
+        # 봇 시작시 과거 메시지 스킵 (웹훅 모드는 set_webhook에서 처리)
+        if not self.webhook_url:
+            with self.startup_phase("과거 업데이트 스킵"):
+                self.skip_old_updates()
+    
+    def load_config(self):
+        """환경변수 설정 로드 (동기/비동기 엔진 공통)"""
+        # 봇 시작 시간 기록 (과거 메시지 필터링용)
+        self.bot_start_time = datetime.now()
+        
+        # 빠른 시작: 체인 초기화(컨트랙트/계정/논스 조회)를 기다리지 않고 바로 폴링 시작
+        self.fast_start = os.getenv('FAST_START', 'false').lower() in ('true', '1', 'yes', 'on')
+        # 시작 단계별 소요 시간 출력
+        self.startup_profile = os.getenv('STARTUP_PROFILE', 'false').lower() in ('true', '1', 'yes', 'on')
+        self.startup_started = time.perf_counter()
+        self.startup_timings = []
+        self.startup_reported = False
+        
+        # 환경변수 로드
+        self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+        self.base_rpc = os.getenv('RPC_URL', 'https://base-mainnet.public.blastapi.io')
+        # 여러 RPC 노드 (쉼표로 구분, 없으면 RPC_URL 하나만 사용)
+        self.rpc_urls = [url.strip() for url in os.getenv('RPC_URLS', '').split(',') if url.strip()] or [self.base_rpc]
+        self.usdc_contract = os.getenv('USDC_CONTRACT_ADDRESS')
+        self.private_key = os.getenv('PRIVATE_KEY')
+        self.drop_rate = float(os.getenv('DROP_RATE', '0.05'))  # 5%
         self.max_daily_amount = float(os.getenv('MAX_DAILY_AMOUNT', '10.0'))  # Alter 10 USDC
         self.admin_user_id = os.getenv('ADMIN_USER_ID')
         self.group_chat_id = os.getenv('GROUP_CHAT_ID')  # 정기 안내문을 보낼 그룹 채팅 ID
         
-        # 환영 메시지 활성화 옵션 (기본값: True)
-        self.welcome_message_enabled = os.getenv('WELCOME_MESSAGE_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+        # 웹훅 모드 (WEBHOOK_URL이 있으면 롱폴링 대신 내장 HTTP 서버로 수신)
+        self.webhook_url = os.getenv('WEBHOOK_URL')
+        
+        # 드랍 트랜잭션이 블록에서 확정되면 드랍 알림 메시지에 결과 표시
+        self.drop_confirm_edit = os.getenv('DROP_CONFIRM_EDIT', 'false').lower() in ('true', '1', 'yes', 'on')
+        
+        # 환영 메시지 활성화 옵션 (기본값: True)
+        self.welcome_message_enabled = os.getenv('WELCOME_MESSAGE_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+        
+        # 드랍 차단 대화방 목록 (환경변수에서 쉼표로 구분된 채팅 ID들)
+        blocked_chats_env = os.getenv('BLOCKED_CHAT_IDS', '')
+        self.blocked_chat_ids = set()
+        if blocked_chats_env:
+            try:
+                # 쉼표로 구분된 채팅 ID들을 파싱하여 정수로 변환
+                self.blocked_chat_ids = {int(chat_id.strip()) for chat_id in blocked_chats_env.split(',') if chat_id.strip()}
+                logging.info(f"드랍 차단 대화방 {len(self.blocked_chat_ids)}개 설정: {self.blocked_chat_ids}")
+            except ValueError as e:
+                logging.error(f"BLOCKED_CHAT_IDS 파싱 실패: {e}")
+                self.blocked_chat_ids = set()
+        
+        if not self.bot_token:
+            raise ValueError("TELEGRAM_BOT_TOKEN이 설정되지 않았습니다.")
+    
+    def init_drop_state(self):
+        """드랍 한도/쿨타임 상태 초기화 (스냅샷이 있으면 복원)"""
+        self.cooldown_seconds = float(os.getenv('COOLDOWN_SECONDS', '30'))
+        
+        # 쿨타임 버킷 휠 + UTC 날짜별 일일 전송량 (예약+대기+확정 / 확정분)
+        self.rate_state = RateState(self.cooldown_seconds)
+        self.rate_state_path = os.getenv('RATE_STATE_PATH', 'rate_state.json')
+        self.load_rate_state()
+        
+        # 확정 드랍 통계 (/stats, /top, /summary)
+        self.payout_stats = PayoutStats(int(os.getenv('PAYOUT_STATS_KEEP_DAYS', '35')))
+        self.payout_stats_path = os.getenv('PAYOUT_STATS_PATH', 'payout_stats.json')
+        self.load_payout_stats()
+        
+        # 한도/쿨타임 상태 보호용 락 (핸들러 스레드와 전송 워커가 공유)
+        self.state_lock = threading.Lock()
+        
+        # 샤드 모드에서만 사용하는 프로세스 간 공유 상태 (전체 일일 한도 임대, 쿨타임)
+        self.shared_state = None
+        
+        # 드랍 선기록 원장 - 재생해서 스냅샷 이후 한도/쿨타임과 확인 못 한 전송을 복구
+        self.payout_ledger = None
+        self.ledger_pending = {}  # 재시작 전 전송됐지만 확정 결과가 없는 드랍
+        self.ledger_nonces = {}  # 추적 중인 논스 -> 드랍 ID 목록 (교체 전송 기록용)
+        ledger_path = os.getenv('LEDGER_PATH', 'payout_ledger.jsonl')
+        if ledger_path:
+            self.payout_ledger = PayoutLedger(ledger_path, float(os.getenv('LEDGER_COMMIT_MS', '20')) / 1000)
+            self.recover_from_ledger()
+    
+    def load_rate_state(self):
+        """재시작 전 한도/쿨타임 스냅샷 복원 (재시작해도 일일 한도가 다시 열리지 않음)"""
+        if not os.path.exists(self.rate_state_path):
+            return
+        try:
+            with open(self.rate_state_path, 'r', encoding='utf-8') as f:
+                self.rate_state.load_dict(json.load(f), time.time())
+            today = RateState.day_key(time.time())
+            logging.info(
+                f"한도/쿨타임 상태 복원: 쿨타임 {len(self.rate_state.last_drop)}명, "
+                f"오늘(UTC) 전송 {self.rate_state.sent(today):.3f} USDC"
+            )
+        except Exception as e:
+            logging.error(f"한도/쿨타임 상태 복원 실패: {e}")
+    
+    def save_rate_state(self):
+        """한도/쿨타임 스냅샷 저장 (스케줄러에서 주기 실행, 종료시 한 번 더)"""
+        try:
+            with self.state_lock:
+                data = self.rate_state.to_dict(time.time())
+            RateState.write_snapshot(self.rate_state_path, data)
+        except Exception as e:
+            logging.error(f"한도/쿨타임 상태 저장 실패: {e}")
+        self.save_payout_stats()
+    
+    def recover_from_ledger(self):
+        """원장 재생: 일일 한도/쿨타임 복구, 확정 결과 없는 전송은 영수증 확인 대기로"""
+        ledger = self.payout_ledger
+        try:
+            entries = PayoutLedger.replay(ledger.path)
+        except Exception as e:
+            logging.error(f"원장 재생 실패: {e}")
+            entries = {}
+        
+        now = time.time()
+        keep_days = int(os.getenv('LEDGER_KEEP_DAYS', '7'))
+        oldest_day = RateState.day_key(now - (keep_days - 1) * 86400)
+        budget_days = {RateState.day_key(now - offset * 86400) for offset in range(self.rate_state.keep_days)}
+        sent, confirmed = {}, {}
+        unknown = []
+        keep = {}
+        for payout_id, entry in entries.items():
+            status = entry['s']
+            if status is None and not entry['h']:
+                # 예약 후 전송 기록 전에 종료 - 나갔는지 알 수 없으므로 한도에 계속 포함
+                status = entry['s'] = 'unknown'
+                unknown.append((payout_id, entry))
+            elif status is None:
+                self.ledger_pending[payout_id] = entry
+            
+            if entry['d'] < oldest_day and status is not None:
+                continue
+            keep[payout_id] = entry
+            if entry['d'] not in budget_days or status in ('released', 'failed', 'dropped', 'timeout'):
+                continue
+            sent[entry['d']] = sent.get(entry['d'], 0.0) + entry['a']
+            if status == 'confirmed':
+                confirmed[entry['d']] = confirmed.get(entry['d'], 0.0) + entry['a']
+            if now - entry['t'] < self.cooldown_seconds and self.rate_state.last_drop.get(entry['u'], 0) < entry['t']:
+                self.rate_state.start_cooldown(entry['u'], entry['t'])
+        
+        for day in sent:
+            self.rate_state.restore_day(day, sent[day], confirmed.get(day, 0.0))
+        try:
+            ledger.start(keep)
+        except Exception as e:
+            logging.error(f"원장 열기 실패 - 원장 없이 실행: {e}")
+            self.payout_ledger = None
+            return
+        
+        for payout_id, entry in unknown:
+            logging.warning(
+                f"전송 여부 확인 불가 드랍 (예약 후 종료): {entry['n']} ({entry['u']}) "
+                f"{entry['a']} USDC -> {entry['w']} - 일일 한도에 포함"
+            )
+            if payout_id in keep:
+                ledger.append('final', payout_id, s='unknown')
+        if entries:
+            logging.info(
+                f"원장 재생: {len(entries)}건, 확인 대기 {len(self.ledger_pending)}건, 확인 불가 {len(unknown)}건"
+            )
+    
+    def ledger_sent(self, jobs: list, tx_hash: str, nonce: Optional[int]):
+        """전송 기록 (논스 포함 - 재시작 후 미포함 판정에 사용)
+        
+        전송 직후 추적 등록 전에(on_sent) 호출해서 확정 기록보다 항상 먼저 남긴다.
+        """
+        if not self.payout_ledger:
+            return
+        for job in jobs:
+            self.payout_ledger.append('sent', job['payout_id'], h=tx_hash, o=nonce)
+        if nonce is not None:
+            self.ledger_nonces[nonce] = [job['payout_id'] for job in jobs]
+            for job in jobs:
+                job['nonce'] = nonce
+    
+    def ledger_bumped(self, nonce: int, tx_hash: str):
+        """수수료 인상 교체 해시도 기록 (교체분이 포함돼도 재시작 후 영수증을 찾을 수 있게)"""
+        for payout_id in self.ledger_nonces.get(nonce, ()):
+            self.payout_ledger.append('sent', payout_id, h=tx_hash, o=nonce)
+    
+    def wait_ledger(self, jobs: list) -> bool:
+        """예약 기록이 디스크에 남을 때까지 대기 (전송 워커에서 호출) - 실패하면 전송하지 않는다"""
+        if self.payout_ledger and not self.payout_ledger.wait_durable(max(job['ledger_seq'] for job in jobs)):
+            logging.error(f"원장 기록 확인 실패 - 드랍 {len(jobs)}건 전송 취소")
+            return False
+        return True
+    
+    def reconcile_ledger(self):
+        """재시작 전 전송된 드랍 영수증 확인 (스케줄러에서 주기 실행, 모두 끝나면 중단)"""
+        pending = list(self.ledger_pending.items())
+        if pending:
+            try:
+                # 미포함 판정용 latest 논스는 영수증보다 먼저 조회
+                latest_nonce = self.tx_manager.latest_nonce()
+                receipts = self.tx_manager.fetch_receipts([tx_hash for _, entry in pending for tx_hash in entry['h']])
+            except Exception as e:
+                logging.warning(f"원장 영수증 조회 실패 ({len(pending)}건): {e}")
+                return
+            self.apply_ledger_receipts(pending, receipts, latest_nonce)
+        if not self.ledger_pending:
+            self.scheduler.remove_job("ledger_reconcile")
+    
+    def apply_ledger_receipts(self, pending: list, receipts: dict, latest_nonce: Optional[int]):
+        """영수증이 있으면 확정/실패 반영, 없으면 논스 소비 여부로 판단
+        
+        LEDGER_PENDING_TIMEOUT이 지나도 영수증이 없을 때 latest 논스가 전송 논스를
+        지났으면(다른 트랜잭션이 논스 사용) 미포함(dropped)으로 한도를 복구한다.
+        논스가 아직 소비되지 않았으면 멤풀에 남아 있을 수 있으므로 계속 확인하고,
+        논스 기록이 없는 항목은 확인 불가(unknown)로 한도에 남긴 채 확인을 멈춘다.
+        """
+        timeout = float(os.getenv('LEDGER_PENDING_TIMEOUT', '600'))
+        now = time.time()
+        for payout_id, entry in pending:
+            found = [(tx_hash, receipts[tx_hash]) for tx_hash in entry['h'] if tx_hash in receipts]
+            if found:
+                tx_hash, receipt = found[0]
+                status = 'confirmed' if receipt['status'] == 1 else 'failed'
+            elif now - entry['t'] <= timeout:
+                continue
+            elif entry.get('o') is None:
+                tx_hash, status = entry['h'][-1], 'unknown'
+            elif latest_nonce is not None and latest_nonce > entry['o']:
+                tx_hash, status = entry['h'][-1], 'dropped'
+            else:
+                continue
+            
+            with self.state_lock:
+                if status == 'confirmed':
+                    self.rate_state.confirm(entry['d'], entry['a'])
+                    self.payout_stats.record(entry['u'], entry['n'], entry['c'], entry['a'], now)
+                elif status != 'unknown':
+                    self.rate_state.release(entry['d'], entry['a'])
+            self.payout_ledger.append('final', payout_id, s=status, h=tx_hash)
+            self.ledger_pending.pop(payout_id, None)
+            PAYOUT_RESULTS.inc(status)
+            logging.info(f"원장 복구 드랍 {status}: {entry['n']} ({entry['u']}) {entry['a']} USDC ({tx_hash})")
+    
+    def load_payout_stats(self):
+        """드랍 통계 복원"""
+        if not os.path.exists(self.payout_stats_path):
+            return
+        try:
+            with open(self.payout_stats_path, 'r', encoding='utf-8') as f:
+                self.payout_stats.load_dict(json.load(f))
+            amount, count, users = self.payout_stats.totals()
+            logging.info(f"드랍 통계 복원: {users}명, {count}건, {amount:.3f} USDC")
+        except Exception as e:
+            logging.error(f"드랍 통계 복원 실패: {e}")
+    
+    def save_payout_stats(self):
+        """드랍 통계 저장 (바뀐 경우만)"""
+        try:
+            with self.state_lock:
+                if not self.payout_stats.dirty:
+                    return
+                data = self.payout_stats.to_dict()
+                self.payout_stats.dirty = False
+            RateState.write_snapshot(self.payout_stats_path, data)
+        except Exception as e:
+            logging.error(f"드랍 통계 저장 실패: {e}")
+    
+    def skip_old_updates(self):
+        """봇 시작시 과거 업데이트 모두 스킵"""
+        try:
+            # offset=-1 조회 한 번으로 마지막 업데이트만 받고 그 이전은 모두 확인 처리
+            updates = self.bot.get_updates(offset=-1, timeout=0)
+            if updates:
+                last_update_id = updates[-1].update_id
+                # 폴링은 마지막 업데이트 이후부터 요청
+                self.bot.last_update_id = last_update_id
+                logging.info(f"과거 업데이트 스킵 완료 (마지막 update_id: {last_update_id})")
+            else:
+                logging.info("스킵할 과거 업데이트 없음")
+        except Exception as e:
+            logging.warning(f"과거 업데이트 스킵 실패 (계속 진행): {e}")
+    
+    @contextmanager
+    def startup_phase(self, name: str):
+        """시작 단계 소요 시간 기록 (STARTUP_PROFILE)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.startup_timings.append((name, elapsed))
+            # 수신 시작 후에 끝난 단계(백그라운드 초기화)는 바로 출력
+            if self.startup_profile and self.startup_reported:
+                logging.info(f"[시작 프로필] {name}: {elapsed * 1000:.0f}ms (백그라운드)")
+    
+    def report_startup_profile(self):
+        """수신 시작 직전까지의 단계별 소요 시간 출력"""
+        self.startup_reported = True
+        if not self.startup_profile:
+            return
+        total = time.perf_counter() - self.startup_started
+        lines = [f"  {name}: {elapsed * 1000:.0f}ms" for name, elapsed in self.startup_timings]
+        logging.info("[시작 프로필] 수신 시작까지 {:.0f}ms\n{}".format(total * 1000, "\n".join(lines)))
+    
+    def create_payout_queue(self):
+        # 멀티 전송 컨트랙트가 있으면 배치 창 동안 모인 드랍을 트랜잭션 1개로 정산
+        batch_enabled = bool(self.private_key and os.getenv('BATCH_CONTRACT_ADDRESS'))
+        return PayoutQueue(
+            self.execute_payouts,
+            num_workers=int(os.getenv('PAYOUT_WORKERS', '2')),
+            max_size=int(os.getenv('PAYOUT_QUEUE_SIZE', '1000')),
+            batch_size=int(os.getenv('BATCH_MAX_RECIPIENTS', '20')) if batch_enabled else 1,
+            batch_window=float(os.getenv('BATCH_WINDOW_SECONDS', '5')) if batch_enabled else 0.0
+        )
+    
+    def create_tx_manager(self):
+        return TransactionManager(
+            self.base_rpc, 
+            self.usdc_contract, 
+            self.private_key,
+            batch_contract_address=os.getenv('BATCH_CONTRACT_ADDRESS') or None,
+            rpc_urls=self.rpc_urls
+        )
+    
+    def init_chain(self):
+        """트랜잭션 매니저 생성 후 체인 작업 등록 (준비 전에는 드랍 결정이 'chain_starting')"""
+        with self.startup_phase("체인 초기화"):
+            tx_manager = self.create_tx_manager()
+        if tx_manager.batch_contract:
+            # 하루 한도만큼 미리 승인해서 전송 워커가 승인 영수증을 기다리지 않게 함
+            with self.startup_phase("멀티 전송 승인"):
+                tx_manager.approve_batch_allowance(int(self.max_daily_amount * 10 ** 6))
+        self.tx_manager = tx_manager
+        self.setup_chain_jobs()
+    
+    def start_chain(self):
+        """FAST_START면 체인 초기화를 백그라운드 스레드로 미룸"""
+        if not self.private_key:
+            return
+        if not self.fast_start:
+            self.init_chain()
+            return
+        
+        def run():
+            try:
+                self.init_chain()
+                logging.info("체인 초기화 완료 (백그라운드)")
+            except Exception as e:
+                logging.error(f"체인 초기화 실패 - 드랍 비활성화: {e}")
+        threading.Thread(target=run, name="chain-init", daemon=True).start()
+    
+    def get_guide_message(self) -> str:
+        """안내문 메시지 반환"""
+        return f"""🎯 곰빵봇 사용 안내
+
+🤖 곰빵봇은 채팅 시 랜덤으로 USDC를 드랍해주는 Base 체인 기반 텔레그램 봇입니다!
+
+📝 지갑 등록 방법:
+아래 예시 명령어를 입력해서 지갑을 등록해주세요
+
+/set 등록할지갑주소
+
+✨ 지갑 등록 후 채팅하면 USDC 드랍 기회를 얻을 수 있습니다! (단 최소 5글자 이상)
+🌐 Base Network을 사용합니다."""
+    
+    def send_guide_to_user(self, chat_id: str, user_name: str = "Unknown"):
+        """그룹 입장시 안내문 전송 (멘션 없음)"""
+        try:
+            guide_message = self.get_guide_message()
+            welcome_text = f"{user_name}님 환영합니다! 🎉\n\n{guide_message}"
+            
+            self.outbox.send_message(chat_id, welcome_text)
+            logging.info(f"그룹 입장 안내문 전송: {user_name}")
+        except Exception as e:
+            logging.error(f"그룹 안내문 전송 실패: {user_name} - {e}")
+    
+    def is_drop_blocked_chat(self, chat_id: int) -> bool:
+        """특정 대화방에서 드랍이 차단되어 있는지 확인"""
+        return chat_id in self.blocked_chat_ids
+    
+    def send_periodic_guide(self):
+        """정기 안내문 전송 (그룹 채팅)"""
+        if not self.group_chat_id:
+            logging.warning("GROUP_CHAT_ID가 설정되지 않아 정기 안내문을 보낼 수 없습니다.")
+            return
+        
+        try:
+            guide_message = self.get_guide_message()
+            self.outbox.send_message(self.group_chat_id, guide_message)
+            logging.info(f"정기 안내문 전송 완료: {self.group_chat_id}")
+        except Exception as e:
+            logging.error(f"정기 안내문 전송 실패: {e}")
+    
+    def send_later(self, delay_seconds: float, func, *args, **kwargs):
+        """지연 출력 예약 (핸들러를 멈추지 않고 스케줄러에서 1회 실행)"""
+        try:
+            self.scheduler.add_job(
+                func=func,
+                trigger="date",
+                run_date=datetime.now() + timedelta(seconds=delay_seconds),
+                args=args,
+                kwargs=kwargs,
+                misfire_grace_time=60
+            )
+        except Exception as e:
+            logging.error(f"지연 작업 예약 실패: {e}")
+    
+    def handle_coffee_jackpot(self, message, user_id: str, user_name: str):
+        """커피 잭팟 당첨 처리"""
+        try:
+            # 먼저 🎰 이모지 전송 (드라마틱 효과)
+            self.outbox.reply_to(message, "🎰🎰🎰")
+            
+            # 잠깐 대기 후 결과 발표 (서스펜스 효과, 핸들러는 바로 반환)
+            self.send_later(1.5, self.announce_coffee_jackpot, message, user_id, user_name)
+        except Exception as e:
+            logging.error(f"커피 잭팟 처리 실패: {user_name} - {e}")
+    
+    def announce_coffee_jackpot(self, message, user_id: str, user_name: str):
+        """커피 잭팟 결과 발표 및 관리자 알림 (지연 실행)"""
+        try:
+            # 그룹에 당첨 메시지 전송
+            jackpot_text = f"""
+☕🎉 커피 잭팟 당첨! 🎉☕
+
+축하합니다! {user_name}님이 커피 잭팟에 당첨되었습니다!
+
+관리자 확인후 전송 될 예정입니다!
+            """
+            
+            self.outbox.reply_to(message, jackpot_text)
+            logging.info(f"커피 잭팟 당첨: {user_name} ({user_id})")
+        except Exception as e:
+            logging.error(f"커피 잭팟 처리 실패: {user_name} - {e}")
+        
+        # 관리자에게 당첨자 정보 전송
+        if self.admin_user_id:
+            try:
+                chat_id = message.chat.id
+                chat_title = getattr(message.chat, 'title', '제목 없음')
+                current_time = datetime.fromtimestamp(message.date).strftime('%Y-%m-%d %H:%M:%S')
+                
+                admin_notification = f"""
+☕🎰 커피 잭팟 당첨 알림!
+
+🎊 당첨자 정보:
+👤 이름: {user_name}
+🆔 사용자 ID: {user_id}
+📍 채팅: {chat_title} ({chat_id})
+⏰ 당첨 시간: {current_time}
+
+🍀 당첨 확률: 0.005% (초희귀!)
+                """
+                
+                self.outbox.send_message(self.admin_user_id, admin_notification)
+                logging.info(f"관리자에게 커피 잭팟 당첨 알림 전송: {user_name}")
+            except Exception as e:
+                logging.error(f"관리자에게 커피 잭팟 알림 전송 실패: {e}")
+    
+    def setup_periodic_guide(self):
+        """정기 안내문 스케줄 설정 (4시간마다)"""
+        try:
+            self.scheduler.add_job(
+                func=self.send_periodic_guide,
+                trigger="interval",
+                hours=4,
+                id="periodic_guide",
+                name="정기 안내문 전송",
+                replace_existing=True
+            )
+            logging.info("정기 안내문 스케줄 설정 완료 (4시간마다)")
+        except Exception as e:
+            logging.error(f"정기 안내문 스케줄 설정 실패: {e}")
+
+    def setup_chain_jobs(self):
+        """체인 관련 백그라운드 작업 설정 (수수료 표본 갱신, 전송 트랜잭션 확인)"""
+        if not self.tx_manager:
+            return
+        try:
+            fee_refresh_seconds = float(os.getenv('FEE_REFRESH_SECONDS', '10'))
+            receipt_poll_seconds = float(os.getenv('RECEIPT_POLL_SECONDS', '3'))
+            self.scheduler.add_job(
+                func=self.tx_manager.fee_oracle.refresh,
+                trigger="interval",
+                seconds=fee_refresh_seconds,
+                id="fee_history",
+                name="수수료 표본 갱신",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+                next_run_time=datetime.now()
+            )
+            self.scheduler.add_job(
+                func=self.tx_manager.monitor_inflight,
+                trigger="interval",
+                seconds=receipt_poll_seconds,
+                id="inflight_monitor",
+                name="전송 트랜잭션 확인 및 수수료 인상",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
+            )
+            self.tx_manager.balance_monitor.on_alert = self.alert_low_balance
+            self.scheduler.add_job(
+                func=self.tx_manager.refresh_balances,
+                trigger="interval",
+                seconds=float(os.getenv('BALANCE_REFRESH_SECONDS', '15')),
+                id="wallet_balance",
+                name="핫월렛 잔고 갱신",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+                next_run_time=datetime.now()
+            )
+            if self.payout_ledger and hasattr(self.tx_manager.inflight, 'on_bump'):
+                self.tx_manager.inflight.on_bump = self.ledger_bumped
+            if self.ledger_pending and hasattr(self.tx_manager, 'fetch_receipts'):
+                self.scheduler.add_job(
+                    func=self.reconcile_ledger,
+                    trigger="interval",
+                    seconds=float(os.getenv('LEDGER_RECONCILE_SECONDS', '15')),
+                    id="ledger_reconcile",
+                    name="원장 미확정 드랍 영수증 확인",
+                    replace_existing=True,
+                    max_instances=1,
+                    coalesce=True,
+                    next_run_time=datetime.now()
+                )
+            rpc_pool = getattr(self.tx_manager, 'rpc_pool', None)
+            if rpc_pool:
+                self.scheduler.add_job(
+                    func=rpc_pool.probe,
+                    trigger="interval",
+                    seconds=float(os.getenv('RPC_PROBE_SECONDS', '15')),
+                    id="rpc_probe",
+                    name="RPC 노드 상태 확인",
+                    replace_existing=True,
+                    max_instances=1,
+                    coalesce=True,
+                    next_run_time=datetime.now()
+                )
+            logging.info(f"체인 작업 스케줄 설정 완료 (수수료 {fee_refresh_seconds}초, 트랜잭션 확인 {receipt_poll_seconds}초마다)")
+        except Exception as e:
+            logging.error(f"체인 작업 스케줄 설정 실패: {e}")
+
+    def setup_state_snapshots(self):
+        """한도/쿨타임 상태 주기 저장 설정"""
+        try:
+            self.scheduler.add_job(
+                func=self.save_rate_state,
+                trigger="interval",
+                seconds=float(os.getenv('RATE_STATE_SNAPSHOT_SECONDS', '30')),
+                id="rate_state_snapshot",
+                name="한도/쿨타임 상태 저장",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
+            )
+        except Exception as e:
+            logging.error(f"한도/쿨타임 상태 저장 스케줄 설정 실패: {e}")
+
+    def setup_metrics(self):
+        """지표 수집 설정 (대기열 길이는 수집 시점에 읽음)"""
+        PAYOUT_QUEUE_DEPTH.set_function(self.payout_queue.qsize)
+        OUTBOUND_PENDING.set_function(self.outbox.pending_count)
+        INFLIGHT_TRANSACTIONS.set_function(lambda: len(self.tx_manager.inflight) if self.tx_manager else 0)
+        
+        self.metrics_server = None
+        metrics_port = os.getenv('METRICS_PORT')
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(
+                    METRICS, os.getenv('METRICS_LISTEN', '0.0.0.0'), int(metrics_port)
+                )
+            except Exception as e:
+                logging.error(f"지표 서버 설정 실패: {e}")
+
+    def handler_specs(self) -> list:
+        """(핸들러, 필터) 목록 - 앞에 있는 핸들러가 먼저 매칭됨"""
+        return [
+            (self.handle_start, {'commands': ['start']}),
+            (self.handle_set_wallet, {'commands': ['set']}),
+            (self.handle_wallet_info, {'commands': ['wallet']}),
+            (self.handle_adinfo, {'commands': ['adinfo']}),
+            (self.handle_stats, {'commands': ['stats']}),
+            (self.handle_top, {'commands': ['top']}),
+            (self.handle_summary, {'commands': ['summary']}),
+            (self.handle_import, {'commands': ['import']}),
+            (self.handle_import, {
+                'content_types': ['document'],
+                'func': lambda message: (message.caption or '').startswith('/import')
+            }),
+            (self.handle_export, {'commands': ['export']}),
+            (self.handle_new_members, {'content_types': ['new_chat_members']}),
+            (self.handle_all_messages, {'func': lambda message: True}),
+        ]
+    
+    def setup_handlers(self):
+        """메시지 핸들러 설정"""
+        for handler, filters in self.handler_specs():
+            self.bot.message_handler(**filters)(self.timed_handler(handler))
+    
+    @staticmethod
+    def timed_handler(handler):
+        """핸들러 처리 시간 기록"""
+        name = handler.__name__
+        
+        def timed(message):
+            with HANDLER_SECONDS.time(name):
+                handler(message)
+        return timed
+    
+    def handle_start(self, message):
+        """시작 명령어"""
+        welcome_text = f"""
+🎯 USDC 드랍 봇에 오신 것을 환영합니다!
+
+💰 기능:
+- 지갑 등록: /set wallet_address
+- 관리자 정보: /adinfo
+- 내 지갑: /wallet
+- 내 드랍 통계: /stats
+- 드랍 순위: /top
+- 지갑 일괄 등록/내보내기 (관리자): /import, /export
+- 드랍 요약 (관리자): /summary
+
+🎲 랜덤 드랍:
+- 채팅시 {self.drop_rate*100:.1f}% 확률로 USDC 드랍!
+- 하루 최대 {self.max_daily_amount} USDC
+        """
+        self.outbox.reply_to(message, welcome_text)
+    
+    def handle_set_wallet(self, message):
+        """지갑 주소 설정 (인라인 처리)"""
+        # 드랍 차단 대화방에서는 /set 명령어도 무시
+        chat_id = message.chat.id
+        if self.is_drop_blocked_chat(chat_id):
+            logging.info(f"차단된 대화방에서 /set 명령어 무시: chat {chat_id}")
+            return
+        
+        user_id = str(message.from_user.id)
+        user_name = message.from_user.first_name or message.from_user.username or "Unknown"
+        
+        # 지갑 주소 추출
+        wallet_address = self.parse_set_command(message.text)
+        
+        if not wallet_address:
+            self.outbox.reply_to(message, "❌ 사용법: /set 0x1234...")
+            return
+        
+        # 인라인 처리: 즉시 검증 및 저장
+        if self.wallet_manager.set_wallet(user_id, wallet_address):
+            success_text = "✅ 등록완료했습니다!"  # [modify] 메시지 간소화
+            self.outbox.reply_to(message, success_text)
+            logging.info(f"지갑 등록 성공: {user_name} ({user_id}) -> {wallet_address}")
+        else:
+            self.outbox.reply_to(message, "❌ 유효하지 않은 지갑 주소입니다. Base 체인 주소를 확인해주세요.")
+    
+    def handle_wallet_info(self, message):
+        """내 지갑 정보 조회"""
+        # 드랍 차단 대화방에서는 /wallet 명령어도 무시
+        chat_id = message.chat.id
+        if self.is_drop_blocked_chat(chat_id):
+            logging.info(f"차단된 대화방에서 /wallet 명령어 무시: chat {chat_id}")
+            return
+        
+        user_id = str(message.from_user.id)
+        wallet = self.wallet_manager.get_wallet(user_id)
+        
+        if wallet:
+            self.outbox.reply_to(message, f"💳 등록된 지갑: {wallet}")
+        else:
+            self.outbox.reply_to(message, "❌ 등록된 지갑이 없습니다. /set 명령어로 지갑을 등록해주세요.")
+    
+    def handle_stats(self, message):
+        """내 드랍 통계 (누적 수령액/횟수/마지막 당첨/순위) + 현재 대화방 누적"""
+        chat_id = message.chat.id
+        if self.is_drop_blocked_chat(chat_id):
+            return
+        
+        user_id = str(message.from_user.id)
+        with self.state_lock:
+            stats = self.payout_stats.user(user_id)
+            chat_amount, chat_count = self.payout_stats.chat(chat_id)
+        
+        if stats:
+            last_win = datetime.fromtimestamp(stats['last_win']).strftime('%Y-%m-%d %H:%M')
+            text = f"""
+📊 내 드랍 통계
+
+💰 누적 수령: {stats['amount']:.3f} USDC ({stats['count']}회)
+🏆 순위: {stats['rank']}위
+🕒 마지막 당첨: {last_win}
+            """
+        else:
+            text = "📊 아직 받은 드랍이 없습니다."
+        if chat_id < 0:
+            text = f"{text.rstrip()}\n💬 이 대화방 누적: {chat_amount:.3f} USDC ({chat_count}회)"
+        self.outbox.reply_to(message, text)
+    
+    @staticmethod
+    def top_count(message, default: int = 10, limit: int = 20) -> int:
+        """/top N 에서 N (기본 10, 최대 20)"""
+        parts = (message.text or "").split()
+        if len(parts) >= 2 and parts[1].isdigit():
+            return max(1, min(int(parts[1]), limit))
+        return default
+    
+    def handle_top(self, message):
+        """누적 드랍 순위 (/top 또는 /top N)"""
+        if self.is_drop_blocked_chat(message.chat.id):
+            return
+        with self.state_lock:
+            top = self.payout_stats.top_users(self.top_count(message))
+        if not top:
+            self.outbox.reply_to(message, "🏆 아직 드랍 기록이 없습니다.")
+            return
+        
+        lines = ["🏆 누적 드랍 순위", ""]
+        for rank, (user_id, name, amount, count) in enumerate(top, 1):
+            lines.append(f"{rank}. {name or user_id} - {amount:.3f} USDC ({count}회)")
+        self.outbox.reply_to(message, "\n".join(lines))
+    
+    def handle_summary(self, message):
+        """관리자 드랍 요약 (오늘/7일/누적, 상위 대화방/사용자)"""
+        if not self.is_admin_chat(message):
+            return
+        now = time.time()
+        with self.state_lock:
+            today_amount, today_count = self.payout_stats.window(1, now)
+            week_amount, week_count = self.payout_stats.window(7, now)
+            total_amount, total_count, total_users = self.payout_stats.totals()
+            top_chats = self.payout_stats.top_chats(5)
+            top_users = self.payout_stats.top_users(5)
+        
+        lines = [
+            "📊 드랍 요약 (확정분)",
+            "",
+            f"📅 오늘(UTC): {today_amount:.3f} USDC ({today_count}건)",
+            f"🗓 최근 7일: {week_amount:.3f} USDC ({week_count}건)",
+            f"💰 누적: {total_amount:.3f} USDC ({total_count}건, {total_users}명)",
+        ]
+        if top_chats:
+            lines += ["", "💬 대화방 상위:"]
+            lines += [f"- {chat_id}: {amount:.3f} USDC ({count}건)" for chat_id, amount, count in top_chats]
+        if top_users:
+            lines += ["", "🏆 사용자 상위:"]
+            lines += [f"- {name or user_id} ({user_id}): {amount:.3f} USDC ({count}회)"
+                      for user_id, name, amount, count in top_users]
+        self.outbox.reply_to(message, "\n".join(lines))
+    
+    def alert_low_balance(self, usdc: float, eth_wei: int):
+        """핫월렛 잔고 부족 관리자 알림"""
+        logging.warning(f"핫월렛 잔고 부족: {usdc:.3f} USDC, {Web3.from_wei(eth_wei, 'ether')} ETH")
+        if not self.admin_user_id:
+            return
+        monitor = self.tx_manager.balance_monitor
+        alert_text = f"""
+⚠️ 핫월렛 잔고 부족
+
+💰 USDC: {usdc:.3f} (기준 {monitor.alert_usdc})
+⛽ ETH: {Web3.from_wei(eth_wei, 'ether'):.6f} (기준 {Web3.from_wei(monitor.alert_eth_wei, 'ether')})
+💳 {self.tx_manager.account.address}
+
+잔고가 부족한 동안에는 드랍이 자동으로 건너뛰어집니다.
+        """
+        self.outbox.send_message(self.admin_user_id, alert_text)
+    
+    def get_balance_status(self) -> str:
+        """관리자 정보용 핫월렛 잔고 (캐시 값)"""
+        if not self.tx_manager:
+            return ""
+        available = self.tx_manager.balance_monitor.available()
+        if available is None:
+            return "👛 핫월렛 잔고: 조회 전\n"
+        usdc, eth_wei = available
+        return f"👛 핫월렛 잔고: {usdc:.3f} USDC / {Web3.from_wei(max(eth_wei, 0), 'ether'):.6f} ETH (대기분 차감)\n"
+    
+    def get_rpc_status(self) -> str:
+        """관리자 정보용 RPC 노드 통계"""
+        rpc_pool = getattr(self.tx_manager, 'rpc_pool', None)
+        if not rpc_pool:
+            return ""
+        lines = ["", "🌐 RPC 노드:"]
+        for stat in rpc_pool.stats():
+            state = "🔴 장애" if stat['down'] else ("🟡 지연" if stat['lagging'] else "🟢 정상")
+            latency = f"{stat['latency_ms']}ms" if stat['latency_ms'] is not None else "-"
+            lines.append(f"{state} {stat['url']} | {latency} | 오류율 {stat['error_rate']*100:.1f}% | 호출 {stat['calls']}회")
+        return "\n".join(lines) + "\n"
+    
+    def handle_adinfo(self, message):
+        """관리자에게 채팅 ID 정보 전송"""
+        # 관리자에게 현재 채팅 ID 정보 전송
+        if self.admin_user_id:
+            try:
+                current_chat_id = message.chat.id
+                chat_type = "개인 채팅" if current_chat_id > 0 else "그룹 채팅"
+                chat_title = getattr(message.chat, 'title', '제목 없음')
+                now = time.time()
+                with self.state_lock:
+                    today_sent = self.rate_state.sent(RateState.day_key(now))
+                    today_confirmed, today_count = self.payout_stats.window(1, now)
+                    week_confirmed, week_count = self.payout_stats.window(7, now)
+                    total_confirmed, total_count, total_users = self.payout_stats.totals()
+                
+                # 현재 채팅이 차단되어 있는지 확인
+                is_current_blocked = self.is_drop_blocked_chat(current_chat_id)
+                block_status = "🚫 차단됨" if is_current_blocked else "✅ 활성"
+                
+                admin_message = f"""
+🔧 관리자 정보
+
+📍 현재 채팅 정보:
+🆔 채팅 ID: {current_chat_id}
+📋 채팅 유형: {chat_type}
+📝 채팅 제목: {chat_title}
+🎯 드랍 상태: {block_status}
+
+📊 봇 설정 정보:
+🎲 드랍 확률: {self.drop_rate*100:.1f}%
+💰 하루 최대: {self.max_daily_amount} USDC
+📈 오늘(UTC) 전송: {today_sent:.2f} USDC (확정 {today_confirmed:.2f} USDC, {today_count}건)
+🗓 최근 7일 확정: {week_confirmed:.2f} USDC ({week_count}건)
+🏁 누적 확정: {total_confirmed:.2f} USDC ({total_count}건, {total_users}명)
+{self.get_balance_status()}👥 등록 지갑: {self.wallet_manager.count_wallets()}개
+⏰ 전송 쿨타임: {self.cooldown_seconds}초
+🚫 차단 대화방: {len(self.blocked_chat_ids)}개
+👋 환영 메시지: {'활성화' if self.welcome_message_enabled else '비활성화'}
+{self.get_rpc_status()}
+💡 .env 파일에 추가할 내용:
+GROUP_CHAT_ID={current_chat_id}
+BLOCKED_CHAT_IDS=채팅ID1,채팅ID2,채팅ID3
+                """
+                
+                self.outbox.send_message(self.admin_user_id, admin_message)
+                logging.info(f"관리자에게 채팅 ID 정보 전송: {current_chat_id}")
+            except Exception as e:
+                logging.error(f"관리자에게 채팅 ID 전송 실패: {e}")
+        else:
+            logging.warning("ADMIN_USER_ID가 설정되지 않아 채팅 ID를 전송할 수 없습니다.")
+    
+    def is_admin_chat(self, message) -> bool:
+        """관리자 개인 채팅 여부 (지갑 일괄 등록/내보내기 전용)"""
+        return (
+            bool(self.admin_user_id)
+            and str(message.from_user.id) == str(self.admin_user_id)
+            and message.chat.type == 'private'
+        )
+    
+    @staticmethod
+    def import_document(message):
+        """/import 대상 파일 (캡션으로 보낸 파일 또는 답장한 파일)"""
+        if message.document:
+            return message.document
+        reply = message.reply_to_message
+        return reply.document if reply and reply.document else None
+    
+    def import_wallet_file(self, data: bytes, filename: str = "") -> str:
+        """파일 내용을 일괄 등록하고 결과 메시지 반환"""
+        try:
+            rows = WalletManager.parse_wallet_rows(data.decode('utf-8-sig'), filename)
+            imported, rejected = self.wallet_manager.import_wallets(rows)
+        except Exception as e:
+            logging.error(f"지갑 일괄 등록 실패: {e}")
+            return f"❌ 지갑 일괄 등록 실패: {e}"
+        
+        lines = [f"✅ 지갑 {imported}개 등록 ({len(rows)}행 중 {len(rejected)}행 거부)"]
+        for line, user_id, reason in rejected[:20]:
+            lines.append(f"- {line}행 {user_id or '-'}: {reason}")
+        if len(rejected) > 20:
+            lines.append(f"... 외 {len(rejected) - 20}행")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def export_format(message) -> str:
+        return "json" if "json" in (message.text or "").lower() else "csv"
+    
+    def handle_import(self, message):
+        """관리자 지갑 일괄 등록 (CSV/JSON 파일을 /import 캡션으로 전송하거나 파일에 /import 답장)"""
+        if not self.is_admin_chat(message):
+            return
+        document = self.import_document(message)
+        if not document:
+            self.outbox.reply_to(message, "❌ 사용법: CSV(user_id,address) 또는 JSON 파일을 /import 캡션으로 보내주세요.")
+            return
+        
+        try:
+            file_info = self.bot.get_file(document.file_id)
+            data = self.bot.download_file(file_info.file_path)
+        except Exception as e:
+            logging.error(f"가져오기 파일 다운로드 실패: {e}")
+            self.outbox.reply_to(message, "❌ 파일을 받지 못했습니다.")
+            return
+        self.outbox.reply_to(message, self.import_wallet_file(data, document.file_name or ""))
+    
+    def handle_export(self, message):
+        """관리자 지갑 내보내기 (/export 또는 /export json)"""
+        if not self.is_admin_chat(message):
+            return
+        fmt = self.export_format(message)
+        data = self.wallet_manager.export_wallets(fmt).encode('utf-8')
+        try:
+            # 파일 전송은 드물어서 발신 대기열을 거치지 않음
+            self.bot.send_document(message.chat.id, data, visible_file_name=f"wallets.{fmt}")
+        except Exception as e:
+            logging.error(f"지갑 내보내기 전송 실패: {e}")
+            self.outbox.reply_to(message, "❌ 지갑 내보내기에 실패했습니다.")
+    
+    def handle_new_members(self, message):
+        """새로운 멤버 입장시 안내문 전송"""
+        # 환영 메시지가 비활성화된 경우 무시
+        if not self.welcome_message_enabled:
+            logging.info("환영 메시지 비활성화됨 - 새 멤버 안내문 전송 생략")
+            return
+        
+        chat_id = str(message.chat.id)
+        
+        for new_member in message.new_chat_members:
+            # 봇 자신은 제외
+            if new_member.is_bot:
+                continue
+                
+            user_name = new_member.first_name or new_member.username or "Unknown"
+            user_id = str(new_member.id)
+            
+            # 입장 안내문 전송
+            self.send_guide_to_user(chat_id, user_name)
+            logging.info(f"새 멤버 입장: {user_name} ({user_id})")
+    
+    def handle_all_messages(self, message):
+        """모든 메시지 처리 - 랜덤 드랍 트리거"""
+        if message.from_user:
+            user_id = str(message.from_user.id)
+            user_name = message.from_user.first_name or message.from_user.username or "Unknown"
+            
+            # 메시지가 명령어인 경우 무시
+            if message.text and message.text.startswith('/'):
+                return
+            
+            # 랜덤 드랍 처리
+            self.process_message_drop(message, user_id, user_name)
+    
+    @staticmethod
+    def parse_set_command(command_text: str) -> Optional[str]:
+        """지갑 설정 명령어 파싱"""
+        if not command_text:
+            return None
+        
+        # /set 다음에 오는 주소 추출 (공백으로 구분)
+        parts = command_text.strip().split()
+        if len(parts) >= 2 and parts[0] == '/set':
+            # /set 다음의 모든 부분을 주소로 간주
+            wallet_address = ' '.join(parts[1:]).strip()
+            # 쌍따옴표가 있다면 제거
+            if wallet_address.startswith('"') and wallet_address.endswith('"'):
+                wallet_address = wallet_address[1:-1]
+            return wallet_address
+        
+        return None
+    
+    def process_message_drop(self, message, user_id: str, user_name: str):
+        """메시지별 드랍 처리"""
+        message_time = datetime.fromtimestamp(message.date)
+        decision, reservation = self.decide_drop(
+            user_id, user_name, message.text, message_time, message.chat.id
+        )
+        DROP_DECISIONS.inc(decision)
         
-        # 드랍 차단 대화방 목록 (환경변수에서 쉼표로 구분된 채팅 ID들)
-        blocked_chats_env = os.getenv('BLOCKED_CHAT_IDS', '')
-        self.blocked_chat_ids = set()
-        if blocked_chats_env:
-            try:
-                # 쉼표로 구분된 채팅 ID들을 파싱하여 정수로 변환
-                self.blocked_chat_ids = {int(chat_id.strip()) for chat_id in blocked_chats_env.split(',') if chat_id.strip()}
-                logging.info(f"드랍 차단 대화방 {len(self.blocked_chat_ids)}개 설정: {self.blocked_chat_ids}")
-            except ValueError as e:
-                logging.error(f"BLOCKED_CHAT_IDS 파싱 실패: {e}")
-                self.blocked_chat_ids = set()
+        if decision == 'jackpot':
+            # 커피 잭팟 당첨!
+            self.handle_coffee_jackpot(message, user_id, user_name)
+            return  # 커피 잭팟 당첨시 USDC 드랍 안함
         
-        if not self.bot_token:
-            raise ValueError("TELEGRAM_BOT_TOKEN이 설정되지 않았습니다.")
+        if decision != 'drop':
+            return
         
-        # 봇 초기화
-        self.bot = telebot.TeleBot(self.bot_token)
-        self.wallet_manager = WalletManager()
+        # USDC 전송은 워커에게 넘기고 핸들러는 즉시 반환
+        job = dict(reservation, message=message, user_id=user_id, user_name=user_name)
+        if not self.payout_queue.submit(job):
+            DROP_DECISIONS.inc('queue_full')
+            self.release_payout(job)
+    
+    def decide_drop(self, user_id: str, user_name: str, text: Optional[str],
+                    message_time: datetime, chat_id: int,
+                    now: Optional[datetime] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """드랍 여부 결정 및 한도/쿨타임 예약 (동기/비동기 엔진 공통)
         
-        # 트랜잭션 매니저 초기화 (private_key가 있을 때만)
-        if self.private_key:
-            self.tx_manager = TransactionManager(
-                self.base_rpc, 
-                self.usdc_contract, 
-                self.private_key
-            )
-        else:
-            self.tx_manager = None
-            logging.warning("PRIVATE_KEY가 설정되지 않았습니다.")
+        (결정 사유, 예약 정보) 반환. 'drop'일 때만 예약 정보가 있고,
+        이때 일일 한도, 쿨타임, 핫월렛 잔고는 이미 예약된 상태다.
+        """
+        # 과거 메시지 필터링 (봇 시작 이전 메시지 무시)
+        if message_time < self.bot_start_time:
+            HOT_LOG.log('past_message', logging.INFO, "과거 메시지 무시: %s - %s < %s", user_name, message_time, self.bot_start_time)
+            return 'past_message', None
         
-        # 일일 전송량 추적
-        self.daily_sent = {}
+        # 드랍 차단 대화방 체크
+        if self.is_drop_blocked_chat(chat_id):
+            HOT_LOG.log('blocked_chat', logging.INFO, "드랍 차단 대화방: %s (%s) in chat %s", user_name, user_id, chat_id)
+            return 'blocked_chat', None
         
-        # 전송 쿨타임 관리
-        self.last_transaction_time = {}
-        self.cooldown_seconds = float(os.getenv('COOLDOWN_SECONDS', '30'))
+        # [modify] 메시지 길이 체크 (5글자 이상)
+        if not text or len(text) < 5:
+            return 'short_message', None  # 5글자 미만시 드랍 없음
         
-        # APScheduler 초기화
-        self.scheduler = BackgroundScheduler()
+        # 지갑이 등록되어 있는지 확인
+        wallet_address = self.wallet_manager.get_wallet(user_id)
+        if not wallet_address:
+            return 'no_wallet', None  # 지갑 미등록시 드랍 없음
         
-        # 핸들러 설정
-        self.setup_handlers()
+        # [modify] 쿨타임 체크 (새로 추가)
+        now_ts = (now or datetime.now()).timestamp()  # [modify]
+        today = RateState.day_key(now_ts)  # 일일 한도는 UTC 날짜 기준
         
-        # 정기 안내문 스케줄 설정
-        self.setup_periodic_guide()
+        # 한도/쿨타임 확인과 예약은 한 번에 처리 (동시 드랍 중복 방지)
+        with self.state_lock:
+            remaining = self.rate_state.cooldown_remaining(user_id, now_ts)  # [modify]
+            if remaining > 0:  # [modify]
+                HOT_LOG.log('cooldown', logging.INFO, "쿨타임: %s (%s) - %.1f초 남음", user_name, user_id, remaining)  # [modify]
+                return 'cooldown', None  # [modify] 쿨타임 중
+            
+            # 일일 한도 확인 (전송 대기 중인 예약분 포함)
+            today_sent = self.rate_state.sent(today)
+            
+            if today_sent >= self.max_daily_amount:
+                return 'budget', None  # 일일 한도 초과
+            
+            # 커피 잭팟 체크 (0.0001% 확률)
+            if random.random() < COFFEE_JACKPOT_RATE:
+                return 'jackpot', None
+            
+            # 빠른 시작 중 체인 초기화 전이면 드랍 안함
+            if self.tx_manager is None and self.private_key:
+                return 'chain_starting', None
+            
+            # 랜덤 드랍 여부 결정
+            if not (self.tx_manager and self.tx_manager.should_drop(self.drop_rate)):
+                return 'no_drop', None  # 드랍 안함
+            
+            # 드랍 금액 (0.005 ~ 0.05 USDC)
+            drop_amount = round(random.uniform(DROP_AMOUNT_MIN, DROP_AMOUNT_MAX), 3)
+            
+            # 일일 한도 체크
+            if today_sent + drop_amount > self.max_daily_amount:
+                drop_amount = self.max_daily_amount - today_sent
+                if drop_amount < DROP_AMOUNT_MIN:
+                    return 'too_small', None  # 너무 적으면 드랍 안함
+            
+            # 샤드 모드: 전체 일일 한도 중 이 워커가 임대받은 만큼만 사용
+            if self.shared_state:
+                leased = self.shared_state.ensure_budget(today, today_sent, drop_amount, self.max_daily_amount)
+                drop_amount = min(drop_amount, int(leased * 1000) / 1000)
+                if drop_amount < DROP_AMOUNT_MIN:
+                    return 'budget', None
+            
+            # 핫월렛 잔고 확인 (대기 중인 드랍을 뺀 캐시 잔고로 판단, RPC 호출 없음)
+            gas_reserve_wei = self.tx_manager.fee_oracle.max_cost_wei(self.tx_manager.gas_cache.max_gas)
+            if not self.tx_manager.balance_monitor.reserve(drop_amount, gas_reserve_wei):
+                return 'low_balance', None
+            
+            # 샤드 모드: 다른 워커(다른 그룹)에서 방금 드랍받은 사용자인지 공유 쿨타임 선점으로 확인
+            if self.shared_state and not self.shared_state.claim_cooldown(user_id, now_ts, self.cooldown_seconds):
+                self.tx_manager.balance_monitor.release(drop_amount, gas_reserve_wei)
+                return 'cooldown', None
+            
+            # 한도 및 쿨타임 예약 (전송 실패시 워커가 되돌림)
+            self.rate_state.reserve(today, drop_amount)
+            prev_tx_time = self.rate_state.start_cooldown(user_id, now_ts)  # [modify]
+            
+            # 원장 예약 기록 (버퍼에만 넣고 전송 워커가 디스크 기록을 기다림)
+            payout_id = ledger_seq = None
+            if self.payout_ledger:
+                payout_id = self.payout_ledger.next_id()
+                ledger_seq = self.payout_ledger.append(
+                    'reserved', payout_id, u=user_id, n=user_name, c=chat_id,
+                    w=wallet_address, a=drop_amount, d=today, t=now_ts
+                )
         
-        # 봇 시작시 과거 메시지 스킵
-        self.skip_old_updates()
+        return 'drop', {
+            'wallet_address': wallet_address,
+            'amount': drop_amount,
+            'day': today,
+            'reserved_at': now_ts,
+            'prev_tx_time': prev_tx_time,
+            'gas_reserve_wei': gas_reserve_wei,
+            'chat_id': chat_id,
+            'payout_id': payout_id,
+            'ledger_seq': ledger_seq,
+        }
     
-    def skip_old_updates(self):
-        """봇 시작시 과거 업데이트 모두 스킵"""
-        try:
-            # 현재까지의 모든 업데이트를 가져와서 마지막 update_id를 구함
-            updates = self.bot.get_updates(timeout=1)
-            if updates:
-                last_update_id = updates[-1].update_id
-                # 마지막 업데이트 이후부터 처리하도록 설정
-                self.bot.get_updates(offset=last_update_id + 1, timeout=1)
-                logging.info(f"과거 업데이트 {len(updates)}개 스킵 완료 (마지막 update_id: {last_update_id})")
+    def release_payout(self, job: Dict[str, Any]):
+        """전송 실패한 드랍의 한도/쿨타임/잔고 예약 취소"""
+        self.tx_manager.balance_monitor.release(job['amount'], job['gas_reserve_wei'])
+        with self.state_lock:
+            self.rate_state.release(job['day'], job['amount'])
+            self.rate_state.revert_cooldown(job['user_id'], job['reserved_at'], job['prev_tx_time'], time.time())
+        if self.shared_state:
+            self.shared_state.release_cooldown(job['user_id'], job['reserved_at'] + self.cooldown_seconds)
+        if self.payout_ledger:
+            self.payout_ledger.append('released', job['payout_id'])
+    
+    def send_payouts(self, jobs: list, on_final, on_sent=None) -> Optional[str]:
+        """USDC 전송 (여러 건이면 일괄 전송) - 트랜잭션 해시, 실패시 None"""
+        if not self.tx_manager:
+            return None
+        if len(jobs) == 1:
+            job = jobs[0]
+            return self.tx_manager.send_usdc(job['wallet_address'], job['amount'], on_final=on_final, on_sent=on_sent)
+        return self.tx_manager.send_usdc_batch(
+            [(job['wallet_address'], job['amount']) for job in jobs], on_final=on_final, on_sent=on_sent
+        )
+    
+    def execute_payouts(self, jobs: list):
+        """전송 워커: USDC 전송 후 드랍 알림"""
+        if not self.wait_ledger(jobs):
+            PAYOUT_RESULTS.inc('send_failed', amount=len(jobs))
+            for job in jobs:
+                self.release_payout(job)
+            return
+        tx_hash = self.send_payouts(
+            jobs,
+            lambda status, tx_hash: self.settle_payouts(jobs, status, tx_hash),
+            on_sent=lambda nonce, tx_hash: self.ledger_sent(jobs, tx_hash, nonce)
+        )
+        
+        if not tx_hash:
+            PAYOUT_RESULTS.inc('send_failed', amount=len(jobs))
+        for job in jobs:
+            if tx_hash:
+                self.announce_drop(job, tx_hash)
             else:
-                logging.info("스킵할 과거 업데이트 없음")
-        except Exception as e:
-            logging.warning(f"과거 업데이트 스킵 실패 (계속 진행): {e}")
+                self.release_payout(job)
     
-    def get_guide_message(self) -> str:
-        """안내문 메시지 반환"""
-        return f"""🎯 곰빵봇 사용 안내
-
-🤖 곰빵봇은 채팅 시 랜덤으로 USDC를 드랍해주는 Base 체인 기반 텔레그램 봇입니다!
-
-📝 지갑 등록 방법:
-아래 예시 명령어를 입력해서 지갑을 등록해주세요
-
-/set 등록할지갑주소
+    def announce_drop(self, job: Dict[str, Any], tx_hash: str):
+        """드랍 알림 (원래 메시지에 답장)"""
+        user_id = job['user_id']
+        user_name = job['user_name']
+        wallet_address = job['wallet_address']
+        drop_amount = job['amount']
+        
+        # 드랍 알림
+        drop_text = f"""
+💸 USDC 드랍! 🎉
 
-✨ 지갑 등록 후 채팅하면 USDC 드랍 기회를 얻을 수 있습니다! (단 최소 5글자 이상)
-🌐 Base Network을 사용합니다."""
-    
-    def send_guide_to_user(self, chat_id: str, user_name: str = "Unknown"):
-        """그룹 입장시 안내문 전송 (멘션 없음)"""
+👤 {user_name}
+💰 {drop_amount} USDC
+💳 {wallet_address[:10]}...{wallet_address[-10:]}
+🔗 TX: {tx_hash[:10]}...{tx_hash[-10:]}
+            """  # [modify] 쿨타임 정보 제거
+        
+        on_sent = None
+        if self.drop_confirm_edit:
+            on_sent = lambda sent: self.remember_drop_reply(job, drop_text, sent)
+        
         try:
-            guide_message = self.get_guide_message()
-            welcome_text = f"{user_name}님 환영합니다! 🎉\n\n{guide_message}"
-            
-            self.bot.send_message(chat_id, welcome_text)
-            logging.info(f"그룹 입장 안내문 전송: {user_name}")
+            self.outbox.reply_to(
+                job['message'],
+                drop_text,
+                kind='drop',
+                digest_line=f"👤 {user_name} · 💰 {drop_amount} USDC · 🔗 {tx_hash[:10]}...{tx_hash[-6:]}",
+                on_sent=on_sent
+            )
         except Exception as e:
-            logging.error(f"그룹 안내문 전송 실패: {user_name} - {e}")
+            logging.error(f"드랍 알림 전송 실패: {user_name} - {e}")
+        logging.info(f"드랍 성공: {user_name} ({user_id}) -> {drop_amount} USDC (쿨타임 {self.cooldown_seconds}초 시작)")  # [modify]
     
-    def is_drop_blocked_chat(self, chat_id: int) -> bool:
-        """특정 대화방에서 드랍이 차단되어 있는지 확인"""
-        return chat_id in self.blocked_chat_ids
+    def settle_payouts(self, jobs: list, status: str, tx_hash: str):
+        """트랜잭션 확정 결과 반영 (확정분 집계, 실패/시간 초과는 한도/쿨타임 복구)"""
+        for job in jobs:
+            if status == 'confirmed':
+                self.tx_manager.balance_monitor.settle(job['amount'], job['gas_reserve_wei'])
+                with self.state_lock:
+                    self.rate_state.confirm(job['day'], job['amount'])
+                    self.payout_stats.record(
+                        job['user_id'], job['user_name'], job.get('chat_id'), job['amount'], time.time()
+                    )
+            else:
+                self.release_payout(job)
+            if self.payout_ledger:
+                self.payout_ledger.append('final', job['payout_id'], s=status, h=tx_hash)
+                self.ledger_nonces.pop(job.get('nonce'), None)
+            self.update_drop_reply(job, status)
+        
+        PAYOUT_RESULTS.inc(status, amount=len(jobs))
+        total = sum(job['amount'] for job in jobs)
+        if status == 'confirmed':
+            logging.info(f"드랍 확정: {len(jobs)}건 {total:.3f} USDC ({tx_hash})")
+        else:
+            logging.warning(f"드랍 미확정 ({status}): {len(jobs)}건 {total:.3f} USDC 한도 복구 ({tx_hash})")
     
-    def send_periodic_guide(self):
-        """정기 안내문 전송 (그룹 채팅)"""
-        if not self.group_chat_id:
-            logging.warning("GROUP_CHAT_ID가 설정되지 않아 정기 안내문을 보낼 수 없습니다.")
+    def remember_drop_reply(self, job: Dict[str, Any], drop_text: str, sent):
+        """드랍 알림 메시지 기록 (확정 결과 표시용)"""
+        # 요약 메시지로 합쳐져 전송된 경우에는 수정하지 않음
+        if sent is None or (getattr(sent, 'text', None) or '').strip() != drop_text.strip():
+            return
+        with self.state_lock:
+            job['reply'] = (sent.chat.id, sent.message_id, drop_text.strip())
+            status = job.get('final_status')
+        if status:
+            self.edit_drop_reply(job['reply'], status)
+    
+    def update_drop_reply(self, job: Dict[str, Any], status: str):
+        """확정 결과를 드랍 알림에 표시 (알림이 아직 전송 전이면 전송 후 표시)"""
+        if not self.drop_confirm_edit:
             return
+        with self.state_lock:
+            job['final_status'] = status
+            reply = job.get('reply')
+        if reply:
+            self.edit_drop_reply(reply, status)
+    
+    def edit_drop_reply(self, reply: tuple, status: str):
+        chat_id, message_id, text = reply
+        status_line = {
+            'confirmed': "✅ 블록 확인 완료",
+            'failed': "❌ 전송 실패 (트랜잭션 실패)",
+        }.get(status, "⌛ 전송 실패 (확인 시간 초과)")
+        self.outbox.edit_message(chat_id, message_id, f"{text}\n\n{status_line}")
+    
+    def process_update_json(self, update_json: str):
+        """웹훅으로 받은 업데이트 처리 (디스패처 워커에서 실행)"""
+        update = telebot.types.Update.de_json(update_json)
+        self.bot.process_new_updates([update])
+    
+    def run_webhook(self):
+        """웹훅 모드 실행 (내장 HTTP 서버 + 채팅별 순서 보장 워커 풀)"""
+        from urllib.parse import urlparse
+        
+        secret_token = os.getenv('WEBHOOK_SECRET') or None
+        dispatcher = ChatOrderedDispatcher(
+            self.process_update_json,
+            num_workers=int(os.getenv('WEBHOOK_WORKERS', '4')),
+            max_queue=int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+        )
+        server = WebhookServer(
+            dispatcher,
+            listen=os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+            port=int(os.getenv('WEBHOOK_PORT', '8443')),
+            path=urlparse(self.webhook_url).path or "/",
+            secret_token=secret_token,
+            ssl_cert=os.getenv('WEBHOOK_SSL_CERT') or None,
+            ssl_key=os.getenv('WEBHOOK_SSL_KEY') or None
+        )
         
+        dispatcher.start()
         try:
-            guide_message = self.get_guide_message()
-            self.bot.send_message(self.group_chat_id, guide_message)
-            logging.info(f"정기 안내문 전송 완료: {self.group_chat_id}")
-        except Exception as e:
-            logging.error(f"정기 안내문 전송 실패: {e}")
+            # 과거 업데이트는 웹훅 등록시 버림 (추가 get_updates 호출 없음)
+            self.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=secret_token,
+                drop_pending_updates=True,
+                max_connections=int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+            )
+            logging.info(f"웹훅 모드 시작: {self.webhook_url}")
+            server.serve_forever()
+        finally:
+            server.shutdown()
+            dispatcher.stop()
+            logging.info("웹훅 서버 종료 완료")
     
-    def handle_coffee_jackpot(self, message, user_id: str, user_name: str):
-        """커피 잭팟 당첨 처리"""
+    def receive_updates(self):
+        """업데이트 수신 (웹훅 또는 롱폴링) - 종료될 때까지 블로킹"""
+        if self.webhook_url:
+            self.run_webhook()
+        else:
+            self.bot.infinity_polling(timeout=10, long_polling_timeout=5)
+    
+    def run(self):
+        """봇 실행"""
+        logging.info("USDC 드랍 봇 시작")
+        logging.info(f"드랍 확률: {self.drop_rate*100:.1f}%, 일일 한도: {self.max_daily_amount} USDC")
+        logging.info(f"환영 메시지: {'활성화' if self.welcome_message_enabled else '비활성화'}")
+        
         try:
-            # 먼저 🎰 이모지 전송 (드라마틱 효과)
-            self.bot.reply_to(message, "🎰🎰🎰")
+            # 스케줄러 시작
+            self.scheduler.start()
+            logging.info("APScheduler 시작 완료")
             
-            # 잠깐 대기 (서스펜스 효과)
-            import time
-            time.sleep(1.5)
+            # 텔레그램 발신 대기열 및 드랍 전송 워커 시작
+            self.outbox.start()
+            self.payout_queue.start()
             
-            # 그룹에 당첨 메시지 전송
-            jackpot_text = f"""
-☕🎉 커피 잭팟 당첨! 🎉☕
-
-축하합니다! {user_name}님이 커피 잭팟에 당첨되었습니다!
-
-관리자 확인후 전송 될 예정입니다!
-            """
+            if self.metrics_server:
+                self.metrics_server.start()
             
-            self.bot.reply_to(message, jackpot_text)
-            logging.info(f"커피 잭팟 당첨: {user_name} ({user_id})")
+            self.report_startup_profile()
             
-            # 관리자에게 당첨자 정보 전송
-            if self.admin_user_id:
-                try:
-                    chat_id = message.chat.id
-                    chat_title = getattr(message.chat, 'title', '제목 없음')
-                    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    admin_notification = f"""
-☕🎰 커피 잭팟 당첨 알림!
+            # 봇 시작
+            self.receive_updates()
+        except Exception as e:
+            logging.error(f"봇 실행 오류: {e}")
+        finally:
+            # 전송 대기 중인 드랍 처리 후 워커 종료
+            try:
+                self.payout_queue.stop()
+            except Exception as e:
+                logging.error(f"드랍 전송 워커 종료 오류: {e}")
+            
+            # 남은 알림 전송 후 발신 대기열 종료
+            try:
+                self.outbox.stop()
+            except Exception as e:
+                logging.error(f"텔레그램 발신 대기열 종료 오류: {e}")
+            
+            # 스케줄러 종료
+            try:
+                self.scheduler.shutdown()
+                logging.info("APScheduler 종료 완료")
+            except Exception as e:
+                logging.error(f"APScheduler 종료 오류: {e}")
+            
+            self.save_rate_state()
+            if self.payout_ledger:
+                self.payout_ledger.stop()
+            
+            if self.metrics_server:
+                self.metrics_server.shutdown()
+            
+            logging.info("USDC 드랍 봇 종료")
 
-🎊 당첨자 정보:
-👤 이름: {user_name}
-🆔 사용자 ID: {user_id}
-📍 채팅: {chat_title} ({chat_id})
-⏰ 당첨 시간: {current_time}
+class AsyncFeeOracle(FeeOracle):
+    """비동기 엔진용 수수료 오라클 (AsyncWeb3로 feeHistory 조회)"""
 
-🍀 당첨 확률: 0.005% (초희귀!)
-                    """
-                    
-                    self.bot.send_message(self.admin_user_id, admin_notification)
-                    logging.info(f"관리자에게 커피 잭팟 당첨 알림 전송: {user_name}")
-                except Exception as e:
-                    logging.error(f"관리자에게 커피 잭팟 알림 전송 실패: {e}")
-            
-        except Exception as e:
-            logging.error(f"커피 잭팟 처리 실패: {user_name} - {e}")
-    
-    def setup_periodic_guide(self):
-        """정기 안내문 스케줄 설정 (4시간마다)"""
+    async def refresh(self) -> bool:
+        """eth_feeHistory로 수수료 표본 갱신"""
         try:
-            self.scheduler.add_job(
-                func=self.send_periodic_guide,
-                trigger="interval",
-                hours=4,
-                id="periodic_guide",
-                name="정기 안내문 전송",
-                replace_existing=True
-            )
-            logging.info("정기 안내문 스케줄 설정 완료 (4시간마다)")
+            history = await self.w3.eth.fee_history(self.block_count, 'latest', [self.percentile])
+            self.update_from_history(history)
+            return True
         except Exception as e:
-            logging.error(f"정기 안내문 스케줄 설정 실패: {e}")
+            logging.warning(f"수수료 표본 갱신 실패: {e}")
+            return False
 
-    def setup_handlers(self):
-        """메시지 핸들러 설정"""
-        
-        @self.bot.message_handler(commands=['start'])
-        def handle_start(message):
-            """시작 명령어"""
-            welcome_text = f"""
-🎯 USDC 드랍 봇에 오신 것을 환영합니다!
+    def get_fees(self, bump_level: int = 0) -> dict:
+        # 동기 조회 없음 - 시작시 refresh()를 먼저 await 한다
+        with self.lock:
+            snapshot = self.snapshot
+        return self.fees_from_snapshot(snapshot, bump_level)
 
-💰 기능:
-- 지갑 등록: /set wallet_address
-- 관리자 정보: /adinfo
-- 내 지갑: /wallet
+class AsyncTransactionManager:
+    """AsyncWeb3 기반 USDC 전송 (비동기 엔진용)
+    
+    논스 할당, 가스 한도 캐시, 수수료 계산, 대기 트랜잭션 추적은 동기
+    TransactionManager와 같은 구성요소를 쓰고 네트워크 호출만 await 한다.
+    트랜잭션은 로컬에서 인코딩/서명한다.
+    """
 
-🎲 랜덤 드랍:
-- 채팅시 {self.drop_rate*100:.1f}% 확률로 USDC 드랍!
-- 하루 최대 {self.max_daily_amount} USDC
-            """
-            self.bot.reply_to(message, welcome_text)
-        
-        @self.bot.message_handler(commands=['set'])
-        def handle_set_wallet(message):
-            """지갑 주소 설정 (인라인 처리)"""
-            # 드랍 차단 대화방에서는 /set 명령어도 무시
-            chat_id = message.chat.id
-            if self.is_drop_blocked_chat(chat_id):
-                logging.info(f"차단된 대화방에서 /set 명령어 무시: chat {chat_id}")
-                return
-            
-            user_id = str(message.from_user.id)
-            user_name = message.from_user.first_name or message.from_user.username or "Unknown"
-            
-            # 지갑 주소 추출
-            wallet_address = self.parse_set_command(message.text)
-            
-            if not wallet_address:
-                self.bot.reply_to(message, "❌ 사용법: /set 0x1234...")
-                return
-            
-            # 인라인 처리: 즉시 검증 및 저장
-            if self.wallet_manager.set_wallet(user_id, wallet_address):
-                success_text = "✅ 등록완료했습니다!"  # [modify] 메시지 간소화
-                self.bot.reply_to(message, success_text)
-                logging.info(f"지갑 등록 성공: {user_name} ({user_id}) -> {wallet_address}")
-            else:
-                self.bot.reply_to(message, "❌ 유효하지 않은 지갑 주소입니다. Base 체인 주소를 확인해주세요.")
-        
-        @self.bot.message_handler(commands=['wallet'])
-        def handle_wallet_info(message):
-            """내 지갑 정보 조회"""
-            # 드랍 차단 대화방에서는 /wallet 명령어도 무시
-            chat_id = message.chat.id
-            if self.is_drop_blocked_chat(chat_id):
-                logging.info(f"차단된 대화방에서 /wallet 명령어 무시: chat {chat_id}")
-                return
-            
-            user_id = str(message.from_user.id)
-            wallet = self.wallet_manager.get_wallet(user_id)
-            
-            if wallet:
-                self.bot.reply_to(message, f"💳 등록된 지갑: {wallet}")
-            else:
-                self.bot.reply_to(message, "❌ 등록된 지갑이 없습니다. /set 명령어로 지갑을 등록해주세요.")
+    def __init__(self, rpc_url: str, usdc_contract_address: str, private_key: str,
+                 pool_size: int = 100):
+        from web3 import AsyncWeb3, AsyncHTTPProvider
         
-        @self.bot.message_handler(commands=['adinfo'])
-        def handle_adinfo(message):
-            """관리자에게 채팅 ID 정보 전송"""
-            # 관리자에게 현재 채팅 ID 정보 전송
-            if self.admin_user_id:
-                try:
-                    current_chat_id = message.chat.id
-                    chat_type = "개인 채팅" if current_chat_id > 0 else "그룹 채팅"
-                    chat_title = getattr(message.chat, 'title', '제목 없음')
-                    today = datetime.now().date().isoformat()
-                    today_sent = self.daily_sent.get(today, 0)
-                    
-                    # 현재 채팅이 차단되어 있는지 확인
-                    is_current_blocked = self.is_drop_blocked_chat(current_chat_id)
-                    block_status = "🚫 차단됨" if is_current_blocked else "✅ 활성"
-                    
-                    admin_message = f"""
-🔧 관리자 정보
+        self.rpc_url = rpc_url
+        self.pool_size = pool_size
+        self.provider = AsyncHTTPProvider(rpc_url)
+        self.w3 = AsyncWeb3(self.provider)
+        self.usdc_contract_address = Web3.to_checksum_address(usdc_contract_address)
+        self.usdc_contract = self.w3.eth.contract(address=self.usdc_contract_address, abi=USDC_ABI)
+        self.account = Account.from_key(private_key)
+        self.builder = TransferBuilder(self.usdc_contract_address)  # 체인 ID는 start()에서 설정
+        self.batch_contract = None  # 일괄 전송은 동기 엔진에서만 지원
+        self.session = None
+        self.chain_id = None
+        
+        # 논스 조회는 이 클래스가 await로 처리하고 NonceManager는 할당만 담당
+        self.nonce_manager = NonceManager(
+            None,
+            self.account.address,
+            gap_timeout=float(os.getenv('NONCE_GAP_TIMEOUT', '60'))
+        )
+        self.nonce_lock = asyncio.Lock()
+        self.gas_cache = GasLimitCache(ttl=float(os.getenv('GAS_CACHE_TTL', '600')))
+        self.fee_oracle = AsyncFeeOracle(
+            self.w3,
+            min_priority_gwei=float(os.getenv('MIN_PRIORITY_FEE_GWEI', '0.001')),
+            max_fee_gwei=float(os.getenv('MAX_FEE_GWEI', '1.0'))
+        )
+        self.inflight = InflightTracker(
+            stuck_seconds=float(os.getenv('FEE_BUMP_AFTER_SECONDS', '30')),
+            max_bumps=int(os.getenv('MAX_FEE_BUMPS', '5'))
+        )
+        self.receipt_batch_size = int(os.getenv('RECEIPT_BATCH_SIZE', '100'))
+        
+        # 핫월렛 잔고 캐시 (스케줄러에서 주기 갱신, 드랍 결정시 RPC 없이 확인)
+        self.balance_monitor = BalanceMonitor(
+            alert_usdc=float(os.getenv('LOW_BALANCE_USDC', '1.0')),
+            alert_eth=float(os.getenv('LOW_BALANCE_ETH', '0.0005'))
+        )
 
-📍 현재 채팅 정보:
-🆔 채팅 ID: {current_chat_id}
-📋 채팅 유형: {chat_type}
-📝 채팅 제목: {chat_title}
-🎯 드랍 상태: {block_status}
+    async def start(self):
+        """HTTP 세션 풀 생성 및 체인 ID/논스/수수료 초기 조회"""
+        import aiohttp
+        
+        # 노드 연결은 keep-alive 커넥션 풀 하나를 모든 호출이 공유
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        )
+        await self.provider.cache_async_session(self.session)
+        self.chain_id = await self.w3.eth.chain_id
+        self.builder.chain_id = self.chain_id
+        await self._sync_nonce()
+        await self.fee_oracle.refresh()
+        logging.info(f"비동기 트랜잭션 매니저 준비 완료 (체인 ID {self.chain_id})")
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    def should_drop(self, drop_rate: float) -> bool:
+        """랜덤 드랍 여부 결정"""
+        return random.random() < drop_rate
+
+    async def refresh_balances(self) -> bool:
+        """핫월렛 USDC/ETH 잔고 갱신"""
+        try:
+            usdc_wei = await self.usdc_contract.functions.balanceOf(self.account.address).call()
+            eth_wei = await self.w3.eth.get_balance(self.account.address)
+        except Exception as e:
+            logging.warning(f"핫월렛 잔고 조회 실패: {e}")
+            return False
+        self.balance_monitor.update(usdc_wei / (10 ** 6), eth_wei)
+        return True
 
-📊 봇 설정 정보:
-🎲 드랍 확률: {self.drop_rate*100:.1f}%
-💰 하루 최대: {self.max_daily_amount} USDC
-📈 오늘 전송: {today_sent:.2f} USDC
-👥 등록 지갑: {len(self.wallet_manager.get_all_wallets())}개
-⏰ 전송 쿨타임: {self.cooldown_seconds}초
-🚫 차단 대화방: {len(self.blocked_chat_ids)}개
-👋 환영 메시지: {'활성화' if self.welcome_message_enabled else '비활성화'}
+    async def _sync_nonce(self):
+        nonce = await self.w3.eth.get_transaction_count(self.account.address, 'pending')
+        self.nonce_manager.reset(nonce)
 
-💡 .env 파일에 추가할 내용:
-GROUP_CHAT_ID={current_chat_id}
-BLOCKED_CHAT_IDS=채팅ID1,채팅ID2,채팅ID3
-                    """
-                    
-                    self.bot.send_message(self.admin_user_id, admin_message)
-                    logging.info(f"관리자에게 채팅 ID 정보 전송: {current_chat_id}")
-                except Exception as e:
-                    logging.error(f"관리자에게 채팅 ID 전송 실패: {e}")
-            else:
-                logging.warning("ADMIN_USER_ID가 설정되지 않아 채팅 ID를 전송할 수 없습니다.")
-        
-        @self.bot.message_handler(content_types=['new_chat_members'])
-        def handle_new_members(message):
-            """새로운 멤버 입장시 안내문 전송"""
-            # 환영 메시지가 비활성화된 경우 무시
-            if not self.welcome_message_enabled:
-                logging.info("환영 메시지 비활성화됨 - 새 멤버 안내문 전송 생략")
-                return
-            
-            chat_id = str(message.chat.id)
-            
-            for new_member in message.new_chat_members:
-                # 봇 자신은 제외
-                if new_member.is_bot:
-                    continue
-                    
-                user_name = new_member.first_name or new_member.username or "Unknown"
-                user_id = str(new_member.id)
+    async def _allocate_nonce(self) -> int:
+        async with self.nonce_lock:
+            if self.nonce_manager.needs_sync():
+                await self._sync_nonce()
+            try:
+                return self.nonce_manager.allocate()
+            except Exception:
+                # 확인 직후 유휴 시간이 지나 재동기화가 필요해진 경우
+                await self._sync_nonce()
+                return self.nonce_manager.allocate()
+
+    async def get_gas_limit(self, to_checksum: str, amount_wei: int) -> dict:
+        """가스 한도 결정 (캐시 우선, 없을 때만 estimate_gas)"""
+        kind = self.gas_cache.recipient_kind(to_checksum)
+        gas_info = self.gas_cache.get(kind)
+        if gas_info:
+            return gas_info
+        
+        try:
+            estimated_gas = await self.usdc_contract.functions.transfer(
+                to_checksum, amount_wei
+            ).estimate_gas({'from': self.account.address})
+            gas_info = TransactionManager.gas_info_from_estimate(estimated_gas)
+        except Exception as e:
+            logging.warning(f"동적 가스 추정 실패, 기본값 사용: {e}")
+            gas_info = TransactionManager.default_gas_info()
+        gas_info['kind'] = kind
+        self.gas_cache.observe(kind, gas_info['estimated'], source='estimate_gas')
+        return gas_info
+
+    async def send_usdc(self, to_address: str, amount: float, on_final=None, on_sent=None) -> Optional[str]:
+        """USDC 전송 (로컬 인코딩/서명 후 send_raw_transaction, 확정 결과는 on_final로 통지)
+        
+        on_sent(nonce, tx_hash)는 추적 등록 전에 호출되므로 on_final보다 항상 먼저다.
+        """
+        try:
+            to_checksum = checksum_address(to_address)
+            if not to_checksum:
+                raise ValueError(f"잘못된 지갑 주소: {to_address}")
+            amount_wei = int(amount * (10 ** 6))  # USDC 6자리 소수점
+            gas_info = await self.get_gas_limit(to_checksum, amount_wei)
+            data = TransferBuilder.transfer_data(to_checksum, amount_wei)
+        except Exception as e:
+            logging.error(f"USDC 전송 준비 실패: {e}")
+            return None
+        
+        retry_count = 0
+        bump_level = 0
+        while True:
+            nonce = None
+            signed_txn = None
+            transaction = None
+            try:
+                fees = self.fee_oracle.get_fees(bump_level)
+                nonce = await self._allocate_nonce()
+                transaction = self.builder.build(self.usdc_contract_address, data, nonce, gas_info['final'], fees)
+                signed_txn = self.account.sign_transaction(transaction)
+                tx_hash = (await self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)).hex()
                 
-                # 입장 안내문 전송
-                self.send_guide_to_user(chat_id, user_name)
-                logging.info(f"새 멤버 입장: {user_name} ({user_id})")
-        
-        @self.bot.message_handler(func=lambda message: True)
-        def handle_all_messages(message):
-            """모든 메시지 처리 - 랜덤 드랍 트리거"""
-            if message.from_user:
-                user_id = str(message.from_user.id)
-                user_name = message.from_user.first_name or message.from_user.username or "Unknown"
+                logging.info(f"USDC 전송 성공: {amount} USDC를 {to_address}로")
+                logging.info(f"가스 정보: {gas_info['margin']} 마진, 한도 {gas_info['final']:,}, 논스 {nonce}, 해시: {tx_hash}")
+                if on_sent:
+                    on_sent(nonce, tx_hash)
+                self.inflight.track(nonce, transaction, tx_hash, gas_info['kind'], to_checksum, on_final)
+                return tx_hash
                 
-                # 메시지가 명령어인 경우 무시
-                if message.text and message.text.startswith('/'):
-                    return
+            except Exception as e:
+                error_msg = str(e)
                 
-                # 랜덤 드랍 처리
-                self.process_message_drop(message, user_id, user_name)
-    
-    @staticmethod
-    def parse_set_command(command_text: str) -> Optional[str]:
-        """지갑 설정 명령어 파싱"""
-        if not command_text:
-            return None
-        
-        # /set 다음에 오는 주소 추출 (공백으로 구분)
-        parts = command_text.strip().split()
-        if len(parts) >= 2 and parts[0] == '/set':
-            # /set 다음의 모든 부분을 주소로 간주
-            wallet_address = ' '.join(parts[1:]).strip()
-            # 쌍따옴표가 있다면 제거
-            if wallet_address.startswith('"') and wallet_address.endswith('"'):
-                wallet_address = wallet_address[1:-1]
-            return wallet_address
-        
-        return None
+                # 논스 불일치: 체인에서 재동기화
+                if NonceManager.is_resync_error(error_msg):
+                    self.nonce_manager.mark_stale()
+                    if "already known" in error_msg.lower() and signed_txn is not None:
+                        logging.warning(f"이미 전송된 트랜잭션 (논스 {nonce})")
+                        tx_hash = signed_txn.hash.hex()
+                        if on_sent:
+                            on_sent(nonce, tx_hash)
+                        self.inflight.track(nonce, transaction, tx_hash, gas_info['kind'], to_checksum, on_final)
+                        return tx_hash
+                    if retry_count < 3:
+                        retry_count += 1
+                        logging.warning(f"논스 불일치 ({nonce}), 재동기화 후 재시도 {retry_count}/3")
+                        continue
+                elif nonce is not None:
+                    self.nonce_manager.settle_failed(nonce, e, sent=signed_txn is not None)
+                
+                # underpriced 오류 처리: 표본 갱신 후 수수료 인상해서 즉시 재전송
+                if "underpriced" in error_msg.lower() and retry_count < 3:
+                    retry_count += 1
+                    bump_level += 1
+                    logging.warning(f"Underpriced 오류, 수수료 인상 후 재시도 {retry_count}/3")
+                    await self.fee_oracle.refresh()
+                    continue
+                
+                logging.error(f"USDC 전송 실패 (재시도 {retry_count}회): {e}")
+                self.gas_cache.invalidate(gas_info['kind'])
+                return None
+
+    async def latest_nonce(self) -> int:
+        """블록에 포함된 마지막 트랜잭션 다음 논스 (이보다 작은 논스는 소비됨)"""
+        return await self.w3.eth.get_transaction_count(self.account.address, 'latest')
     
-    def process_message_drop(self, message, user_id: str, user_name: str):
-        """메시지별 드랍 처리"""
-        # 과거 메시지 필터링 (봇 시작 이전 메시지 무시)
-        message_time = datetime.fromtimestamp(message.date)
-        if message_time < self.bot_start_time:
-            logging.info(f"과거 메시지 무시: {user_name} - {message_time} < {self.bot_start_time}")
+    async def fetch_receipts(self, tx_hashes: list) -> dict:
+        """여러 트랜잭션 영수증을 JSON-RPC 배치 요청으로 조회 (해시 -> 영수증, 미포함은 제외)"""
+        receipts = {}
+        for start in range(0, len(tx_hashes), self.receipt_batch_size):
+            chunk = tx_hashes[start:start + self.receipt_batch_size]
+            payload = [
+                {'jsonrpc': '2.0', 'method': 'eth_getTransactionReceipt', 'params': [tx_hash], 'id': index}
+                for index, tx_hash in enumerate(chunk)
+            ]
+            async with self.session.post(self.rpc_url, json=payload) as response:
+                response.raise_for_status()
+                responses = await response.json(content_type=None)
+            if not isinstance(responses, list):
+                raise ValueError(f"배치 요청 거부: {responses.get('error')}")
+            for item in responses:
+                if item.get('result') and isinstance(item.get('id'), int) and item['id'] < len(chunk):
+                    receipts[chunk[item['id']]] = TransactionManager.receipt_from_json(item['result'])
+        return receipts
+
+    async def monitor_inflight(self):
+        """대기 중인 트랜잭션 확인 (영수증 배치 조회, 확정 통지, 멈춘 트랜잭션 수수료 인상)"""
+        records = self.inflight.items()
+        if not records:
             return
         
-        # 드랍 차단 대화방 체크
-        chat_id = message.chat.id
-        if self.is_drop_blocked_chat(chat_id):
-            logging.info(f"드랍 차단 대화방: {user_name} ({user_id}) in chat {chat_id}")
+        try:
+            # 미포함 판정용 latest 논스는 영수증보다 먼저 조회
+            latest_nonce = None
+            if self.inflight.needs_latest_nonce(records):
+                latest_nonce = await self.latest_nonce()
+            receipts = await self.fetch_receipts([tx_hash for _, record in records for tx_hash in record['hashes']])
+        except Exception as e:
+            logging.warning(f"영수증 조회 실패 ({len(records)}건): {e}")
             return
         
-        # [modify] 메시지 길이 체크 (5글자 이상)
-        if not message.text or len(message.text) < 5:
-            return  # 5글자 미만시 드랍 없음
-        
-        # 지갑이 등록되어 있는지 확인
-        wallet_address = self.wallet_manager.get_wallet(user_id)
-        if not wallet_address:
-            return  # 지갑 미등록시 드랍 없음
-        
-        # [modify] 쿨타임 체크 (새로 추가)
-        now = datetime.now()  # [modify]
-        last_tx_time = self.last_transaction_time.get(user_id)  # [modify]
-        if last_tx_time:  # [modify]
-            time_diff = (now - last_tx_time).total_seconds()  # [modify]
-            if time_diff < self.cooldown_seconds:  # [modify]
-                logging.info(f"쿨타임: {user_name} ({user_id}) - {self.cooldown_seconds - time_diff:.1f}초 남음")  # [modify]
-                return  # [modify] 쿨타임 중
-        
-        # 일일 한도 확인
-        today = datetime.now().date().isoformat()
-        today_sent = self.daily_sent.get(today, 0)
-        
-        if today_sent >= self.max_daily_amount:
-            return  # 일일 한도 초과
-        
-        # 커피 잭팟 체크 (0.0001% 확률)
-        coffee_jackpot_rate = 0.000001  # 0.0001%
-        if random.random() < coffee_jackpot_rate:
-            # 커피 잭팟 당첨!
-            self.handle_coffee_jackpot(message, user_id, user_name)
-            return  # 커피 잭팟 당첨시 USDC 드랍 안함
+        for nonce, record in records:
+            tx_hash, receipt = self.inflight.pick_receipt(record, receipts)
+            if receipt is None:
+                if self.inflight.is_dropped(nonce, record, latest_nonce):
+                    logging.warning(f"트랜잭션 미포함 (논스 {nonce}가 다른 트랜잭션으로 사용됨) - 추적 중단")
+                    self.inflight.settle(nonce, record, 'dropped')
+                    self.nonce_manager.mark_stale()
+                elif self.inflight.needs_bump(record):
+                    await self.bump_fee(nonce, record)
+                continue
+            
+            success = self.gas_cache.learn_from_receipt(record['gas_kind'], record['recipient'], receipt)
+            self.inflight.settle(nonce, record, 'confirmed' if success else 'failed', tx_hash)
+
+    async def bump_fee(self, nonce: int, record: dict) -> Optional[str]:
+        """멈춘 트랜잭션을 같은 논스, 더 높은 수수료로 교체"""
+        try:
+            transaction = self.fee_oracle.bump_transaction(record['transaction'], record['bumps'] + 1)
+            signed_txn = self.account.sign_transaction(transaction)
+            tx_hash = (await self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)).hex()
+            self.inflight.record_bump(record, transaction, tx_hash)
+            logging.info(f"수수료 인상 교체 전송 (논스 {nonce}, {record['bumps']}회차): {tx_hash}")
+            return tx_hash
+        except Exception as e:
+            if "nonce too low" in str(e).lower():
+                logging.info(f"수수료 인상 불필요 (논스 {nonce} 이미 포함됨)")
+            else:
+                logging.warning(f"수수료 인상 실패 (논스 {nonce}): {e}")
+            self.inflight.record_bump(record)
+            return None
+
+class AsyncPayoutQueue:
+    """비동기 엔진용 드랍 전송 대기열 (asyncio 워커 태스크)"""
+
+    def __init__(self, handler, num_workers: int = 2, max_size: int = 1000):
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.jobs = asyncio.Queue(maxsize=max_size)
+        self.workers = []
+
+    def start(self):
+        """워커 태스크 시작 (이벤트 루프 안에서 호출)"""
+        self.workers = [asyncio.create_task(self._worker_loop()) for _ in range(self.num_workers)]
+        logging.info(f"드랍 전송 워커 {self.num_workers}개 시작 (asyncio)")
+
+    async def stop(self, timeout: float = 10.0):
+        """대기 중인 작업 처리 후 워커 종료"""
+        if not self.workers:
+            return
+        for _ in self.workers:
+            await self.jobs.put(None)
+        await asyncio.wait(self.workers, timeout=timeout)
+        self.workers = []
+        logging.info("드랍 전송 워커 종료 완료")
+
+    def submit(self, job: Dict[str, Any]) -> bool:
+        """전송 작업 등록 (블로킹 없음)"""
+        try:
+            self.jobs.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            logging.warning(f"드랍 전송 대기열 가득 참 ({self.jobs.maxsize}개) - 드랍 취소")
+            return False
+
+    def qsize(self) -> int:
+        """대기 중인 작업 수"""
+        return self.jobs.qsize()
+
+    async def _worker_loop(self):
+        while True:
+            job = await self.jobs.get()
+            if job is None:
+                return
+            try:
+                await self.handler([job])
+            except Exception as e:
+                logging.error(f"드랍 전송 작업 처리 실패: {e}")
+
+class AsyncOutboundSender(OutboundSender):
+    """비동기 엔진용 텔레그램 발신 대기열 (AsyncTeleBot, 속도 제한 로직은 공유)"""
+
+    def __init__(self, bot, **kwargs):
+        super().__init__(bot, **kwargs)
+        self.loop = None
+        self.wakeup = None
+        self.tasks = set()
+
+    def start(self):
+        """발신 디스패처 태스크 시작 (이벤트 루프 안에서 호출)"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.dispatcher = self.loop.create_task(self._dispatch_loop_async())
+        logging.info("텔레그램 발신 대기열 시작 (asyncio)")
+
+    async def stop_async(self, timeout: float = 10.0):
+        """대기 중인 메시지를 최대 timeout초 동안 보내고 종료"""
+        with self.cond:
+            self.stopping = True
+            self._notify()
+        if self.dispatcher:
+            await asyncio.wait([self.dispatcher], timeout=timeout)
+        with self.cond:
+            self.closed = True
+            self._notify()
+            left = sum(len(items) for items in self.pending.values())
+        if self.dispatcher:
+            await asyncio.wait([self.dispatcher], timeout=1.0)
+        self.executor.shutdown(wait=False)
+        if left:
+            logging.warning(f"종료시 전송하지 못한 메시지 {left}건")
+
+    def _notify(self):
+        # 스케줄러 스레드에서 호출될 수도 있으므로 루프에 안전하게 전달
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def _launch(self, item: dict):
+        task = self.loop.create_task(self._deliver_async(item))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _deliver_async(self, item: dict):
+        sent = None
+        error = None
+        started = time.perf_counter()
+        try:
+            if item.get('edit_message_id'):
+                sent = await self.bot.edit_message_text(
+                    item['text'], item['chat_id'], item['edit_message_id'], **item['kwargs']
+                )
+            else:
+                sent = await self.bot.send_message(
+                    item['chat_id'],
+                    item['text'],
+                    reply_to_message_id=item['reply_to_message_id'],
+                    allow_sending_without_reply=True,
+                    **item['kwargs']
+                )
+        except Exception as e:
+            error = e
+        TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started, item['kind'])
+        self._complete(item, sent, error)
+
+    async def _dispatch_loop_async(self):
+        while True:
+            self.wakeup.clear()
+            with self.cond:
+                if self.closed or (self.stopping and not self.pending and not self.busy):
+                    return
+                wait = self._dispatch_ready(time.monotonic())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=max(wait, 0.01))
+            except asyncio.TimeoutError:
+                pass
+
+class AsyncUSDCDropBot(USDCDropBot):
+    """asyncio 엔진 (AsyncTeleBot + AsyncWeb3 + AsyncIOScheduler)
+    
+    핸들러, 드랍 결정, 한도/쿨타임 예약은 USDCDropBot 로직을 그대로 쓰고
+    텔레그램/체인 I/O와 작업 대기열만 이벤트 루프 위에서 처리한다.
+    """
+
+    def __init__(self):
+        # 스레드 기반 구성(TeleBot, Web3, BackgroundScheduler)은 만들지 않음
+        from telebot.async_telebot import AsyncTeleBot
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
         
-        # 랜덤 드랍 여부 결정
-        if not (self.tx_manager and self.tx_manager.should_drop(self.drop_rate)):
-            return  # 드랍 안함
+        self.load_config()
+        if self.webhook_url:
+            logging.warning("비동기 엔진은 웹훅 모드를 지원하지 않습니다 - 롱폴링으로 실행")
+            self.webhook_url = None
         
-        # 드랍 금액 (0.005 ~ 0.05 USDC)
-        drop_amount = round(random.uniform(0.005, 0.05), 3)
+        self.bot = AsyncTeleBot(self.bot_token)
+        with self.startup_phase("지갑 저장소"):
+            self.wallet_manager = WalletManager(
+                storage=create_wallet_storage(), cache_size=int(os.getenv('WALLET_CACHE_SIZE', '10000'))
+            )
+        self.outbox = AsyncOutboundSender(
+            self.bot,
+            global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')),
+            group_rate_per_min=float(os.getenv('TELEGRAM_GROUP_RATE_PER_MIN', '20'))
+        )
         
-        # 일일 한도 체크
-        if today_sent + drop_amount > self.max_daily_amount:
-            drop_amount = self.max_daily_amount - today_sent
-            if drop_amount < 0.005:
-                return  # 너무 적으면 드랍 안함
+        if self.private_key:
+            self.tx_manager = AsyncTransactionManager(
+                self.rpc_urls[0],
+                self.usdc_contract,
+                self.private_key,
+                pool_size=int(os.getenv('RPC_POOL_SIZE', '100'))
+            )
+            if os.getenv('BATCH_CONTRACT_ADDRESS'):
+                logging.warning("비동기 엔진은 일괄 전송을 지원하지 않습니다 - 드랍마다 개별 전송")
+        else:
+            self.tx_manager = None
+            logging.warning("PRIVATE_KEY가 설정되지 않았습니다.")
         
-        # USDC 전송
-        tx_hash = self.tx_manager.send_usdc(
-            wallet_address, 
-            drop_amount
+        with self.startup_phase("드랍 상태 복원"):
+            self.init_drop_state()
+        self.payout_queue = AsyncPayoutQueue(
+            self.execute_payouts_async,
+            num_workers=int(os.getenv('PAYOUT_WORKERS', '2')),
+            max_size=int(os.getenv('PAYOUT_QUEUE_SIZE', '1000'))
         )
         
-        if tx_hash:
-            # 일일 전송량 업데이트
-            self.daily_sent[today] = today_sent + drop_amount
-            
-            # [modify] 쿨타임 업데이트 (새로 추가)
-            self.last_transaction_time[user_id] = now  # [modify]
-            
-            # 드랍 알림
-            drop_text = f"""
-💸 USDC 드랍! 🎉
-
-👤 {user_name}
-💰 {drop_amount} USDC
-💳 {wallet_address[:10]}...{wallet_address[-10:]}
-🔗 TX: {tx_hash[:10]}...{tx_hash[-10:]}
-            """  # [modify] 쿨타임 정보 제거
-            
-            self.bot.reply_to(message, drop_text)
-            logging.info(f"드랍 성공: {user_name} ({user_id}) -> {drop_amount} USDC (쿨타임 {self.cooldown_seconds}초 시작)")  # [modify]
+        self.scheduler = AsyncIOScheduler()
+        self.setup_handlers()
+        self.setup_periodic_guide()
+        self.setup_state_snapshots()
+        self.setup_metrics()
+    
+    def setup_handlers(self):
+        """메시지 핸들러 설정 (공통 핸들러를 코루틴으로 감싸서 등록)"""
+        for handler, filters in self.handler_specs():
+            self.bot.message_handler(**filters)(self._as_coroutine(self.timed_handler(handler)))
+    
+    @staticmethod
+    def _as_coroutine(handler):
+        # 공통 핸들러는 예약/대기열 등록만 하므로 이벤트 루프에서 바로 실행해도 막히지 않음
+        async def coroutine_handler(message):
+            handler(message)
+        return coroutine_handler
+    
+    def _spawn(self, coroutine):
+        """체인 초기화/파일 송수신처럼 오래 걸리는 작업은 별도 태스크로 실행 (완료까지 참조 유지)"""
+        if not hasattr(self, 'background_tasks'):
+            self.background_tasks = set()
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    def handle_import(self, message):
+        if self.is_admin_chat(message):
+            self._spawn(self.handle_import_async(message))
+    
+    def handle_export(self, message):
+        if self.is_admin_chat(message):
+            self._spawn(self.handle_export_async(message))
+    
+    async def handle_import_async(self, message):
+        """관리자 지갑 일괄 등록 (검증/저장은 스레드에서 실행)"""
+        document = self.import_document(message)
+        if not document:
+            self.outbox.reply_to(message, "❌ 사용법: CSV(user_id,address) 또는 JSON 파일을 /import 캡션으로 보내주세요.")
+            return
+        
+        try:
+            file_info = await self.bot.get_file(document.file_id)
+            data = await self.bot.download_file(file_info.file_path)
+        except Exception as e:
+            logging.error(f"가져오기 파일 다운로드 실패: {e}")
+            self.outbox.reply_to(message, "❌ 파일을 받지 못했습니다.")
+            return
+        result = await asyncio.to_thread(self.import_wallet_file, data, document.file_name or "")
+        self.outbox.reply_to(message, result)
+    
+    async def handle_export_async(self, message):
+        """관리자 지갑 내보내기"""
+        fmt = self.export_format(message)
+        data = self.wallet_manager.export_wallets(fmt).encode('utf-8')
+        try:
+            await self.bot.send_document(message.chat.id, data, visible_file_name=f"wallets.{fmt}")
+        except Exception as e:
+            logging.error(f"지갑 내보내기 전송 실패: {e}")
+            self.outbox.reply_to(message, "❌ 지갑 내보내기에 실패했습니다.")
+    
+    async def start_chain_async(self, tx_manager):
+        """체인 ID/논스/수수료 초기 조회 후 드랍 및 체인 작업 활성화"""
+        with self.startup_phase("체인 초기화"):
+            await tx_manager.start()
+        self.tx_manager = tx_manager
+        self.setup_chain_jobs()
+    
+    async def start_chain_background(self, tx_manager):
+        try:
+            await self.start_chain_async(tx_manager)
+            logging.info("체인 초기화 완료 (백그라운드)")
+        except Exception as e:
+            logging.error(f"체인 초기화 실패 - 드랍 비활성화: {e}")
+    
+    async def reconcile_ledger(self):
+        """재시작 전 전송된 드랍 영수증 확인 (비동기 영수증 조회)"""
+        pending = list(self.ledger_pending.items())
+        if pending:
+            try:
+                latest_nonce = await self.tx_manager.latest_nonce()
+                receipts = await self.tx_manager.fetch_receipts(
+                    [tx_hash for _, entry in pending for tx_hash in entry['h']]
+                )
+            except Exception as e:
+                logging.warning(f"원장 영수증 조회 실패 ({len(pending)}건): {e}")
+                return
+            self.apply_ledger_receipts(pending, receipts, latest_nonce)
+        if not self.ledger_pending:
+            self.scheduler.remove_job("ledger_reconcile")
+    
+    async def execute_payouts_async(self, jobs: list):
+        """전송 워커: USDC 전송 후 드랍 알림"""
+        if self.payout_ledger and not await asyncio.to_thread(self.wait_ledger, jobs):
+            PAYOUT_RESULTS.inc('send_failed', amount=len(jobs))
+            for job in jobs:
+                self.release_payout(job)
+            return
+        for job in jobs:
+            tx_hash = await self.tx_manager.send_usdc(
+                job['wallet_address'], job['amount'],
+                on_final=lambda status, tx_hash, job=job: self.settle_payouts([job], status, tx_hash),
+                on_sent=lambda nonce, tx_hash, job=job: self.ledger_sent([job], tx_hash, nonce)
+            )
+            if tx_hash:
+                self.announce_drop(job, tx_hash)
+            else:
+                PAYOUT_RESULTS.inc('send_failed')
+                self.release_payout(job)
     
     def run(self):
-        """봇 실행"""
-        logging.info("USDC 드랍 봇 시작")
+        """봇 실행 (asyncio)"""
+        asyncio.run(self.run_async())
+    
+    async def run_async(self):
+        """이벤트 루프에서 봇 실행"""
+        logging.info("USDC 드랍 봇 시작 (asyncio 엔진)")
         logging.info(f"드랍 확률: {self.drop_rate*100:.1f}%, 일일 한도: {self.max_daily_amount} USDC")
-        logging.info(f"환영 메시지: {'활성화' if self.welcome_message_enabled else '비활성화'}")
         
         try:
-            # 스케줄러 시작
+            if self.tx_manager:
+                if self.fast_start:
+                    # 준비될 때까지 드랍은 'chain_starting'으로 건너뜀
+                    tx_manager, self.tx_manager = self.tx_manager, None
+                    self._spawn(self.start_chain_background(tx_manager))
+                else:
+                    await self.start_chain_async(self.tx_manager)
+            
             self.scheduler.start()
-            logging.info("APScheduler 시작 완료")
+            logging.info("AsyncIOScheduler 시작 완료")
             
-            # 봇 시작
-            self.bot.infinity_polling(timeout=10, long_polling_timeout=5)
+            self.outbox.start()
+            self.payout_queue.start()
+            
+            if self.metrics_server:
+                self.metrics_server.start()
+            
+            self.report_startup_profile()
+            
+            # 과거 업데이트는 offset=-1 조회 한 번으로 스킵
+            await self.bot.infinity_polling(timeout=10, skip_pending=True)
         except Exception as e:
             logging.error(f"봇 실행 오류: {e}")
         finally:
-            # 스케줄러 종료
+            for name, closer in (
+                ("드랍 전송 워커", self.payout_queue.stop),
+                ("텔레그램 발신 대기열", self.outbox.stop_async),
+                ("트랜잭션 매니저", self.tx_manager.close if self.tx_manager else None),
+                ("텔레그램 세션", self.bot.close_session),
+            ):
+                if closer is None:
+                    continue
+                try:
+                    await closer()
+                except Exception as e:
+                    logging.error(f"{name} 종료 오류: {e}")
+            
             try:
-                self.scheduler.shutdown()
-                logging.info("APScheduler 종료 완료")
+                self.scheduler.shutdown(wait=False)
+                logging.info("AsyncIOScheduler 종료 완료")
             except Exception as e:
-                logging.error(f"APScheduler 종료 오류: {e}")
+                logging.error(f"AsyncIOScheduler 종료 오류: {e}")
+            
+            self.save_rate_state()
+            if self.payout_ledger:
+                self.payout_ledger.stop()
+            
+            if self.metrics_server:
+                self.metrics_server.shutdown()
             
             logging.info("USDC 드랍 봇 종료")
 
+def shard_for_chat(chat_id: int, shard_count: int) -> int:
+    """채팅 -> 샤드 번호 (같은 채팅은 항상 같은 워커에서 순서대로 처리)"""
+    return abs(int(chat_id)) % shard_count
+
+def update_chat_id(update: dict) -> Optional[int]:
+    """업데이트 JSON에서 채팅 ID 추출 (없으면 None)"""
+    for key in ('message', 'edited_message', 'channel_post', 'edited_channel_post',
+                'my_chat_member', 'chat_member', 'chat_join_request'):
+        if key in update:
+            return update[key].get('chat', {}).get('id')
+    message = update.get('callback_query', {}).get('message')
+    return message['chat']['id'] if message else None
+
+class ShardWorkerBot(USDCDropBot):
+    """샤드 워커 프로세스 (SHARD_WORKERS 모드)
+    
+    수신 프로세스가 넘겨준 담당 채팅 업데이트만 처리한다. 지갑은 공유 SQLite에서
+    주기적으로 동기화하고, 일일 한도/쿨타임은 SharedDropState로 다른 워커와 나눠 쓰며,
+    드랍 전송은 서명 프로세스에 맡긴다.
+    """
+
+    def __init__(self, shard: int, shard_count: int, inbox, job_queue, result_queue):
+        self.shard = shard
+        self.shard_count = shard_count
+        self.inbox = inbox
+        self.job_queue = job_queue
+        self.result_queue = result_queue
+        super().__init__()
+        
+        self.shared_state = SharedDropState(
+            os.getenv('SHARED_STATE_PATH', 'shared_state.db'),
+            shard,
+            lease_chunk=float(os.getenv('BUDGET_LEASE_USDC', '0.5'))
+        )
+        self.scheduler.add_job(
+            func=self.wallet_manager.sync_from_storage,
+            trigger="interval",
+            seconds=float(os.getenv('WALLET_SYNC_SECONDS', '5')),
+            id="wallet_sync",
+            name="공유 지갑 동기화",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    
+    def create_payout_queue(self):
+        return RemotePayoutQueue(
+            self.shard, self.job_queue, self.result_queue, self.handle_signer_event,
+            max_pending=int(os.getenv('PAYOUT_QUEUE_SIZE', '1000')),
+            wait_durable=self.wait_ledger
+        )
+    
+    def start_chain(self):
+        # 논스/트랜잭션은 서명 프로세스만 다룸
+        self.tx_manager = RemoteChain() if self.private_key else None
+    
+    def skip_old_updates(self):
+        pass  # 수신 프로세스에서 처리
+    
+    def setup_periodic_guide(self):
+        # 정기 안내문은 GROUP_CHAT_ID를 담당하는 워커만 전송
+        if self.group_chat_id and shard_for_chat(self.group_chat_id, self.shard_count) == self.shard:
+            super().setup_periodic_guide()
+    
+    def save_rate_state(self):
+        super().save_rate_state()
+        if self.shared_state:
+            self.shared_state.expire(time.time())
+    
+    def handle_signer_event(self, kind: str, jobs: list, *args):
+        """서명 프로세스 이벤트: sent(tx_hash, nonce) / bumped(nonce, tx_hash) / send_failed / final(status, tx_hash) / balance"""
+        if kind == 'balance':
+            if self.tx_manager:
+                self.tx_manager.update(*args)
+        elif kind == 'sent':
+            self.ledger_sent(jobs, *args)
+            for job in jobs:
+                self.announce_drop(job, args[0])
+        elif kind == 'bumped':
+            if self.payout_ledger:
+                self.ledger_bumped(*args)
+        elif kind == 'send_failed':
+            PAYOUT_RESULTS.inc('send_failed', amount=len(jobs))
+            for job in jobs:
+                self.release_payout(job)
+        elif kind == 'final' and jobs:
+            self.settle_payouts(jobs, *args)
+    
+    def receive_updates(self):
+        """담당 채팅 업데이트 처리 (수신 프로세스가 None을 보내면 종료)"""
+        logging.info(f"샤드 워커 {self.shard + 1}/{self.shard_count} 수신 시작")
+        try:
+            while True:
+                update = self.inbox.get()
+                if update is None:
+                    break
+                try:
+                    self.process_update_json(update)
+                except Exception as e:
+                    logging.error(f"업데이트 처리 실패: {e}")
+        finally:
+            today = RateState.day_key(time.time())
+            with self.state_lock:
+                used = self.rate_state.sent(today)
+            self.shared_state.give_back(today, used)
+
+class ShardCoordinator(USDCDropBot):
+    """수신 + 서명 프로세스 (SHARD_WORKERS 모드)
+    
+    텔레그램 업데이트를 받아 채팅 ID 기준으로 워커에 나눠주고, 워커들이 보낸 드랍을
+    하나의 TransactionManager(논스 단독 관리)로 전송해 결과를 해당 워커에 돌려준다.
+    """
+
+    def __init__(self, inboxes: list, job_queue, result_queues: list, workers: list):
+        self.inboxes = inboxes
+        self.job_queue = job_queue
+        self.result_queues = result_queues
+        self.workers = workers
+        self.intake = None
+        self.nonce_jobs = {}  # 추적 중인 논스 -> 작업 목록 (교체 전송을 워커 원장에 전달)
+        super().__init__()
+    
+    def setup_handlers(self):
+        pass  # 메시지 처리는 워커 담당
+    
+    def setup_periodic_guide(self):
+        pass
+    
+    def setup_state_snapshots(self):
+        pass  # 한도/쿨타임 상태는 워커별 스냅샷 + 공유 저장소
+    
+    def save_rate_state(self):
+        pass
+    
+    def setup_chain_jobs(self):
+        super().setup_chain_jobs()
+        if not self.tx_manager:
+            return
+        # 원장은 워커마다 있으므로 교체 해시는 작업을 보낸 워커에 전달
+        self.tx_manager.inflight.on_bump = self.publish_bump
+        self.scheduler.add_job(
+            func=self.publish_balance,
+            trigger="interval",
+            seconds=float(os.getenv('BALANCE_REFRESH_SECONDS', '15')),
+            id="balance_share",
+            name="워커 잔고 몫 전달",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+    
+    def publish(self, kind: str, jobs: list, *args):
+        """작업을 보낸 워커별로 이벤트 전달"""
+        by_shard = {}
+        for job in jobs:
+            by_shard.setdefault(job['shard'], []).append(job['job_id'])
+        for shard, job_ids in by_shard.items():
+            self.result_queues[shard].put((kind, job_ids, *args))
+    
+    def publish_bump(self, nonce: int, tx_hash: str):
+        """수수료 인상 교체 해시를 작업을 보낸 워커에 전달"""
+        jobs = self.nonce_jobs.get(nonce)
+        if jobs:
+            self.publish('bumped', jobs, nonce, tx_hash)
+    
+    def publish_balance(self):
+        """핫월렛 잔고를 워커 수로 나눠 전달 (워커들이 같은 잔고를 중복 예약하지 않게)"""
+        available = self.tx_manager.balance_monitor.available()
+        if available is None:
+            return
+        usdc, eth_wei = available
+        gas_reserve_wei = self.tx_manager.fee_oracle.max_cost_wei(self.tx_manager.gas_cache.max_gas)
+        count = len(self.result_queues)
+        for result_queue in self.result_queues:
+            result_queue.put(('balance', [], usdc / count, eth_wei // count, gas_reserve_wei))
+    
+    def execute_payouts(self, jobs: list):
+        """전송 워커: USDC 전송 후 결과를 각 샤드 워커에 전달 (sent는 추적 등록 전이라 final보다 먼저 도착)"""
+        def on_sent(nonce, tx_hash):
+            for job in jobs:
+                job['nonce'] = nonce
+            self.nonce_jobs[nonce] = jobs
+            self.publish('sent', jobs, tx_hash, nonce)
+        
+        def on_final(status, tx_hash):
+            PAYOUT_RESULTS.inc(status, amount=len(jobs))
+            self.nonce_jobs.pop(jobs[0].get('nonce'), None)
+            self.publish('final', jobs, status, tx_hash)
+        
+        tx_hash = self.send_payouts(jobs, on_final, on_sent=on_sent)
+        if not tx_hash:
+            PAYOUT_RESULTS.inc('send_failed', amount=len(jobs))
+            self.publish('send_failed', jobs)
+    
+    def _intake_loop(self):
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                return
+            if not self.payout_queue.submit(job):
+                self.publish('send_failed', [job])
+    
+    def route_update(self, update: dict):
+        chat_id = update_chat_id(update)
+        shard = shard_for_chat(chat_id, len(self.inboxes)) if chat_id is not None else 0
+        self.inboxes[shard].put(update)
+    
+    def process_update_json(self, update_json):
+        """웹훅으로 받은 업데이트를 담당 워커로 전달"""
+        self.route_update(json.loads(update_json) if isinstance(update_json, (str, bytes)) else update_json)
+    
+    def poll_updates(self):
+        """롱폴링으로 받은 업데이트(JSON)를 그대로 워커에 전달"""
+        offset = self.bot.last_update_id + 1
+        while True:
+            try:
+                updates = telebot.apihelper.get_updates(
+                    self.bot_token, offset=offset, timeout=20, long_polling_timeout=10
+                )
+            except Exception as e:
+                logging.error(f"업데이트 수신 실패: {e}")
+                time.sleep(3)
+                continue
+            for update in updates:
+                offset = update['update_id'] + 1
+                self.route_update(update)
+    
+    def receive_updates(self):
+        self.intake = threading.Thread(target=self._intake_loop, name="payout-intake", daemon=True)
+        self.intake.start()
+        logging.info(f"샤드 모드 시작: 워커 {len(self.inboxes)}개")
+        try:
+            if self.webhook_url:
+                self.run_webhook()
+            else:
+                self.poll_updates()
+        finally:
+            # 워커가 남은 업데이트를 처리하고 전송 결과를 받을 때까지 기다린 뒤 전송 워커 종료
+            for inbox in self.inboxes:
+                inbox.put(None)
+            for worker in self.workers:
+                worker.join(30)
+            self.job_queue.put(None)
+            self.intake.join(10)
+
+def run_shard_worker(shard: int, shard_count: int, inbox, job_queue, result_queue, log_queue):
+    """샤드 워커 프로세스 진입점"""
+    setup_worker_logging(log_queue)
+    # 워커별 상태 스냅샷/지표 포트, 전역 발신 한도는 워커 수로 나눔
+    os.environ['RATE_STATE_PATH'] = f"{os.getenv('RATE_STATE_PATH', 'rate_state.json')}.shard{shard}"
+    os.environ['PAYOUT_STATS_PATH'] = f"{os.getenv('PAYOUT_STATS_PATH', 'payout_stats.json')}.shard{shard}"
+    if os.getenv('LEDGER_PATH', 'payout_ledger.jsonl'):
+        os.environ['LEDGER_PATH'] = f"{os.getenv('LEDGER_PATH', 'payout_ledger.jsonl')}.shard{shard}"
+    os.environ['TELEGRAM_GLOBAL_RATE'] = str(float(os.getenv('TELEGRAM_GLOBAL_RATE', '30')) / shard_count)
+    if os.getenv('METRICS_PORT'):
+        os.environ['METRICS_PORT'] = str(int(os.getenv('METRICS_PORT')) + 1 + shard)
+    try:
+        ShardWorkerBot(shard, shard_count, inbox, job_queue, result_queue).run()
+    except Exception as e:
+        logging.error(f"샤드 워커 {shard} 오류: {e}")
+
+def wallet_file_command(command: str, path: str):
+    """봇 실행 없이 지갑 파일 가져오기/내보내기
+
+    python3 tx_bot.py import-wallets wallets.csv
+    python3 tx_bot.py export-wallets wallets.json
+    """
+    manager = WalletManager(storage=create_wallet_storage())
+    if command == 'export-wallets':
+        fmt = "json" if path.lower().endswith('.json') else "csv"
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(manager.export_wallets(fmt))
+        print(f"지갑 {manager.count_wallets()}개 내보내기 완료: {path}")
+        return
+    
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        rows = WalletManager.parse_wallet_rows(f.read(), path)
+    imported, rejected = manager.import_wallets(rows)
+    print(f"지갑 {imported}개 등록 ({len(rows)}행 중 {len(rejected)}행 거부)")
+    for line, user_id, reason in rejected:
+        print(f"  {line}행 {user_id or '-'}: {reason}")
+
 def main():
-    """메인 함수"""
+    """메인 함수 (BOT_ENGINE=async 이면 asyncio 엔진, SHARD_WORKERS > 1 이면 멀티 프로세스로 실행)"""
+    if len(sys.argv) == 3 and sys.argv[1] in ('import-wallets', 'export-wallets'):
+        wallet_file_command(sys.argv[1], sys.argv[2])
+        return
+    
+    shard_workers = int(os.getenv('SHARD_WORKERS', '0'))
+    if shard_workers > 1:
+        main_sharded(shard_workers)
+        return
+    
+    if os.getenv('BOT_ENGINE', 'sync').lower() == 'async':
+        main_async()
+        return
+    
     try:
         bot = USDCDropBot()
         bot.run()
     except Exception as e:
         logging.error(f"메인 함수 오류: {e}")
 
+def main_async():
+    """asyncio 엔진 메인 함수"""
+    try:
+        bot = AsyncUSDCDropBot()
+        asyncio.run(bot.run_async())
+    except Exception as e:
+        logging.error(f"메인 함수 오류: {e}")
+
+def main_sharded(shard_count: int):
+    """멀티 프로세스 메인 함수 - 수신/서명 프로세스 1개 + 샤드 워커 shard_count개"""
+    if os.getenv('WALLET_STORAGE', 'sqlite').lower() != 'sqlite':
+        logging.error("샤드 모드는 WALLET_STORAGE=sqlite 에서만 동작합니다.")
+        return
+    if os.getenv('BOT_ENGINE', 'sync').lower() == 'async':
+        logging.warning("샤드 모드는 동기 엔진으로 실행합니다 (BOT_ENGINE 무시)")
+    
+    # 부모 프로세스의 스레드/SQLite 연결을 물려받지 않도록 spawn 사용
+    context = multiprocessing.get_context('spawn')
+    inboxes = [context.Queue() for _ in range(shard_count)]
+    result_queues = [context.Queue() for _ in range(shard_count)]
+    job_queue = context.Queue()
+    
+    # 워커 로그는 부모의 기록 스레드 하나로 모아서 파일 회전이 겹치지 않게 함
+    log_queue = context.Queue()
+    log_listener = QueueListener(log_queue, *LOG_LISTENER.handlers, respect_handler_level=True)
+    log_listener.start()
+    workers = [
+        context.Process(
+            target=run_shard_worker,
+            args=(shard, shard_count, inboxes[shard], job_queue, result_queues[shard], log_queue),
+            name=f"shard-worker-{shard}",
+            daemon=True
+        )
+        for shard in range(shard_count)
+    ]
+    
+    try:
+        # 지갑 DB 생성/JSON 이전은 워커 시작 전에 한 번만
+        coordinator = ShardCoordinator(inboxes, job_queue, result_queues, workers)
+        for worker in workers:
+            worker.start()
+        coordinator.run()
+    except Exception as e:
+        logging.error(f"메인 함수 오류: {e}")
+    finally:
+        log_listener.stop()
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file